@@ -1,12 +1,24 @@
 import streamlit as st
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 import toml
 
+from answer_cache import DEFAULT_SIMILARITY_THRESHOLD, answer_scope
 from chroma_utils import ChromaDocStore
-from helper import api_key, ollama_flag
+from context import DEFAULT_CONTEXT_TOKENS, build_context
+from helper import api_key, get_setting, ollama_flag
+from memory import DEFAULT_MEMORY_TURNS, ConversationMemory
+from mock_llm import (
+    DEFAULT_MOCK_ANSWER_TOKENS,
+    DEFAULT_MOCK_FIRST_TOKEN_DELAY,
+    DEFAULT_MOCK_TOKENS_PER_SECOND,
+    MOCK_MODEL_NAME,
+    MockChatModel,
+)
+from pipeline import DEFAULT_KEEP_ALIVE, ChatTurn, system_prompt
+from rerank import DEFAULT_CANDIDATE_POOL
+from retrieval import embed_query
+from streaming import StreamRenderer
 
 st.sidebar.title("DocuChat")
 st.sidebar.markdown("Chat with your documents.")
@@ -16,6 +28,8 @@ st.divider()
 # Initialize chat history
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
 
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
@@ -31,7 +45,12 @@ with st.spinner("Loading collection..."):
     # Extract just the names into a simple list for the selectbox
     collections = [c.name for c in collection_objects]
 
-    selected_collection = st.sidebar.selectbox("Select Collection", collections)
+    selected_collections = st.sidebar.multiselect(
+        "Select Collections",
+        collections,
+        default=collections[:1],
+        help="Questions are answered from the best results across every selected collection"
+    )
 
     # Add configurable number of results in sidebar
     num_results = st.sidebar.slider(
@@ -42,36 +61,90 @@ with st.spinner("Loading collection..."):
         help="Number of documents to retrieve from vector store for context"
     )
 
-    embeddings = HuggingFaceEmbeddings(model_name='all-MiniLM-L6-v2')
+    context_budget = st.sidebar.slider(
+        "Context Token Budget",
+        min_value=500,
+        max_value=8000,
+        value=DEFAULT_CONTEXT_TOKENS,
+        step=250,
+        help="Maximum number of tokens of retrieved text sent to the model. Lower is faster and cheaper."
+    )
 
-vector_store = Chroma(
-    collection_name=str(selected_collection),
-    embedding_function=embeddings,
-    persist_directory="langchain"
-)
+    memory_turns = st.sidebar.slider(
+        "Remembered Turns",
+        min_value=1,
+        max_value=10,
+        value=DEFAULT_MEMORY_TURNS,
+        help="Number of recent questions and answers sent to the model word for word. Older ones are summarized."
+    )
 
+    use_reranking = st.sidebar.toggle(
+        "Rerank Results",
+        value=False,
+        help="Retrieve a wider pool of candidates and let a small local cross-encoder pick the best ones. Runs on the CPU and needs the model in the local Hugging Face cache."
+    )
+    rerank_pool = None
+    if use_reranking:
+        rerank_pool = st.sidebar.slider(
+            "Candidate Pool",
+            min_value=10,
+            max_value=100,
+            value=DEFAULT_CANDIDATE_POOL,
+            step=5,
+            help="Number of candidates scored by the reranker. The best 'Number of Results' of them are sent to the model."
+        )
 
-# Initialize LLM based on Local Mode setting
-if ollama_flag == 1:  # Local Mode enabled - use Ollama
+    use_hybrid_search = st.sidebar.toggle(
+        "Hybrid Search",
+        value=True,
+        help="Combine semantic search with keyword (BM25) search so exact terms like part numbers and identifiers are found"
+    )
+
+    use_answer_cache = st.sidebar.toggle(
+        "Answer Cache",
+        value=True,
+        help="Answer a question instantly when a near-identical one was already asked of the same, unchanged collections. Only used for the first question of a conversation."
+    )
+    similarity_threshold = DEFAULT_SIMILARITY_THRESHOLD
+    if use_answer_cache:
+        similarity_threshold = st.sidebar.slider(
+            "Cache Similarity",
+            min_value=0.80,
+            max_value=1.00,
+            value=DEFAULT_SIMILARITY_THRESHOLD,
+            step=0.01,
+            help="How similar a new question must be to a cached one for its answer to be reused"
+        )
+
+
+# Initialize LLM based on Mock Mode and Local Mode settings
+if get_setting("mock_llm", "mock_flag", 0) == 1:  # Mock Mode enabled - stream a canned answer in-process
+    st.sidebar.info("Mock Mode is on: answers come from the mock model. Turn it off in Settings.")
+    llm_model_name = MOCK_MODEL_NAME
+    llm = MockChatModel(
+        answer_tokens=int(get_setting("mock_llm", "answer_tokens", DEFAULT_MOCK_ANSWER_TOKENS)),
+        first_token_delay=float(get_setting("mock_llm", "first_token_delay", DEFAULT_MOCK_FIRST_TOKEN_DELAY)),
+        tokens_per_second=float(get_setting("mock_llm", "tokens_per_second", DEFAULT_MOCK_TOKENS_PER_SECOND))
+    )
+elif ollama_flag == 1:  # Local Mode enabled - use Ollama
     secrets_path = ".streamlit/secrets.toml"
     with open(secrets_path, "r") as f:
         secrets = toml.load(f)
     default_model = secrets["ollama"]["default_model"]
 
-    # Debug logging to validate the model name
-    print(f"DEBUG: default_model value: '{default_model}'")
-    print(f"DEBUG: default_model length: {len(default_model)}")
-
     # Validate that the model name is not empty
     if not default_model or default_model.strip() == "":
         st.error("❌ Error: No model specified in secrets.toml. Please set a valid Ollama model name in the 'default_model' field.")
         st.info("💡 Example models: llama2, mistral, codellama, phi, gemma")
         st.stop()
 
+    llm_model_name = default_model
     llm = ChatOllama(
         model=default_model,
+        base_url=secrets["ollama"].get("endpoint") or None,
         temperature=0.3,
-        num_predict=500
+        num_predict=500,
+        keep_alive=DEFAULT_KEEP_ALIVE
     )
 else:  # Local Mode disabled - use OpenAI
     # Validate that the API key is not empty
@@ -80,74 +153,104 @@ else:  # Local Mode disabled - use OpenAI
         st.info("💡 You can get your API key at https://platform.openai.com/api-keys")
         st.stop()
 
+    llm_model_name = "gpt-4.1-mini"
     llm = ChatOpenAI(
-        model="gpt-4.1-mini",
+        model=llm_model_name,
         temperature=0.3,
         api_key=api_key
     )
 
 
 
-def llm_response(llm, messages):
-    """Stream the LLM response and collect the full text.
-
-    Args:
-        llm: The language model to use
-        messages: The conversation history
-
-    Returns:
-        The complete response text
-    """
-    full_response = ""
-    for chunk in llm.stream(messages):
-        chunk_text = chunk.text()
-        full_response += chunk_text
-        yield chunk_text  # Still yield chunks for streaming display
-    return full_response  # Return the complete text after streaming
+if not selected_collections:
+    st.sidebar.warning("Select at least one collection to chat with.")
 
 if prompt := st.chat_input("What do you want to know about these documents?"):
     # Only process the prompt if it contains non-whitespace characters
-    if prompt.strip():
+    if prompt.strip() and selected_collections:
         # Display user message in chat message container
         st.chat_message("user").markdown(prompt)
         # Add user message to chat history
         st.session_state.messages.append({"role": "user", "content": prompt})
 
-        # Perform similarity search for the current question
-        results = vector_store.similarity_search(str(prompt), num_results)
-        results_contents = [doc.page_content for doc in results]
+        # Send the recent turns verbatim and older turns as a rolling summary
+        transcript = [msg for msg in st.session_state.messages if msg["role"] != "system"]
+        memory = st.session_state.memory
+        memory.max_turns = memory_turns
 
-        # Create system message with context
-        system_message = {"role": "system", "content": f"You are a retrieval model. You have access to the most relevant results from a collection of document. Answer the user's question about these documents. Only base your answer on the following documents. If the question cannot be answered from the following documents, clearly state so. Here are the results: {results_contents}"}
+        def build_messages(results):
+            # Pack the results into a de-duplicated, source-labelled context that fits the token budget
+            context, _ = build_context(results, context_budget, llm_model_name)
 
-        # Check if there's already a system message and update it
-        system_message_index = next((i for i, msg in enumerate(st.session_state.messages)
-                                    if msg["role"] == "system"), None)
-        if system_message_index is not None:
-            # Update existing system message
-            st.session_state.messages[system_message_index] = system_message
-        else:
-            # Add new system message at the beginning
-            st.session_state.messages.insert(0, system_message)
+            # Create system prompt with the context for this question only
+            return memory.build_messages(system_prompt(context), transcript)
 
+        # Stop a generation still running for an earlier prompt
+        previous_turn = st.session_state.get("active_turn")
+        if previous_turn is not None:
+            previous_turn.cancel()
 
-        # Create a generator for streaming and capture the full response
-        response_generator = llm_response(llm, st.session_state.messages)
-        full_response = ""
+        # Follow-up questions depend on the earlier turns, so only standalone questions use the answer cache
+        answer_cache = chroma.answer_cache
+        cached = None
+        cacheable = use_answer_cache and len(transcript) == 1
+        if cacheable:
+            scope = answer_scope(selected_collections, model=llm_model_name, k=num_results, hybrid=use_hybrid_search,
+                                 rerank_pool=rerank_pool, context_budget=context_budget)
+            versions = {name: chroma.ledger.version(name) for name in selected_collections}
+            question_embedding = embed_query(chroma, str(prompt))
+            cached = answer_cache.lookup(scope, versions, question_embedding, similarity_threshold)
 
-        # Display the streaming response
         with st.chat_message("assistant"):
-            message_placeholder = st.empty()
-            for chunk in response_generator:
-                full_response += chunk
-                message_placeholder.markdown(full_response + "▌")
-            message_placeholder.markdown(full_response)
+            if cached is not None:
+                full_response = cached.answer
+                st.markdown(full_response)
+                st.caption(f"⚡ Served from cache · similarity {cached.similarity:.2f} to “{cached.question}” · "
+                           f"cache hit rate {answer_cache.stats()['hit_rate']:.0%}")
+            else:
+                # Retrieve (cached for repeated questions) while the model warms up, then stream the answer
+                turn = ChatTurn(llm, chroma, selected_collections, str(prompt), num_results,
+                                build_messages, hybrid=use_hybrid_search, rerank_pool=rerank_pool)
+                st.session_state.active_turn = turn
+
+                # Display the streaming response, redrawing on a time/size cadence rather than per token
+                renderer = StreamRenderer(st.empty(), model_name=llm_model_name)
+                turn_result = turn.run(renderer.write)
+                full_response = renderer.finish()
+                stream_stats = renderer.stats
+                if stream_stats.time_to_first_token is not None:
+                    st.caption(f"First token after {stream_stats.time_to_first_token:.2f}s · "
+                               f"{stream_stats.tokens_per_second:.1f} tokens/s · "
+                               f"retrieval {turn_result.retrieval_seconds:.2f}s"
+                               + (f" · rerank {turn_result.rerank.seconds:.2f}s" if turn_result.rerank else ""))
+                for timing in turn_result.collection_timings:
+                    if timing.error:
+                        st.warning(f"Couldn't search '{timing.collection}': {timing.error}")
+                if len(turn_result.collection_timings) > 1:
+                    with st.expander("Retrieval details"):
+                        for timing in turn_result.collection_timings:
+                            status = f"error: {timing.error}" if timing.error else f"{timing.results} results"
+                            st.write(f"**{timing.collection}**: {timing.seconds * 1000:.0f} ms, {status}")
+                st.session_state.active_turn = None
+
+                # An answer from a turn where a collection couldn't be searched is incomplete: don't reuse it
+                degraded = any(timing.error for timing in turn_result.collection_timings)
+                if cacheable and full_response and not turn_result.cancelled and not degraded:
+                    answer_cache.store(scope, versions, str(prompt), question_embedding,
+                                       [doc.id for doc in turn_result.docs if doc.id], full_response)
 
         # Add assistant response to chat history with the complete text
         st.session_state.messages.append({"role": "assistant", "content": full_response})
 
+        # Fold turns that left the verbatim window into the summary once the answer is shown
+        memory.compress(llm, transcript + [st.session_state.messages[-1]])
+
 def clear_all():
+    if st.session_state.get("active_turn") is not None:
+        st.session_state.active_turn.cancel()
+        st.session_state.active_turn = None
     st.session_state.messages = []
+    st.session_state.memory = ConversationMemory()
     st.session_state.selected_collection = None
     st.session_state.collection_selector = "None"
     st.rerun()
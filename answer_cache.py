@@ -0,0 +1,169 @@
+# Persistent semantic answer cache. Answers are stored with the embedding of the question that produced
+# them and the versions of the collections they were retrieved from, so a near-identical question against
+# unchanged collections is answered instantly without retrieval or generation. Any ingest or delete bumps
+# a collection version and makes the cached answers for it unreachable.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import metrics
+
+ANSWER_CACHE_FILENAME = "docuchat_answers.sqlite3"
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_MAX_ANSWERS = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    question TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    chunk_ids TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_by_scope ON answers (scope, versions);
+CREATE INDEX IF NOT EXISTS answers_by_use ON answers (last_used);
+"""
+
+
+@dataclass
+class CachedAnswer:
+    """An answer served from the cache."""
+    question: str
+    answer: str
+    chunk_ids: List[str]
+    similarity: float
+
+
+def answer_scope(collection_names: List[str], **settings) -> str:
+    """Build the scope an answer is valid in.
+
+    Answers are only reused for the same collections and the same model and retrieval settings.
+
+    Args:
+        collection_names: Collections the context was retrieved from
+        **settings: Anything else the answer depends on, e.g. model name and number of results
+
+    Returns:
+        str: A stable string identifying the scope
+    """
+    return json.dumps({"collections": sorted(collection_names), **settings}, sort_keys=True)
+
+
+class AnswerCache:
+    def __init__(self, persist_dir: str, max_answers: int = DEFAULT_MAX_ANSWERS):
+        """Open (or create) the answer cache stored next to the Chroma data.
+
+        Args:
+            persist_dir: Directory for persistent storage
+            max_answers: Number of answers kept; the least recently used ones are evicted first
+        """
+        os.makedirs(persist_dir, exist_ok=True)
+        self.path = os.path.join(persist_dir, ANSWER_CACHE_FILENAME)
+        self.max_answers = max_answers
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        metrics.register_cache(self.stats)
+
+    def lookup(self, scope: str, versions: Dict[str, int], embedding: List[float],
+               threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> Optional[CachedAnswer]:
+        """Find the answer to the most similar cached question in the same scope.
+
+        Answers stored for older collection versions are deleted on the way.
+
+        Args:
+            scope: Scope from answer_scope()
+            versions: Current version of every collection in the scope
+            embedding: Embedding of the new question
+            threshold: Minimum cosine similarity between the questions
+
+        Returns:
+            Optional[CachedAnswer]: The cached answer, or None if no question is similar enough
+        """
+        versions_key = json.dumps(versions, sort_keys=True)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers WHERE scope = ? AND versions != ?", (scope, versions_key))
+            rows = self._conn.execute(
+                "SELECT id, question, embedding, chunk_ids, answer FROM answers WHERE scope = ? AND versions = ?",
+                (scope, versions_key)
+            ).fetchall()
+
+            best = None
+            if rows:
+                query = np.asarray(embedding, dtype=np.float32)
+                matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+                similarities = matrix @ query / np.where(norms > 0, norms, 1.0)
+                i = int(np.argmax(similarities))
+                if similarities[i] >= threshold:
+                    best = (rows[i], float(similarities[i]))
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            row, similarity = best
+            self._conn.execute(
+                "UPDATE answers SET last_used = ?, hits = hits + 1 WHERE id = ?", (time.time(), row[0])
+            )
+            self.hits += 1
+        return CachedAnswer(question=row[1], answer=row[4], chunk_ids=json.loads(row[3]), similarity=similarity)
+
+    def store(self, scope: str, versions: Dict[str, int], question: str, embedding: List[float],
+              chunk_ids: List[str], answer: str):
+        """Cache an answer, evicting the least recently used answers beyond the size limit.
+
+        Args:
+            scope: Scope from answer_scope()
+            versions: Version of every collection in the scope when the context was retrieved
+            question: The question as asked
+            embedding: Embedding of the question
+            chunk_ids: IDs of the chunks the answer was generated from
+            answer: The complete answer
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO answers (scope, versions, question, embedding, chunk_ids, answer, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, json.dumps(versions, sort_keys=True), question,
+                 np.asarray(embedding, dtype=np.float32).tobytes(), json.dumps(chunk_ids), answer, now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (self.max_answers,)
+            )
+
+    def clear(self):
+        """Drop every cached answer. Hit and miss counters are kept."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers")
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters for display, in the same shape as TTLCache.stats()."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "cache": "answers",
+                "entries": entries,
+                "max_entries": self.max_answers,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
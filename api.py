@@ -0,0 +1,676 @@
+# Headless HTTP API. One process serves search, chat, ingestion and statistics to any number of clients,
+# sharing the warm embedding model, Chroma client, caches and LLM connection from resources.py instead of
+# loading them once per browser session. Requests run on their own threads but only a fixed number do work
+# at a time; the rest wait in a bounded queue and are turned away with 503 once it is full. Chat answers and
+# ingestion progress are streamed as server-sent events.
+
+import asyncio
+import base64
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import toml
+
+import metrics
+from answer_cache import DEFAULT_SIMILARITY_THRESHOLD, answer_scope
+from context import DEFAULT_CONTEXT_TOKENS, build_context
+from docstore import ChromaDocStore
+from federated import federated_search
+from ingest import DEFAULT_EMBED_BATCH_SIZE, IngestEngine
+from ledger import hash_file
+from memory import DEFAULT_MEMORY_TURNS, ConversationMemory
+from mock_llm import (
+    DEFAULT_MOCK_ANSWER_TOKENS,
+    DEFAULT_MOCK_FIRST_TOKEN_DELAY,
+    DEFAULT_MOCK_TOKENS_PER_SECOND,
+    MOCK_MODEL_NAME,
+    MockChatModel,
+)
+from parsing import DEFAULT_PARSE_WORKERS, parse_paths, parse_uploads
+from pipeline import DEFAULT_KEEP_ALIVE, ChatTurn, system_prompt, warm_up
+from rerank import rerank
+from resources import DEFAULT_PERSIST_DIR, resource_metrics
+from retrieval import embed_query
+
+DEFAULT_API_HOST = "127.0.0.1"
+DEFAULT_API_PORT = 8765
+DEFAULT_API_WORKERS = 4
+DEFAULT_API_QUEUE = 32
+DEFAULT_QUEUE_TIMEOUT = 30.0
+DEFAULT_K = 10
+# Largest request body accepted, so a client can't make the server buffer unbounded data
+MAX_REQUEST_MB = 256
+
+_SECRETS_PATH = ".streamlit/secrets.toml"
+
+
+class ApiError(Exception):
+    """An error reported to the client with an HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class WorkerLimiter:
+    def __init__(self, workers: int = DEFAULT_API_WORKERS, max_queue: int = DEFAULT_API_QUEUE,
+                 timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        """Limit how many requests do work at once and how many may wait for a turn.
+
+        Args:
+            workers: Requests processed concurrently
+            max_queue: Requests allowed to wait; more are rejected immediately
+            timeout: Seconds a request waits for a worker before it is rejected
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a worker for the duration of the block.
+
+        Raises:
+            ApiError: 503 if the queue is full or no worker became free in time
+        """
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                metrics.count("api_requests_rejected", reason="queue_full")
+                raise ApiError(503, "Server busy, try again later")
+            self.waiting += 1
+
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.active += 1
+            else:
+                self.rejected += 1
+        metrics.observe("api.queue_wait", time.perf_counter() - start)
+        if not acquired:
+            metrics.count("api_requests_rejected", reason="timeout")
+            raise ApiError(503, "Server busy, try again later")
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.served += 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """Return the current load for display."""
+        with self._lock:
+            return {"workers": self.workers, "active": self.active, "waiting": self.waiting,
+                    "max_queue": self.max_queue, "served": self.served, "rejected": self.rejected}
+
+
+def load_chat_model(secrets_path: str = _SECRETS_PATH) -> Tuple[object, str]:
+    """Create the chat model chosen in Settings, the same way the Home page does.
+
+    Args:
+        secrets_path: Path of the secrets file
+
+    Returns:
+        Tuple[object, str]: The chat model and its name
+
+    Raises:
+        ValueError: If the chosen backend isn't configured
+    """
+    try:
+        with open(secrets_path, "r") as f:
+            secrets = toml.load(f)
+    except (OSError, toml.TomlDecodeError):
+        secrets = {}
+
+    mock = secrets.get("mock_llm", {})
+    if mock.get("mock_flag", 0) == 1:
+        return MockChatModel(
+            answer_tokens=int(mock.get("answer_tokens", DEFAULT_MOCK_ANSWER_TOKENS)),
+            first_token_delay=float(mock.get("first_token_delay", DEFAULT_MOCK_FIRST_TOKEN_DELAY)),
+            tokens_per_second=float(mock.get("tokens_per_second", DEFAULT_MOCK_TOKENS_PER_SECOND))
+        ), MOCK_MODEL_NAME
+
+    ollama = secrets.get("ollama", {})
+    if ollama.get("ollama_flag", 0) == 1:
+        model = (ollama.get("default_model") or "").strip()
+        if not model:
+            raise ValueError("Local Mode is on but no Ollama model is selected in Settings")
+        from langchain_ollama import ChatOllama
+        return ChatOllama(model=model, base_url=ollama.get("endpoint") or None, temperature=0.3,
+                          num_predict=500, keep_alive=DEFAULT_KEEP_ALIVE), model
+
+    api_key = (secrets.get("api_keys", {}).get("openai") or "").strip()
+    if not api_key:
+        raise ValueError("No OpenAI API key is set in Settings")
+    from langchain_openai import ChatOpenAI
+    model = "gpt-4.1-mini"
+    return ChatOpenAI(model=model, temperature=0.3, api_key=api_key), model
+
+
+def _number(body: dict, name: str, default, cast=int, minimum: float = 0):
+    """Read a numeric field of a request body.
+
+    Raises:
+        ApiError: 400 if the field isn't a number of the right type or is below the minimum
+    """
+    value = body.get(name)
+    if value is None:
+        return default
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"'{name}' must be a number")
+    if cast is int and isinstance(value, float) and not value.is_integer():
+        raise ApiError(400, f"'{name}' must be a whole number")
+    if number < minimum:
+        raise ApiError(400, f"'{name}' must be at least {minimum}")
+    return number
+
+
+def _history(body: dict) -> List[dict]:
+    """Read the "history" field of a chat request: user and assistant messages with text content.
+
+    Raises:
+        ApiError: 400 if it isn't a list of messages
+    """
+    history = body.get("history") or []
+    if not isinstance(history, list) or not all(
+            isinstance(m, dict) and isinstance(m.get("content", ""), str) for m in history):
+        raise ApiError(400, "'history' must be a list of messages with a 'role' and text 'content'")
+    return [m for m in history if m.get("role") in ("user", "assistant")]
+
+
+def _document_json(doc, score: Optional[float] = None) -> dict:
+    result = {
+        "id": doc.id,
+        "source": doc.metadata.get("source"),
+        "collection": doc.metadata.get("collection"),
+        "content": doc.page_content,
+        "metadata": doc.metadata,
+    }
+    if score is not None:
+        result["score"] = score
+    return result
+
+
+def _timing_json(timing) -> dict:
+    return {"collection": timing.collection, "seconds": timing.seconds, "results": timing.results,
+            "error": timing.error}
+
+
+class DocuChatAPI:
+    def __init__(self, persist_dir: str = DEFAULT_PERSIST_DIR, workers: int = DEFAULT_API_WORKERS,
+                 max_queue: int = DEFAULT_API_QUEUE, queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+                 parse_workers: int = DEFAULT_PARSE_WORKERS, batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                 llm=None, llm_model_name: Optional[str] = None, ingest_root: Optional[str] = None):
+        """Create the API service around one shared document store.
+
+        Args:
+            persist_dir: Chroma persist directory
+            workers: Requests processed concurrently
+            max_queue: Requests allowed to wait for a worker
+            queue_timeout: Seconds a request waits for a worker
+            parse_workers: Processes used to parse ingested files
+            batch_size: Chunks per embedding batch during ingestion
+            llm: Chat model, or None to use the one chosen in Settings
+            llm_model_name: Name of llm, used to count tokens
+            ingest_root: Directory whose files may be ingested by path; None only accepts inline files.
+                The API has no authentication, and anything it indexes can be read back through search.
+
+        Raises:
+            ValueError: If the ingest root isn't a directory or the chat model isn't configured
+        """
+        self.ingest_root = os.path.realpath(ingest_root) if ingest_root else None
+        if self.ingest_root and not os.path.isdir(self.ingest_root):
+            raise ValueError(f"Ingest root '{ingest_root}' is not a directory")
+        self.store = ChromaDocStore(persist_dir=persist_dir)
+        self.limiter = WorkerLimiter(workers, max_queue, queue_timeout)
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        if llm is None:
+            llm, llm_model_name = load_chat_model()
+        self.llm = llm
+        self.llm_model_name = llm_model_name
+        self.started_at = time.time()
+        # Ingestion into one collection runs one request at a time; different collections proceed in parallel
+        self._ingest_locks: Dict[str, threading.Lock] = {}
+        self._ingest_locks_lock = threading.Lock()
+
+    def warm(self, log: Callable[[str], None] = print):
+        """Load the embedding model and open every collection now, so the first requests don't pay for it."""
+        with metrics.span("api.warm"):
+            start = time.perf_counter()
+            embed_query(self.store, "warm up")
+            for collection in self.store.list_collections():
+                try:
+                    self.store.get_vector_store(collection.name)
+                    self.store.lexical_index(collection.name)
+                except Exception as e:
+                    log(f"Couldn't open collection '{collection.name}': {e}")
+            asyncio.run(warm_up(self.llm))
+        log(f"Models and collections ready in {time.perf_counter() - start:.1f}s")
+
+    def _collections(self, requested) -> List[str]:
+        """Validate the requested collection names."""
+        available = {c.name for c in self.store.list_collections()}
+        if isinstance(requested, str):
+            requested = [requested]
+        if not requested or not isinstance(requested, list):
+            raise ApiError(400, "'collections' must be a non-empty list of collection names")
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ApiError(404, f"Unknown collections: {', '.join(map(str, unknown))}")
+        return requested
+
+    # ---- Endpoints ----
+
+    def stats(self) -> dict:
+        """Collections, load, stage latencies, counters, caches and loaded resources."""
+        collections = []
+        for collection in self.store.list_collections():
+            collections.append({
+                "name": collection.name,
+                "chunks": self.store.client.get_collection(collection.name).count(),
+                "sources": len(self.store.ledger.sources(collection.name)),
+                "version": self.store.ledger.version(collection.name),
+            })
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "model": self.llm_model_name,
+            "embedding_model": self.store.embedding_config.model_id,
+            "collections": collections,
+            "queue": self.limiter.stats(),
+            "stages": metrics.stage_summary(),
+            "counters": metrics.counters(),
+            "caches": metrics.cache_stats(),
+            "resources": resource_metrics(),
+        }
+
+    def search(self, body: dict) -> dict:
+        """Retrieve the best chunks for a query across collections, optionally reranked."""
+        query = str(body.get("query") or "").strip()
+        if not query:
+            raise ApiError(400, "'query' is required")
+        collections = self._collections(body.get("collections"))
+        k = _number(body, "k", DEFAULT_K, minimum=1)
+        rerank_pool = _number(body, "rerank_pool", 0)
+
+        with metrics.span("api.search"):
+            results, timings = federated_search(self.store, collections, query, max(k, rerank_pool),
+                                                bool(body.get("hybrid", True)))
+            response = {"timings": [_timing_json(t) for t in timings]}
+            if rerank_pool:
+                ranked, rerank_stats = rerank(query, [doc for doc, _ in results], k)
+                results = ranked
+                response["rerank_seconds"] = rerank_stats.seconds
+            response["results"] = [_document_json(doc, score) for doc, score in results[:k]]
+        return response
+
+    def chat(self, body: dict, send_event: Callable[[str, dict], None]) -> None:
+        """Answer a question from the selected collections, streaming events as they happen.
+
+        The client keeps the conversation: earlier messages are passed in "history" and the
+        last few of them are sent to the model verbatim.
+
+        Events: "sources" with the retrieved chunks, "token" for each streamed piece of the
+        answer, and "done" with the complete answer and timings.
+        """
+        question = str(body.get("question") or "").strip()
+        if not question:
+            raise ApiError(400, "'question' is required")
+        collections = self._collections(body.get("collections"))
+        history = _history(body)
+        k = _number(body, "k", DEFAULT_K, minimum=1)
+        hybrid = bool(body.get("hybrid", True))
+        rerank_pool = _number(body, "rerank_pool", 0) or None
+        context_budget = _number(body, "context_budget", DEFAULT_CONTEXT_TOKENS, minimum=1)
+        similarity_threshold = _number(body, "similarity_threshold", DEFAULT_SIMILARITY_THRESHOLD, cast=float)
+        transcript = history + [{"role": "user", "content": question}]
+        memory = ConversationMemory(max_turns=_number(body, "memory_turns", DEFAULT_MEMORY_TURNS),
+                                    model_name=self.llm_model_name)
+
+        # Follow-up questions depend on the earlier turns, so only standalone questions use the answer cache
+        answer_cache = self.store.answer_cache
+        cacheable = bool(body.get("use_cache", True)) and not history
+        if cacheable:
+            scope = answer_scope(collections, model=self.llm_model_name, k=k, hybrid=hybrid,
+                                 rerank_pool=rerank_pool, context_budget=context_budget)
+            versions = {name: self.store.ledger.version(name) for name in collections}
+            question_embedding = embed_query(self.store, question)
+            cached = answer_cache.lookup(scope, versions, question_embedding, similarity_threshold)
+            if cached is not None:
+                metrics.count("api_chat_cache_hits")
+                send_event("done", {"answer": cached.answer, "cached": True, "similarity": cached.similarity,
+                                    "cached_question": cached.question, "chunk_ids": cached.chunk_ids})
+                return
+
+        def build_messages(docs):
+            context, _ = build_context(docs, context_budget, self.llm_model_name)
+            send_event("sources", {"sources": [_document_json(doc) for doc in docs]})
+            return memory.build_messages(system_prompt(context), transcript)
+
+        turn = ChatTurn(self.llm, self.store, collections, question, k, build_messages,
+                        hybrid=hybrid, rerank_pool=rerank_pool)
+        pieces = []
+        started = time.perf_counter()
+        first_token = []
+
+        def on_token(text: str):
+            if not first_token:
+                first_token.append(time.perf_counter() - started)
+            pieces.append(text)
+            try:
+                send_event("token", {"text": text})
+            except OSError:
+                # The client went away: stop generating
+                turn.cancel()
+
+        result = turn.run(on_token)
+        answer = "".join(pieces)
+        # An answer from a turn where a collection couldn't be searched is incomplete: don't reuse it
+        degraded = any(timing.error for timing in result.collection_timings)
+        if cacheable and answer and not result.cancelled and not degraded:
+            answer_cache.store(scope, versions, question, question_embedding,
+                               [doc.id for doc in result.docs if doc.id], answer)
+        if not result.cancelled:
+            send_event("done", {
+                "answer": answer,
+                "cached": False,
+                "retrieval_seconds": result.retrieval_seconds,
+                "rerank_seconds": result.rerank.seconds if result.rerank else None,
+                "time_to_first_token": first_token[0] if first_token else None,
+                "total_seconds": time.perf_counter() - started,
+                "timings": [_timing_json(t) for t in result.collection_timings],
+            })
+
+    def _ingest_lock(self, collection_name: str) -> threading.Lock:
+        with self._ingest_locks_lock:
+            return self._ingest_locks.setdefault(collection_name, threading.Lock())
+
+    def _server_path(self, path: str) -> str:
+        """Resolve a path given in an ingest request against the ingest root.
+
+        Raises:
+            ApiError: 403 if the path is outside the ingest root, 400 if it isn't a file
+        """
+        resolved = os.path.realpath(os.path.join(self.ingest_root, path))
+        if os.path.commonpath([resolved, self.ingest_root]) != self.ingest_root:
+            raise ApiError(403, f"Outside the ingest root: {path}")
+        if not os.path.isfile(resolved):
+            raise ApiError(400, f"Not a file on the server: {path}")
+        return resolved
+
+    def ingest(self, body: dict, send_event: Callable[[str, dict], None]) -> None:
+        """Add files to a collection, creating it if needed, and stream a "file" event per parsed file.
+
+        Files are given either as paths on the server ("paths", relative to the ingest root or
+        absolute inside it) or inline as base64 ("files", each with "name" and "content"), and are
+        recorded under their base name, which must be unique within the request. Files already
+        indexed with the same content are skipped, and files that can't be read are reported as
+        failed without stopping the others.
+        A "done" event reports the totals.
+        """
+        name = str(body.get("collection") or "").strip()
+        if not name:
+            raise ApiError(400, "'collection' is required")
+        paths = body.get("paths") or []
+        files = body.get("files") or []
+        if not paths and not files:
+            raise ApiError(400, "Give the files to ingest in 'paths' or 'files'")
+        if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+            raise ApiError(400, "'paths' must be a list of file paths")
+        if not isinstance(files, list) or not all(isinstance(file, dict) for file in files):
+            raise ApiError(400, "'files' must be a list of objects with a 'name' and base64 'content'")
+
+        uploads = []
+        for file in files:
+            try:
+                data = base64.b64decode(file["content"], validate=True)
+            except (KeyError, TypeError, ValueError):
+                raise ApiError(400, "Each entry of 'files' needs a 'name' and base64 'content'")
+            uploads.append(SimpleNamespace(name=os.path.basename(str(file.get("name") or "")) or "upload",
+                                           getvalue=lambda data=data: data))
+        if paths and self.ingest_root is None:
+            raise ApiError(403, "Ingesting server paths is disabled; send the files inline in 'files' "
+                                "or start the server with --ingest-root")
+        paths = [self._server_path(path) for path in paths]
+        # Files are recorded under their base name, so two files with the same name would replace each other
+        names = [os.path.basename(path) for path in paths] + [upload.name for upload in uploads]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ApiError(400, f"Several files are named {', '.join(duplicates)}; ingest them in separate requests "
+                                f"or collections")
+
+        # Lock the collection before opening it, so a second ingestion can't disturb one in progress
+        collection_name = self.store.resolve_collection_name(name)
+        ledger = self.store.ledger
+        counts = {"parsed": 0, "skipped": 0, "failed": 0}
+
+        def pending_paths():
+            for path in paths:
+                source = os.path.basename(path)
+                try:
+                    file_hash = hash_file(path)
+                except OSError as e:
+                    # e.g. permission denied, or removed since the request was checked
+                    counts["failed"] += 1
+                    send_event("file", {"source": source, "error": str(e)})
+                    continue
+                if ledger.file_hash(collection_name, source) == file_hash:
+                    counts["skipped"] += 1
+                    continue
+                yield path, source, file_hash
+
+        with self._ingest_lock(collection_name), metrics.span("api.ingest"):
+            collection_name = self.store.open_collection(collection_name)
+            engine = IngestEngine(self.store.get_vector_store(collection_name), ledger, collection_name,
+                                  self.store.lexical_index(collection_name),
+                                  embedding_cache=self.store.embedding_cache, batch_size=self.batch_size)
+            with engine:
+                chunking = self.store.chunking_settings(collection_name)
+                parsed_files = parse_paths(pending_paths(), max_workers=self.parse_workers, chunking=chunking)
+                if uploads:
+                    parsed_files = itertools.chain(
+                        parsed_files, parse_uploads(uploads, max_workers=self.parse_workers, chunking=chunking)
+                    )
+                for parsed in parsed_files:
+                    if not parsed.ok:
+                        counts["failed"] += 1
+                        send_event("file", {"source": parsed.source, "error": parsed.error})
+                        continue
+                    counts["parsed"] += 1
+                    send_event("file", {"source": parsed.source, "chunks": len(parsed.docs),
+                                        "seconds": parsed.seconds})
+                    engine.add_file(parsed.source, parsed.file_hash, parsed.docs, parsed.parents)
+
+        for result in engine.results:
+            if result.error:
+                counts["failed"] += 1
+                send_event("file", {"source": result.source, "error": result.error})
+        stats = engine.stats
+        send_event("done", {
+            "collection": collection_name,
+            **counts,
+            "chunks_embedded": stats.chunks_embedded,
+            "vectors_from_cache": stats.vectors_from_cache,
+            "chunks_removed": stats.chunks_removed,
+            "seconds": stats.elapsed,
+        })
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "APIServer"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, body, status: int = 200):
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_text(self, text: str, content_type: str):
+        payload = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_MB * 1024 * 1024:
+            # The body is left unread, so it can't be followed by another request on this connection
+            self.close_connection = True
+            raise ApiError(413, f"Request body larger than {MAX_REQUEST_MB} MB")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        return body
+
+    def _stream_events(self, handler: Callable[[Callable[[str, dict], None]], None]):
+        """Run an endpoint that reports server-sent events; errors become an "error" event once streaming."""
+        started = []
+
+        def send_event(event: str, data: dict):
+            if not started:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                started.append(True)
+            payload = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            handler(send_event)
+        except OSError:
+            # The client disconnected mid-stream
+            self.close_connection = True
+            return
+        except Exception as e:
+            # Before the first event the error can still be sent as a normal JSON response
+            if not started:
+                raise
+            send_event("error", {"error": str(e), "status": getattr(e, "status", 500)})
+        if not started:
+            send_event("done", {})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _handle(self, method: str):
+        path = urlparse(self.path).path.rstrip("/") or "/"
+        api = self.server.api
+        start = time.perf_counter()
+        status = 200
+        try:
+            if method == "GET" and path == "/health":
+                self._send_json({"status": "ok"})
+            elif method == "GET" and path == "/stats":
+                self._send_json(api.stats())
+            elif method == "GET" and path == "/metrics":
+                self._send_text(metrics.export_openmetrics(), "application/openmetrics-text; version=1.0.0")
+            elif method == "POST" and path == "/search":
+                body = self._read_json()
+                with api.limiter.slot():
+                    self._send_json(api.search(body))
+            elif method == "POST" and path == "/chat":
+                body = self._read_json()
+                with api.limiter.slot():
+                    if body.get("stream", True):
+                        self._stream_events(lambda send_event: api.chat(body, send_event))
+                    else:
+                        events = {}
+                        api.chat(body, lambda event, data: events.__setitem__(event, data))
+                        self._send_json({**events.get("done", {}), **events.get("sources", {})})
+            elif method == "POST" and path == "/ingest":
+                body = self._read_json()
+                with api.limiter.slot():
+                    if body.get("stream", True):
+                        self._stream_events(lambda send_event: api.ingest(body, send_event))
+                    else:
+                        files = []
+                        done = {}
+
+                        def collect(event, data):
+                            if event == "file":
+                                files.append(data)
+                            else:
+                                done.update(data)
+
+                        api.ingest(body, collect)
+                        self._send_json({**done, "files": files})
+            else:
+                status = 404
+                self._send_json({"error": f"Not found: {method} {path}"}, status=404)
+        except ApiError as e:
+            status = e.status
+            self._send_json({"error": str(e)}, status=e.status)
+        except (BrokenPipeError, ConnectionResetError):
+            status = 499
+            self.close_connection = True
+        except Exception as e:
+            status = 500
+            self._send_json({"error": str(e)}, status=500)
+        finally:
+            metrics.observe("api.request", time.perf_counter() - start, endpoint=path)
+            metrics.count("api_requests", endpoint=path, status=status)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, api: DocuChatAPI, host: str = DEFAULT_API_HOST, port: int = DEFAULT_API_PORT,
+                 verbose: bool = False):
+        """Create the HTTP server for an API service.
+
+        Args:
+            api: The service answering the requests
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+            verbose: Log every request to standard error
+        """
+        super().__init__((host, port), _APIHandler)
+        self.api = api
+        self.verbose = verbose
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
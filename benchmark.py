@@ -0,0 +1,342 @@
+# Reproducible performance benchmark. Synthetic documents are generated from a seeded vocabulary into a
+# scratch directory, then parsing, embedding and upserting throughput, retrieval latency percentiles at
+# several collection sizes and end-to-end chat-turn latency against the mock LLM are measured. Nothing needs
+# the network: models are only loaded from the local cache, or replaced by hash embeddings. Results are
+# returned as a JSON-serializable dict so runs can be compared.
+
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from context import DEFAULT_CONTEXT_TOKENS, build_context
+from docstore import ChromaDocStore
+from federated import federated_search
+from ingest import DEFAULT_EMBED_BATCH_SIZE, IngestEngine
+from ledger import hash_text
+from memory import ConversationMemory
+from mock_llm import MOCK_MODEL_NAME, MockChatModel
+from parsing import DEFAULT_PARSE_WORKERS, build_documents, parse_paths
+from pipeline import ChatTurn, system_prompt
+from resources import invalidate_collection
+from retrieval import query_embedding_cache, result_cache
+
+BENCH_COLLECTION = "benchmark"
+DEFAULT_BENCH_DOCS = 20
+DEFAULT_BENCH_WORDS = 2000
+DEFAULT_BENCH_SIZES = (1000, 5000, 20000)
+DEFAULT_BENCH_QUERIES = 50
+DEFAULT_BENCH_TURNS = 10
+DEFAULT_BENCH_K = 10
+HASH_EMBEDDING_SIZE = 384
+
+# Words per chunk when topping up a collection without going through the parser
+_SYNTHETIC_CHUNK_WORDS = 120
+
+
+class _BenchStore(ChromaDocStore):
+    """Document store in a scratch directory that can use hash embeddings instead of a model."""
+
+    def __init__(self, persist_dir: str, hash_embeddings: bool):
+        super().__init__(persist_dir)
+        self._hash_embeddings = None
+        self._vector_stores = {}
+        if hash_embeddings:
+            from langchain_core.embeddings import DeterministicFakeEmbedding
+            self._hash_embeddings = DeterministicFakeEmbedding(size=HASH_EMBEDDING_SIZE)
+
+    @property
+    def embeddings(self):
+        return self._hash_embeddings or super().embeddings
+
+    def get_vector_store(self, collection_name: str) -> Chroma:
+        if self._hash_embeddings is None:
+            return super().get_vector_store(collection_name)
+        if collection_name not in self._vector_stores:
+            self._vector_stores[collection_name] = Chroma(
+                collection_name=collection_name, embedding_function=self._hash_embeddings, client=self.client
+            )
+        return self._vector_stores[collection_name]
+
+
+def _vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    syllables = ["ka", "lo", "mi", "ten", "ra", "sol", "vin", "dor", "pe", "qua", "zu", "bel", "fin", "gro", "hap"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+def _sentence(rng: random.Random, vocabulary: List[str]) -> str:
+    words = rng.choices(vocabulary, k=rng.randint(6, 20))
+    return " ".join(words).capitalize() + "."
+
+
+def generate_documents(directory: str, count: int, words_per_doc: int, seed: int = 0) -> List[str]:
+    """Write synthetic plain-text documents with headings and paragraphs.
+
+    Args:
+        directory: Directory to write the files into
+        count: Number of documents
+        words_per_doc: Approximate number of words in each document
+        seed: Random seed; the same seed always produces the same documents
+
+    Returns:
+        List[str]: Paths of the generated files
+    """
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    paths = []
+    for i in range(count):
+        lines = []
+        words = 0
+        section = 0
+        while words < words_per_doc:
+            section += 1
+            lines.append(f"Section {section}: {' '.join(rng.choices(vocabulary, k=3)).title()}\n")
+            for _ in range(rng.randint(2, 5)):
+                paragraph = " ".join(_sentence(rng, vocabulary) for _ in range(rng.randint(3, 8)))
+                words += len(paragraph.split())
+                lines.append(paragraph + "\n")
+        path = os.path.join(directory, f"document_{i:05d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        paths.append(path)
+    return paths
+
+
+def _synthetic_chunks(rng: random.Random, vocabulary: List[str], count: int, start: int) -> Iterator[List[Document]]:
+    """Yield synthetic chunks grouped into files of 50, numbered from start."""
+    for file_start in range(start, start + count, 50):
+        texts = [
+            " ".join(_sentence(rng, vocabulary) for _ in range(_SYNTHETIC_CHUNK_WORDS // 12))
+            for _ in range(min(50, start + count - file_start))
+        ]
+        source = f"synthetic_{file_start // 50:05d}.txt"
+        yield build_documents([Document(page_content=text) for text in texts], source, hash_text("\n".join(texts)))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples in milliseconds.
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Dict[str, float]: Count, mean, p50, p95, p99 and max, in milliseconds
+    """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def nearest_rank(p: float) -> float:
+        return ordered[min(len(ordered), max(1, math.ceil(p / 100 * len(ordered)))) - 1] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": nearest_rank(50),
+        "p95_ms": nearest_rank(95),
+        "p99_ms": nearest_rank(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def _clear_retrieval_caches():
+    for cache in (query_embedding_cache, result_cache):
+        cache.clear()
+
+
+def run_benchmark(docs: int = DEFAULT_BENCH_DOCS, words_per_doc: int = DEFAULT_BENCH_WORDS,
+                  sizes: List[int] = DEFAULT_BENCH_SIZES, queries: int = DEFAULT_BENCH_QUERIES,
+                  turns: int = DEFAULT_BENCH_TURNS, k: int = DEFAULT_BENCH_K,
+                  workers: int = DEFAULT_PARSE_WORKERS, batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                  hash_embeddings: bool = False, stub_first_token_delay: float = 0.0,
+                  stub_token_delay: float = 0.0, sessions: int = 1, llm_url: Optional[str] = None,
+                  llm_model: str = MOCK_MODEL_NAME, seed: int = 0, work_dir: Optional[str] = None,
+                  log=print) -> dict:
+    """Run the whole benchmark in a scratch directory and return its results.
+
+    Args:
+        docs: Number of synthetic documents parsed and ingested
+        words_per_doc: Approximate words per document
+        sizes: Collection sizes (in chunks) at which retrieval latency is measured
+        queries: Distinct queries timed per size and retrieval mode
+        turns: Chat turns timed against the mock model
+        k: Number of chunks retrieved per query
+        workers: Parsing processes
+        batch_size: Chunks per embedding batch
+        hash_embeddings: Use deterministic hash embeddings instead of the configured model
+        stub_first_token_delay: Seconds the in-process mock model waits before its first token
+        stub_token_delay: Seconds the in-process mock model waits between tokens
+        sessions: Chat turns run concurrently, each like a separate browser session
+        llm_url: Stream answers over HTTP from this Ollama-compatible server (e.g. docuchat.py mock-llm)
+            instead of the in-process mock model
+        llm_model: Model requested from llm_url
+        seed: Random seed for documents and queries
+        work_dir: Scratch directory to use (kept afterwards), or None for a temporary one
+        log: Called with a progress line for each step
+
+    Returns:
+        dict: Environment, parameters and measurements, ready to be written as JSON
+    """
+    # Everything runs offline: models come from the local cache and telemetry is off
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    os.environ.setdefault("DO_NOT_TRACK", "true")
+    os.environ.setdefault("SCARF_NO_ANALYTICS", "true")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+    scratch = work_dir or tempfile.mkdtemp(prefix="docuchat-bench-")
+    docs_dir = os.path.join(scratch, "documents")
+    persist_dir = os.path.join(scratch, "chroma")
+    os.makedirs(docs_dir, exist_ok=True)
+
+    store = _BenchStore(persist_dir, hash_embeddings)
+    results = {
+        "created_at": datetime.utcnow().isoformat(),
+        "environment": _environment(),
+        "parameters": {
+            "docs": docs, "words_per_doc": words_per_doc, "sizes": sorted(sizes), "queries": queries,
+            "turns": turns, "k": k, "workers": workers, "batch_size": batch_size,
+            "embeddings": "hash" if hash_embeddings else store.embedding_config.key,
+            "stub_first_token_delay": stub_first_token_delay, "stub_token_delay": stub_token_delay,
+            "sessions": sessions, "llm": f"{llm_model} at {llm_url}" if llm_url else "in-process mock",
+            "seed": seed,
+        },
+    }
+    try:
+        # Parsing
+        log(f"Generating {docs} documents of ~{words_per_doc} words")
+        paths = generate_documents(docs_dir, docs, words_per_doc, seed)
+        log(f"Parsing with {workers} workers")
+        start = time.perf_counter()
+        parsed_files = list(parse_paths(((path, os.path.basename(path), None) for path in paths), workers))
+        parse_seconds = time.perf_counter() - start
+        failed = [parsed for parsed in parsed_files if not parsed.ok]
+        if failed:
+            raise RuntimeError(f"Parsing '{failed[0].source}' failed: {failed[0].error}")
+        parse_bytes = sum(os.path.getsize(path) for path in paths)
+        parse_chunks = sum(len(parsed.docs) for parsed in parsed_files)
+        results["parse"] = {
+            "files": len(parsed_files),
+            "bytes": parse_bytes,
+            "chunks": parse_chunks,
+            "seconds": parse_seconds,
+            "files_per_second": len(parsed_files) / parse_seconds,
+            "mb_per_second": parse_bytes / 1024 / 1024 / parse_seconds,
+            "chunks_per_second": parse_chunks / parse_seconds,
+        }
+
+        # Embedding and upserting
+        log(f"Embedding and upserting {parse_chunks} chunks")
+        vector_store = store.get_vector_store(BENCH_COLLECTION)
+        lexical_index = store.lexical_index(BENCH_COLLECTION)
+        with IngestEngine(vector_store, store.ledger, BENCH_COLLECTION, lexical_index, batch_size=batch_size) as engine:
+            for parsed in parsed_files:
+                engine.add_file(parsed.source, parsed.file_hash, parsed.docs, parsed.parents)
+        stats = engine.stats
+        results["ingest"] = {
+            "chunks": stats.chunks_embedded,
+            "seconds": stats.elapsed,
+            "embed_seconds": stats.embed_seconds,
+            "upsert_seconds": stats.upsert_seconds,
+            "chunks_per_second": stats.chunks_per_second,
+            "embeddings_per_second": stats.embeddings_per_second,
+            "upserts_per_second": stats.chunks_embedded / stats.upsert_seconds if stats.upsert_seconds else 0.0,
+        }
+
+        # Retrieval latency, growing the collection to each size with synthetic chunks
+        rng = random.Random(seed + 1)
+        vocabulary = _vocabulary(random.Random(seed))
+        chunk_count = vector_store._collection.count()
+        results["retrieval"] = []
+        for size in sorted(sizes):
+            if size > chunk_count:
+                log(f"Growing the collection to {size} chunks")
+                with IngestEngine(vector_store, store.ledger, BENCH_COLLECTION, lexical_index,
+                                  batch_size=batch_size) as engine:
+                    for chunk_docs in _synthetic_chunks(rng, vocabulary, size - chunk_count, chunk_count):
+                        engine.add_file(chunk_docs[0].metadata["source"], chunk_docs[0].metadata["file_hash"], chunk_docs)
+                chunk_count = vector_store._collection.count()
+
+            entry = {"chunks": chunk_count}
+            for mode, hybrid in (("dense", False), ("hybrid", True)):
+                log(f"Timing {queries} {mode} queries at {chunk_count} chunks")
+                _clear_retrieval_caches()
+                samples = []
+                for _ in range(queries):
+                    query = " ".join(rng.choices(vocabulary, k=rng.randint(3, 6)))
+                    start = time.perf_counter()
+                    federated_search(store, [BENCH_COLLECTION], query, k, hybrid)
+                    samples.append(time.perf_counter() - start)
+                entry[mode] = percentiles(samples)
+            results["retrieval"].append(entry)
+
+        # End-to-end chat turns against the mock model, several sessions at a time
+        log(f"Timing {turns} chat turns in {sessions} concurrent session(s)")
+        _clear_retrieval_caches()
+        if llm_url:
+            from langchain_ollama import ChatOllama
+            llm = ChatOllama(model=llm_model, base_url=llm_url)
+        else:
+            llm = MockChatModel(first_token_delay=stub_first_token_delay,
+                                tokens_per_second=1.0 / stub_token_delay if stub_token_delay else 0.0)
+        questions = [" ".join(rng.choices(vocabulary, k=rng.randint(3, 8))) + "?" for _ in range(turns)]
+
+        def timed_turn(question: str):
+            memory = ConversationMemory()
+
+            def build_messages(found):
+                context, _ = build_context(found, DEFAULT_CONTEXT_TOKENS)
+                # The same prompt Home.py and the API send, so prompt size and latency are comparable
+                return memory.build_messages(system_prompt(context), [{"role": "user", "content": question}])
+
+            turn = ChatTurn(llm, store, [BENCH_COLLECTION], question, k, build_messages, hybrid=True)
+            started = time.perf_counter()
+            first = []
+            turn_result = turn.run(lambda chunk: first or first.append(time.perf_counter() - started))
+            total = time.perf_counter() - started
+            return total, first[0] if first else total, turn_result.retrieval_seconds
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, sessions)) as pool:
+            timings = list(pool.map(timed_turn, questions))
+        elapsed = time.perf_counter() - started
+        results["chat_turn"] = {
+            "total": percentiles([t[0] for t in timings]),
+            "time_to_first_token": percentiles([t[1] for t in timings]),
+            "retrieval": percentiles([t[2] for t in timings]),
+            "turns_per_second": len(timings) / elapsed if elapsed else 0.0,
+        }
+    finally:
+        invalidate_collection(BENCH_COLLECTION, persist_dir)
+        if work_dir is None:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return results
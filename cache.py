@@ -0,0 +1,68 @@
+# Small in-process caches shared by every session. Entries expire after a time-to-live and the least
+# recently used entry is evicted once the cache is full.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import metrics
+
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int = 256, ttl: Optional[float] = 600):
+        """Create an LRU cache with an optional time-to-live.
+
+        Args:
+            name: Name shown in the cache statistics
+            maxsize: Maximum number of entries
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.register_cache(self.stats)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value and mark it as recently used, or default on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if the cache is full."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry. Hit and miss counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters for display."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,278 @@
+# Chunking profiles. Each kind of file gets its own chunk sizes, measured in tokens rather than characters:
+# prose is split by section, spreadsheets are packed into a few large chunks instead of one chunk per row
+# group, and slides never share a chunk across slides. A collection can override the profiles, and can
+# index small child chunks while answering from their larger parent section, which is kept in the ledger.
+
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from context import count_tokens
+from ledger import IngestLedger, hash_text, make_chunk_id
+
+# Unstructured sizes chunks in characters; this is the usual ratio for English text
+CHARS_PER_TOKEN = 4
+
+CHUNKING_STRATEGIES = {
+    "by_title": "By section",
+    "basic": "Fill to size",
+}
+
+
+@dataclass(frozen=True)
+class ChunkProfile:
+    """How the files of one kind are cut into chunks."""
+    # Unstructured chunking strategy, see CHUNKING_STRATEGIES
+    strategy: str = "by_title"
+    # Hard limit on the size of a chunk
+    max_tokens: int = 256
+    # Start a new chunk once this size is reached
+    target_tokens: int = 160
+    # Keep merging chunks smaller than this into their neighbour, up to max_tokens
+    combine_under_tokens: int = 64
+    # Size of the parent sections returned for small indexed chunks; 0 indexes and returns the same chunks
+    parent_tokens: int = 0
+    # Never merge chunks from different pages (or slides)
+    page_breaks: bool = False
+
+
+# Profile used for each kind of file unless a collection overrides it
+DEFAULT_PROFILES: Dict[str, ChunkProfile] = {
+    "prose": ChunkProfile(),
+    "tabular": ChunkProfile(strategy="basic", max_tokens=512, target_tokens=400, combine_under_tokens=400),
+    "slides": ChunkProfile(max_tokens=384, target_tokens=256, combine_under_tokens=256, page_breaks=True),
+}
+
+PROFILE_LABELS = {
+    "prose": "Documents (PDF, Word, HTML, text...)",
+    "tabular": "Spreadsheets (Excel, CSV, TSV)",
+    "slides": "Slide decks (PowerPoint)",
+}
+
+_FILE_KINDS = {
+    ".csv": "tabular",
+    ".tsv": "tabular",
+    ".xls": "tabular",
+    ".xlsx": "tabular",
+    ".ppt": "slides",
+    ".pptx": "slides",
+}
+
+# Per-collection overrides: file kind -> profile
+ChunkingSettings = Dict[str, ChunkProfile]
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def file_kind(filename: str) -> str:
+    """Classify a file as "prose", "tabular" or "slides" by its extension."""
+    return _FILE_KINDS.get(os.path.splitext(filename)[1].lower(), "prose")
+
+
+def profile_for(filename: str, settings: Optional[ChunkingSettings] = None) -> ChunkProfile:
+    """Pick the chunking profile for a file.
+
+    Args:
+        filename: Name of the file
+        settings: The collection's overrides, if any
+
+    Returns:
+        ChunkProfile: The collection's profile for this kind of file, or the default one
+    """
+    kind = file_kind(filename)
+    return (settings or {}).get(kind) or DEFAULT_PROFILES[kind]
+
+
+def settings_to_json(settings: ChunkingSettings) -> str:
+    """Serialize a collection's chunking settings for the ledger."""
+    return json.dumps({kind: asdict(profile) for kind, profile in settings.items()}, sort_keys=True)
+
+
+def settings_from_json(text: Optional[str]) -> ChunkingSettings:
+    """Read chunking settings written by settings_to_json(), ignoring unknown kinds and fields."""
+    if not text:
+        return {}
+    fields = set(ChunkProfile.__dataclass_fields__)
+    settings = {}
+    for kind, values in json.loads(text).items():
+        if kind in DEFAULT_PROFILES:
+            settings[kind] = replace(DEFAULT_PROFILES[kind], **{k: v for k, v in values.items() if k in fields})
+    return settings
+
+
+def loader_kwargs(profile: ChunkProfile) -> dict:
+    """Translate a profile into UnstructuredLoader chunking arguments.
+
+    Unstructured's limits are in characters, so they only approximate the token sizes;
+    chunk_documents() then enforces the sizes in tokens.
+    """
+    kwargs = {
+        "chunking_strategy": profile.strategy,
+        "max_characters": profile.max_tokens * CHARS_PER_TOKEN,
+        "new_after_n_chars": profile.target_tokens * CHARS_PER_TOKEN,
+    }
+    if profile.strategy == "by_title":
+        kwargs["combine_text_under_n_chars"] = profile.combine_under_tokens * CHARS_PER_TOKEN
+        kwargs["multipage_sections"] = not profile.page_breaks
+    return kwargs
+
+
+def _split_text(text: str, max_tokens: int) -> List[str]:
+    """Split a text into pieces of at most max_tokens, preferring sentence and line boundaries."""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    units = []
+    for unit in (u.strip() for u in _SENTENCE_RE.split(text)):
+        if not unit:
+            continue
+        tokens = count_tokens(unit)
+        if tokens <= max_tokens:
+            units.append((unit, tokens))
+            continue
+        # A single sentence over the limit (e.g. a table row dump): cut it by words
+        words = unit.split()
+        per_piece = max(1, len(words) * max_tokens // tokens)
+        for i in range(0, len(words), per_piece):
+            piece = " ".join(words[i:i + per_piece])
+            units.append((piece, count_tokens(piece)))
+
+    pieces, current, current_tokens = [], [], 0
+    for unit, tokens in units:
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _pack(items: List[Tuple[str, dict]], target_tokens: int, max_tokens: int, combine_under_tokens: int,
+          page_breaks: bool) -> List[Tuple[str, dict]]:
+    """Merge consecutive small chunks up to the target size, keeping the metadata of the first one."""
+    packed = []
+    current = None
+    for text, metadata in items:
+        tokens = count_tokens(text)
+        if current is not None:
+            same_page = not page_breaks or metadata.get("page_number") == current["metadata"].get("page_number")
+            fits = current["tokens"] + tokens <= target_tokens or (
+                current["tokens"] < combine_under_tokens and current["tokens"] + tokens <= max_tokens)
+            if same_page and fits:
+                current["texts"].append(text)
+                current["tokens"] += tokens
+                continue
+            packed.append(("\n\n".join(current["texts"]), current["metadata"]))
+        current = {"texts": [text], "tokens": tokens, "metadata": metadata}
+    if current is not None:
+        packed.append(("\n\n".join(current["texts"]), current["metadata"]))
+    return packed
+
+
+def chunk_documents(raw_docs: List[Document], profile: ChunkProfile) -> Tuple[List[Document], List[str]]:
+    """Resize loader output to a profile's token sizes.
+
+    Oversized elements are split and small neighbours merged. With parent sections enabled,
+    the elements are first packed into parents of parent_tokens, and each parent is split into
+    child chunks of target_tokens that carry a "parent_index" metadata entry.
+
+    Args:
+        raw_docs: Documents returned by the loader
+        profile: Chunking profile of the file
+
+    Returns:
+        Tuple[List[Document], List[str]]: The chunks to index and the parent section texts
+        (empty without parent sections)
+    """
+    items = []
+    limit = max(profile.max_tokens, profile.parent_tokens)
+    for doc in raw_docs:
+        if not doc.page_content.strip():
+            continue
+        items.extend((piece, dict(doc.metadata)) for piece in _split_text(doc.page_content, limit))
+
+    if not profile.parent_tokens:
+        packed = _pack(items, profile.target_tokens, profile.max_tokens, profile.combine_under_tokens,
+                       profile.page_breaks)
+        return [Document(page_content=text, metadata=metadata) for text, metadata in packed], []
+
+    parents = _pack(items, profile.parent_tokens, profile.parent_tokens, profile.parent_tokens, profile.page_breaks)
+    children = []
+    for parent_index, (text, metadata) in enumerate(parents):
+        for piece in _split_text(text, profile.target_tokens):
+            children.append(Document(page_content=piece, metadata={**metadata, "parent_index": parent_index}))
+    return children, [text for text, _ in parents]
+
+
+def attach_parents(docs: List[Document], parent_texts: List[str], source: str) -> Dict[str, str]:
+    """Give each child chunk the ID of its parent section.
+
+    Args:
+        docs: Chunks built by parsing.build_documents() from chunk_documents() output
+        parent_texts: Parent section texts from chunk_documents()
+        source: Source file name
+
+    Returns:
+        Dict[str, str]: Parent ID -> parent text, to be recorded in the ledger
+    """
+    parent_ids = []
+    occurrences = {}
+    for text in parent_texts:
+        parent_hash = hash_text(text)
+        occurrence = occurrences.get(parent_hash, 0)
+        occurrences[parent_hash] = occurrence + 1
+        parent_ids.append(make_chunk_id(f"{source}\0parent", parent_hash, occurrence))
+
+    for doc in docs:
+        if "parent_index" in doc.metadata:
+            doc.metadata["parent_id"] = parent_ids[doc.metadata["parent_index"]]
+    return dict(zip(parent_ids, parent_texts))
+
+
+def expand_to_parents(ledger: IngestLedger, docs: List[Document],
+                      default_collection: Optional[str] = None) -> List[Document]:
+    """Replace retrieved child chunks with their parent sections.
+
+    Children of the same parent collapse into one parent, at the rank of the best child.
+    Chunks without a parent, or whose parent is missing from the ledger, are kept as they are.
+
+    Args:
+        ledger: Ingestion ledger holding the parent texts
+        docs: Retrieved chunks, best first
+        default_collection: Collection of chunks without a "collection" metadata entry
+
+    Returns:
+        List[Document]: The chunks to show the model, best first
+    """
+    wanted: Dict[str, List[str]] = {}
+    for doc in docs:
+        if doc.metadata.get("parent_id"):
+            collection = doc.metadata.get("collection", default_collection)
+            wanted.setdefault(collection, []).append(doc.metadata["parent_id"])
+    if not wanted:
+        return docs
+    texts = {(collection, parent_id): text
+             for collection, parent_ids in wanted.items()
+             for parent_id, text in ledger.parents(collection, parent_ids).items()}
+
+    expanded = []
+    seen = set()
+    for doc in docs:
+        key = (doc.metadata.get("collection", default_collection), doc.metadata.get("parent_id"))
+        if key not in texts:
+            expanded.append(doc)
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+        metadata = {k: v for k, v in doc.metadata.items() if k not in ("chunk_hash", "parent_id")}
+        # Number parents like chunks, so neighbouring sections are still merged in the context
+        metadata["chunk_index"] = metadata.pop("parent_index")
+        expanded.append(Document(page_content=texts[key], metadata=metadata, id=doc.metadata["parent_id"]))
+    return expanded
@@ -0,0 +1,147 @@
+# Builds the retrieved-context block for the system prompt. Chunks are de-duplicated, packed in rank
+# order up to a token budget, merged with their neighbours from the same source and labelled with their
+# source so the model can cite them.
+
+import functools
+import re
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+DEFAULT_CONTEXT_TOKENS = 3000
+DEFAULT_DUPLICATE_THRESHOLD = 0.85
+_FALLBACK_ENCODING = "cl100k_base"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model_name: Optional[str]):
+    """Load the tiktoken encoding for a model, or None if tiktoken can't provide one offline."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model_name) if model_name else tiktoken.get_encoding(_FALLBACK_ENCODING)
+        except KeyError:
+            # Not an OpenAI model (e.g. an Ollama model): the default encoding is a close enough estimate
+            return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """Count the tokens in a text, estimating 4 characters per token if tiktoken is unavailable.
+
+    Args:
+        text: Text to measure
+        model_name: Model whose tokenizer should be used, if known
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, token_budget: int, model_name: Optional[str] = None) -> str:
+    """Cut a text down to at most token_budget tokens.
+
+    Args:
+        text: Text to shorten
+        token_budget: Maximum number of tokens to keep
+        model_name: Model whose tokenizer should be used, if known
+
+    Returns:
+        str: The text, shortened if it was over budget
+    """
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return text[:token_budget * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= token_budget:
+        return text
+    return encoding.decode(tokens[:token_budget])
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _is_near_duplicate(shingles: set, kept: List[set], threshold: float) -> bool:
+    for other in kept:
+        union = len(shingles | other)
+        if union and len(shingles & other) / union >= threshold:
+            return True
+    return False
+
+
+def build_context(docs: List[Document], token_budget: int = DEFAULT_CONTEXT_TOKENS,
+                  model_name: Optional[str] = None,
+                  duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> Tuple[str, List[Document]]:
+    """Pack retrieved chunks into a context block that fits a token budget.
+
+    Chunks are taken in retrieval order, so the best ones are kept when the budget runs out.
+    Near-duplicates (word-trigram Jaccard similarity at or above the threshold) are dropped.
+    Selected chunks from the same source with consecutive chunk indexes are merged into one
+    passage, and each passage is labelled with its source.
+
+    Args:
+        docs: Retrieved chunks, best first
+        token_budget: Maximum number of tokens for the chunk text
+        model_name: Model whose tokenizer should be used, if known
+        duplicate_threshold: Similarity above which a chunk counts as a duplicate
+
+    Returns:
+        Tuple[str, List[Document]]: The formatted context and the chunks it contains
+    """
+    selected = []
+    kept_shingles = []
+    used_tokens = 0
+    for rank, doc in enumerate(docs):
+        shingles = _shingles(doc.page_content)
+        if _is_near_duplicate(shingles, kept_shingles, duplicate_threshold):
+            continue
+        tokens = count_tokens(doc.page_content, model_name)
+        if used_tokens + tokens > token_budget:
+            continue
+        used_tokens += tokens
+        kept_shingles.append(shingles)
+        selected.append((rank, doc))
+
+    # Group by source, keeping sources in the order of their best-ranked chunk
+    groups = {}
+    for rank, doc in selected:
+        key = (doc.metadata.get("collection"), doc.metadata.get("source", "Unknown"))
+        groups.setdefault(key, []).append((rank, doc))
+
+    passages = []
+    for (collection, source), items in groups.items():
+        if collection:
+            source = f"{source} (collection {collection})"
+        items.sort(key=lambda item: (item[1].metadata.get("chunk_index", float("inf")), item[0]))
+        current = None
+        for _, doc in items:
+            index = doc.metadata.get("chunk_index")
+            if current is not None and index is not None and current["last"] is not None and index == current["last"] + 1:
+                current["texts"].append(doc.page_content)
+                current["last"] = index
+            else:
+                current = {"source": source, "first": index, "last": index, "texts": [doc.page_content]}
+                passages.append(current)
+
+    blocks = []
+    for number, passage in enumerate(passages, start=1):
+        label = f"[{number}] Source: {passage['source']}"
+        if passage["first"] is not None:
+            if passage["first"] == passage["last"]:
+                label += f" (chunk {passage['first']})"
+            else:
+                label += f" (chunks {passage['first']}-{passage['last']})"
+        blocks.append(label + "\n" + "\n".join(passage["texts"]))
+
+    return "\n\n".join(blocks), [doc for _, doc in selected]
@@ -0,0 +1,385 @@
+# Chroma document store. Kept free of Streamlit imports so the command-line tools can use it too.
+
+import os
+import re
+import sqlite3
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+import metrics
+from chunking import ChunkingSettings, settings_from_json, settings_to_json
+from embedding import EmbeddingConfig, load_embedding_config
+from ingest import DEFAULT_EMBED_BATCH_SIZE, IngestEngine, SourceSyncResult
+from lexical import LexicalIndex, lexical_index_path
+
+from resources import (
+    DEFAULT_PERSIST_DIR,
+    get_answer_cache,
+    get_client,
+    get_embedding_cache,
+    get_embeddings,
+    get_ledger,
+    get_lexical_index,
+    get_vector_store,
+    invalidate_collection,
+)
+
+# Chunks fetched and deleted per round trip; well under Chroma's maximum batch size
+DEFAULT_DELETE_BATCH_SIZE = 1000
+CHROMA_DB_FILENAME = "chroma.sqlite3"
+
+
+def _directory_size(path: str) -> int:
+    """Return the total size in bytes of every file under a directory."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+class ChromaDocStore:
+    def __init__(self, persist_dir: str = DEFAULT_PERSIST_DIR, embedding_config: Optional[EmbeddingConfig] = None):
+        """Initialize the Chroma document store.
+
+        The client and embedding model come from the process-wide registry in
+        resources.py, so constructing a store on every rerun is cheap.
+
+        Args:
+            persist_dir: Directory for persistent storage
+            embedding_config: Embedding backend used for the collections, or None to use the
+                one chosen in Settings
+        """
+        with metrics.span("docstore.init"):
+            self.persist_dir = persist_dir
+            self.embedding_config = embedding_config or load_embedding_config()
+            self.model_name = self.embedding_config.model_name
+
+            # Shared Chroma client (the persist directory is created on first use)
+            self.client = get_client(persist_dir)
+
+    @property
+    def ledger(self):
+        """The shared ingestion ledger for this persist directory."""
+        return get_ledger(self.persist_dir)
+
+    @property
+    def answer_cache(self):
+        """The shared semantic answer cache for this persist directory."""
+        return get_answer_cache(self.persist_dir)
+
+    @property
+    def embedding_cache(self):
+        """The shared on-disk cache of vectors computed with this store's embedding model."""
+        return get_embedding_cache(self.embedding_config, self.persist_dir)
+
+    @property
+    def embeddings(self):
+        """The shared embedding model, loaded on first access."""
+        return get_embeddings(self.embedding_config)
+
+    def sanitize_collection_name(self, name: str) -> str:
+        """Sanitize collection name to meet Chroma requirements.
+
+        Args:
+            name: Original collection name
+
+        Returns:
+            str: Sanitized collection name
+        """
+        # Remove file extension
+        name = os.path.splitext(name)[0]
+
+        # Replace special characters and spaces with underscores
+        name = re.sub(r'[^a-zA-Z0-9\-_]', '_', name)
+
+        # Ensure it starts and ends with alphanumeric character
+        name = re.sub(r'^[^a-zA-Z0-9]+', '', name)
+        name = re.sub(r'[^a-zA-Z0-9]+$', '', name)
+
+        # Ensure length is between 3 and 63 characters
+        if len(name) < 3:
+            name = name + "_doc"
+        if len(name) > 63:
+            name = name[:63]
+            # Ensure it ends with alphanumeric
+            name = re.sub(r'[^a-zA-Z0-9]+$', '', name)
+
+        return name
+
+    def list_collections(self) -> List[str]:
+        """List all collections.
+
+        Returns:
+            List[str]: List of collection names
+        """
+        return self.client.list_collections()
+
+    def has_collection(self, name: str) -> bool:
+        """Check whether a collection exists.
+
+        Args:
+            name: Name of the collection
+
+        Returns:
+            bool: True if the collection exists
+        """
+        return name in {c.name for c in self.list_collections()}
+
+    def resolve_collection_name(self, name: str) -> str:
+        """Return the name a user-supplied collection name refers to.
+
+        Args:
+            name: Requested collection name
+
+        Returns:
+            str: The name itself if such a collection exists, otherwise its sanitized form
+        """
+        return name if self.has_collection(name) else self.sanitize_collection_name(name)
+
+    def get_vector_store(self, collection_name: str) -> Chroma:
+        """Get the shared LangChain vector store for a collection.
+
+        Args:
+            collection_name: Name of the collection
+
+        Returns:
+            Chroma: Vector store handle, created if the collection doesn't exist
+
+        Raises:
+            EmbeddingMismatchError: If the collection was built with a different embedding model
+        """
+        return get_vector_store(collection_name, self.embedding_config, self.persist_dir)
+
+    def source_counts(self, collection_name: str, page_size: int = 5000) -> Dict[str, int]:
+        """Count the chunks of every source in a collection without fetching their text.
+
+        Counts come from the ingestion ledger, which is updated on every ingest and delete. If the
+        ledger disagrees with Chroma's chunk count (e.g. for collections built before the ledger
+        existed), it is rebuilt once from a paged, metadata-only scan of the collection. A file keeps
+        its recorded hash only if the ledger already listed all of its chunks; otherwise (e.g. a file
+        whose ingestion failed part-way) no hash is recorded, so the next ingestion parses it again.
+
+        Args:
+            collection_name: Name of the collection
+            page_size: Number of chunks fetched per page when rebuilding
+
+        Returns:
+            Dict[str, int]: Source file name -> number of chunks
+        """
+        collection = self.client.get_collection(collection_name)
+        counts = self.ledger.sources(collection_name)
+        if sum(counts.values()) == collection.count():
+            return counts
+
+        sources = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                source = metadata.get("source", "Unknown")
+                sources.setdefault(source, []).append((chunk_id, metadata.get("chunk_hash", "")))
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+
+        ledger = self.ledger
+        rebuilt = {}
+        for source, chunks in sources.items():
+            complete = counts.get(source) == len(chunks)
+            rebuilt[source] = (ledger.file_hash(collection_name, source) if complete else None, chunks)
+        ledger.replace_collection(collection_name, rebuilt)
+        return {source: len(chunks) for source, chunks in sorted(sources.items())}
+
+    def lexical_index(self, collection_name: str, page_size: int = 1000) -> LexicalIndex:
+        """Get the BM25 index of a collection, rebuilding it if it is out of step with Chroma.
+
+        The ingest engine keeps the index up to date; a rebuild only happens for collections
+        created before the index existed.
+
+        Args:
+            collection_name: Name of the collection
+            page_size: Number of chunks fetched per page when rebuilding
+
+        Returns:
+            LexicalIndex: The collection's lexical index
+        """
+        index = get_lexical_index(collection_name, self.persist_dir)
+        collection = self.client.get_collection(collection_name)
+        if index.count() == collection.count():
+            return index
+
+        index.clear()
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            index.add(
+                Document(page_content=content or "", metadata=metadata or {}, id=chunk_id)
+                for chunk_id, content, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+            )
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+        return index
+
+    def chunking_settings(self, collection_name: str) -> ChunkingSettings:
+        """Get the chunking profiles a collection overrides; file kinds not listed use the defaults."""
+        return settings_from_json(self.ledger.chunking(collection_name))
+
+    def set_chunking_settings(self, collection_name: str, settings: ChunkingSettings):
+        """Save a collection's chunking profiles. They apply to files added or changed from now on.
+
+        Args:
+            collection_name: Name of the collection
+            settings: File kind -> profile; an empty dict goes back to the defaults
+        """
+        self.ledger.set_chunking(collection_name, settings_to_json(settings) if settings else None)
+
+    def create_collection(self, name: str) -> str:
+        """Create a collection from a user-supplied name, or get it if it already exists.
+
+        Cached handles are only dropped when the collection is actually created, so an
+        existing collection stays usable by ingestions and searches running on other threads.
+
+        Args:
+            name: Requested collection name
+
+        Returns:
+            str: The sanitized name of the collection
+        """
+        sanitized_name = self.sanitize_collection_name(name)
+        if not self.has_collection(sanitized_name):
+            # Handles left over from a collection of the same name deleted by another process
+            invalidate_collection(sanitized_name, self.persist_dir, close_lexical_index=False)
+        self.get_vector_store(sanitized_name)
+        return sanitized_name
+
+    def open_collection(self, name: str) -> str:
+        """Open a collection by name, creating it under its sanitized name if it doesn't exist.
+
+        Args:
+            name: Requested collection name
+
+        Returns:
+            str: The name of the collection
+        """
+        if self.has_collection(name):
+            self.get_vector_store(name)
+            return name
+        return self.create_collection(name)
+
+    def delete_collection(self, name: str):
+        """Delete a collection and drop its cached handles.
+
+        Args:
+            name: Name of the collection
+        """
+        self.client.delete_collection(name=name)
+        self.ledger.forget_collection(name)
+        invalidate_collection(name, self.persist_dir)
+        for suffix in ("", "-wal", "-shm"):
+            path = lexical_index_path(self.persist_dir, name) + suffix
+            if os.path.exists(path):
+                os.remove(path)
+
+    def delete_source(self, collection_name: str, source: str, batch_size: int = DEFAULT_DELETE_BATCH_SIZE,
+                      on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """Delete every chunk of a source file in batches.
+
+        Chunk IDs are looked up with a metadata filter one batch at a time, so the whole
+        collection is never loaded and progress can be reported while a large source is removed.
+
+        Args:
+            collection_name: Name of the collection
+            source: Source file name
+            batch_size: Number of chunks deleted per round trip
+            on_progress: Called with (chunks deleted so far, expected total) after each batch
+
+        Returns:
+            int: Number of chunks deleted
+        """
+        collection = self.client.get_collection(collection_name)
+        expected = len(self.ledger.chunk_ids(collection_name, source))
+        deleted = 0
+        while True:
+            ids = collection.get(where={"source": source}, limit=batch_size, include=[])["ids"]
+            if not ids:
+                break
+            collection.delete(ids=ids)
+            deleted += len(ids)
+            if on_progress is not None:
+                on_progress(deleted, max(expected, deleted))
+
+        self.ledger.forget_source(collection_name, source)
+        get_lexical_index(collection_name, self.persist_dir).delete_source(source)
+        return deleted
+
+    def replace_source(self, collection_name: str, source: str, file_hash: str, docs: List[Document],
+                       batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                       parents: Optional[Dict[str, str]] = None) -> SourceSyncResult:
+        """Replace the chunks of one source file in place with a new version of it.
+
+        Chunks whose text didn't change keep their IDs and vectors; only new chunks are
+        embedded and only chunks that disappeared are deleted.
+
+        Args:
+            collection_name: Name of the collection
+            source: Source file name the new chunks belong to
+            file_hash: Content hash of the new version of the file
+            docs: Parsed chunks of the new version
+            batch_size: Number of chunks embedded and upserted together
+            parents: Parent ID -> text of the sections the chunks belong to, if any
+
+        Returns:
+            SourceSyncResult: Chunks added, removed and kept
+        """
+        with IngestEngine(self.get_vector_store(collection_name), self.ledger, collection_name,
+                          self.lexical_index(collection_name), embedding_cache=self.embedding_cache,
+                          batch_size=batch_size) as engine:
+            engine.add_file(source, file_hash, docs, parents)
+        return engine.results[0]
+
+    def compact(self, on_progress: Optional[Callable[[str], None]] = None) -> Tuple[int, int]:
+        """Reclaim the disk space SQLite keeps for deleted chunks.
+
+        SQLite files keep the pages of deleted rows until they are vacuumed. This vacuums only the
+        SQLite files: Chroma's metadata database, the ingestion ledger and every lexical index.
+        Chroma's HNSW segment files (the vectors themselves) are not compacted, so deleted vectors
+        keep their space there. Chroma's database is vacuumed through a separate connection while
+        the shared client stays open, relying on SQLite's locking; Chroma's own writes wait until it
+        finishes, so run it after large deletions rather than while ingesting.
+
+        Args:
+            on_progress: Called with the name of each file before it is vacuumed
+
+        Returns:
+            Tuple[int, int]: Size of the whole persist directory in bytes before and after
+        """
+        before = _directory_size(self.persist_dir)
+
+        if on_progress is not None:
+            on_progress(CHROMA_DB_FILENAME)
+        conn = sqlite3.connect(os.path.join(self.persist_dir, CHROMA_DB_FILENAME), timeout=30)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+        if on_progress is not None:
+            on_progress(os.path.basename(self.ledger.path))
+        self.ledger.vacuum()
+
+        for collection in self.list_collections():
+            if os.path.exists(lexical_index_path(self.persist_dir, collection.name)):
+                if on_progress is not None:
+                    on_progress(f"lexical index of {collection.name}")
+                get_lexical_index(collection.name, self.persist_dir).vacuum()
+
+        return before, _directory_size(self.persist_dir)
@@ -0,0 +1,347 @@
+# Command-line entry point for DocuChat tasks that don't need the browser UI.
+#
+# Usage:
+#   python docuchat.py ingest <dir> --collection <name>
+#   python docuchat.py bench [--output results.json]
+#   python docuchat.py mock-llm [--port 11435]
+#   python docuchat.py serve [--port 8765]
+#   python docuchat.py watch <dir> --collection <name>
+
+import argparse
+import json
+import os
+import sys
+from typing import Optional, Set
+
+from api import (
+    DEFAULT_API_HOST,
+    DEFAULT_API_PORT,
+    DEFAULT_API_QUEUE,
+    DEFAULT_API_WORKERS,
+    DEFAULT_QUEUE_TIMEOUT,
+    APIServer,
+    DocuChatAPI,
+)
+from benchmark import (
+    DEFAULT_BENCH_DOCS,
+    DEFAULT_BENCH_K,
+    DEFAULT_BENCH_QUERIES,
+    DEFAULT_BENCH_SIZES,
+    DEFAULT_BENCH_TURNS,
+    DEFAULT_BENCH_WORDS,
+    run_benchmark,
+)
+from docstore import ChromaDocStore
+from ingest import DEFAULT_EMBED_BATCH_SIZE, IngestEngine
+from ledger import hash_file
+from mock_llm import (
+    DEFAULT_MOCK_ANSWER_TOKENS,
+    DEFAULT_MOCK_FIRST_TOKEN_DELAY,
+    DEFAULT_MOCK_HOST,
+    DEFAULT_MOCK_PORT,
+    DEFAULT_MOCK_TOKENS_PER_SECOND,
+    MOCK_MODEL_NAME,
+    MockLLMServer,
+)
+from parsing import DEFAULT_PARSE_WORKERS, parse_paths
+from resources import DEFAULT_PERSIST_DIR
+from sync import DEFAULT_WATCH_DEBOUNCE, DEFAULT_WATCH_INTERVAL, FolderSync, FolderWatcher, walk_files
+
+
+def parse_extensions(value: str) -> Optional[Set[str]]:
+    """Turn a comma-separated extension list like "pdf,.docx" into {".pdf", ".docx"}, or None if empty."""
+    return {
+        ext if ext.startswith(".") else f".{ext}"
+        for ext in (e.strip().lower() for e in value.split(","))
+        if ext
+    } if value else None
+
+
+def ingest_command(args) -> int:
+    """Index every file under a directory into a collection.
+
+    Files already recorded in the ingestion ledger with the same content hash are skipped,
+    so an interrupted run resumes where it stopped when started again.
+    """
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a directory", file=sys.stderr)
+        return 2
+
+    store = ChromaDocStore(persist_dir=args.persist_dir)
+    collection_name = store.open_collection(args.collection)
+    if collection_name != args.collection:
+        print(f"Using sanitized collection name '{collection_name}'")
+    vector_store = store.get_vector_store(collection_name)
+    ledger = store.ledger
+
+    extensions = parse_extensions(args.extensions)
+
+    counts = {"skipped": 0, "parsed": 0, "failed": 0}
+
+    def pending_files():
+        # Hash files as the walk reaches them and only hand changed files to the parser
+        for path, source in walk_files(args.directory, extensions):
+            try:
+                file_hash = hash_file(path)
+            except OSError as e:
+                counts["failed"] += 1
+                print(f"FAILED  {source}: {e}", file=sys.stderr)
+                continue
+            if ledger.file_hash(collection_name, source) == file_hash:
+                counts["skipped"] += 1
+                continue
+            yield path, source, file_hash
+
+    engine = IngestEngine(vector_store, ledger, collection_name, store.lexical_index(collection_name),
+                          embedding_cache=store.embedding_cache, batch_size=args.batch_size)
+    interrupted = False
+    try:
+        for parsed in parse_paths(pending_files(), max_workers=args.workers,
+                                  chunking=store.chunking_settings(collection_name)):
+            if not parsed.ok:
+                counts["failed"] += 1
+                print(f"FAILED  {parsed.source}: {parsed.error}", file=sys.stderr)
+                continue
+            counts["parsed"] += 1
+            print(f"parsed  {parsed.source}: {len(parsed.docs)} chunks in {parsed.seconds:.1f}s")
+            engine.add_file(parsed.source, parsed.file_hash, parsed.docs, parsed.parents)
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\nInterrupted, finishing queued batches...", file=sys.stderr)
+    finally:
+        stats = engine.close()
+
+    for result in engine.results:
+        if result.error:
+            counts["failed"] += 1
+            print(f"FAILED  {result.source}: {result.error}", file=sys.stderr)
+
+    print()
+    print(f"Collection:     {collection_name}")
+    print(f"Files:          {counts['parsed']} parsed, {counts['skipped']} unchanged, {counts['failed']} failed")
+    print(f"Chunks:         {stats.chunks_seen} seen, {stats.chunks_embedded} embedded "
+          f"({stats.vectors_from_cache} from cache), {stats.chunks_removed} removed")
+    print(f"Batches:        {stats.batches} written, {stats.retries} retries, {stats.failed_batches} failed")
+    print(f"Elapsed:        {stats.elapsed:.1f}s")
+    print(f"Throughput:     {stats.chunks_per_second:.1f} chunks/sec, {stats.embeddings_per_second:.1f} embeddings/sec")
+    if interrupted:
+        print("Run the same command again to resume.")
+        return 130
+    return 1 if counts["failed"] else 0
+
+
+def bench_command(args) -> int:
+    """Run the offline benchmark and write its results as JSON."""
+    try:
+        sizes = sorted({int(size) for size in args.sizes.split(",") if size.strip()})
+    except ValueError:
+        print(f"Error: --sizes must be comma-separated integers, got '{args.sizes}'", file=sys.stderr)
+        return 2
+
+    try:
+        results = run_benchmark(
+            docs=args.docs, words_per_doc=args.words, sizes=sizes, queries=args.queries, turns=args.turns,
+            k=args.k, workers=args.workers, batch_size=args.batch_size, hash_embeddings=args.hash_embeddings,
+            stub_first_token_delay=args.stub_first_token_delay, stub_token_delay=args.stub_token_delay,
+            sessions=args.sessions, llm_url=args.llm_url, llm_model=args.llm_model,
+            seed=args.seed, work_dir=args.work_dir, log=lambda line: print(line, file=sys.stderr)
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: benchmark failed: {e}", file=sys.stderr)
+        return 1
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+
+def mock_llm_command(args) -> int:
+    """Serve the mock model over HTTP until interrupted."""
+    try:
+        server = MockLLMServer(args.host, args.port, answer_tokens=args.answer_tokens,
+                               first_token_delay=args.first_token_delay, tokens_per_second=args.tokens_per_second,
+                               model_name=args.model, verbose=args.verbose)
+    except OSError as e:
+        print(f"Error: can't listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Mock model '{args.model}' listening on {server.url}", file=sys.stderr)
+    print(f"Ollama API: {server.url}/api/chat   OpenAI API: {server.url}/v1/chat/completions", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped", file=sys.stderr)
+    finally:
+        server.server_close()
+    return 0
+
+
+def serve_command(args) -> int:
+    """Serve the HTTP API until interrupted."""
+    try:
+        api = DocuChatAPI(persist_dir=args.persist_dir, workers=args.workers, max_queue=args.queue,
+                          queue_timeout=args.queue_timeout, parse_workers=args.parse_workers,
+                          batch_size=args.batch_size, ingest_root=args.ingest_root)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        server = APIServer(api, args.host, args.port, verbose=args.verbose)
+    except OSError as e:
+        print(f"Error: can't listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+
+    if not args.no_warm:
+        print("Loading models and collections...", file=sys.stderr)
+        try:
+            api.warm(log=lambda line: print(line, file=sys.stderr))
+        except Exception as e:
+            print(f"Warning: warm-up failed, models will load on the first request: {e}", file=sys.stderr)
+    print(f"DocuChat API listening on {server.url} ({args.workers} workers, queue of {args.queue})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped", file=sys.stderr)
+    finally:
+        server.server_close()
+    return 0
+
+
+def _print_sync_result(result) -> None:
+    print(f"Synced in {result.seconds:.1f}s: {len(result.added)} added, {len(result.modified)} updated, "
+          f"{len(result.deleted)} removed, {result.unchanged} unchanged, {len(result.errors)} failed; "
+          f"{result.chunks_embedded} chunks embedded ({result.vectors_from_cache} from cache), "
+          f"{result.chunks_removed} removed")
+
+
+def watch_command(args) -> int:
+    """Keep a collection in sync with a directory, or sync it once with --once."""
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a directory", file=sys.stderr)
+        return 2
+
+    store = ChromaDocStore(persist_dir=args.persist_dir)
+    folder_sync = FolderSync(store, args.collection, args.directory, parse_extensions(args.extensions),
+                             parse_workers=args.workers, batch_size=args.batch_size)
+    if folder_sync.collection_name != args.collection:
+        print(f"Using sanitized collection name '{folder_sync.collection_name}'")
+
+    if args.once:
+        try:
+            result = folder_sync.sync(on_progress=print)
+        except KeyboardInterrupt:
+            print("\nInterrupted. Run the same command again to resume.", file=sys.stderr)
+            return 130
+        _print_sync_result(result)
+        return 1 if result.errors else 0
+
+    watcher = FolderWatcher(folder_sync, interval=args.interval, debounce=args.debounce,
+                            on_result=_print_sync_result, on_progress=print,
+                            on_error=lambda e: print(f"Error: sync failed: {e}", file=sys.stderr))
+    print(f"Watching {folder_sync.directory} for '{folder_sync.collection_name}' (Ctrl+C to stop)")
+    watcher.start()
+    try:
+        watcher.wait()
+    except KeyboardInterrupt:
+        print("\nStopping after the current pass...", file=sys.stderr)
+        watcher.stop()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="docuchat", description="DocuChat command-line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Index a directory tree into a collection")
+    ingest.add_argument("directory", help="Directory to index recursively")
+    ingest.add_argument("--collection", required=True, help="Collection name (created if it doesn't exist)")
+    ingest.add_argument("--persist-dir", default=DEFAULT_PERSIST_DIR, help="Chroma persist directory")
+    ingest.add_argument("--workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Parsing processes")
+    ingest.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Chunks per embedding batch")
+    ingest.add_argument("--extensions", default="", help="Comma-separated extensions to index, e.g. pdf,docx")
+    ingest.set_defaults(func=ingest_command)
+
+    bench = subparsers.add_parser("bench", help="Measure ingestion, retrieval and chat-turn performance offline")
+    bench.add_argument("--docs", type=int, default=DEFAULT_BENCH_DOCS, help="Synthetic documents to parse and ingest")
+    bench.add_argument("--words", type=int, default=DEFAULT_BENCH_WORDS, help="Approximate words per document")
+    bench.add_argument("--sizes", default=",".join(map(str, DEFAULT_BENCH_SIZES)),
+                       help="Comma-separated collection sizes (chunks) at which retrieval is timed")
+    bench.add_argument("--queries", type=int, default=DEFAULT_BENCH_QUERIES, help="Queries timed per size and mode")
+    bench.add_argument("--turns", type=int, default=DEFAULT_BENCH_TURNS, help="Chat turns timed against the mock model")
+    bench.add_argument("--k", type=int, default=DEFAULT_BENCH_K, help="Chunks retrieved per query")
+    bench.add_argument("--workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Parsing processes")
+    bench.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Chunks per embedding batch")
+    bench.add_argument("--hash-embeddings", action="store_true",
+                       help="Use deterministic hash embeddings instead of the configured model")
+    bench.add_argument("--stub-first-token-delay", type=float, default=0.0,
+                       help="Seconds the in-process mock model waits before its first token")
+    bench.add_argument("--stub-token-delay", type=float, default=0.0,
+                       help="Seconds the in-process mock model waits between tokens")
+    bench.add_argument("--sessions", type=int, default=1, help="Chat turns run concurrently")
+    bench.add_argument("--llm-url", help="Stream answers from this Ollama-compatible server instead of the in-process mock")
+    bench.add_argument("--llm-model", default=MOCK_MODEL_NAME, help="Model requested from --llm-url")
+    bench.add_argument("--seed", type=int, default=0, help="Random seed for documents and queries")
+    bench.add_argument("--work-dir", help="Keep the generated documents and collection in this directory")
+    bench.add_argument("--output", help="Write the JSON results to this file instead of standard output")
+    bench.set_defaults(func=bench_command)
+
+    mock = subparsers.add_parser("mock-llm", help="Serve a mock model over the Ollama and OpenAI streaming APIs")
+    mock.add_argument("--host", default=DEFAULT_MOCK_HOST, help="Interface to listen on")
+    mock.add_argument("--port", type=int, default=DEFAULT_MOCK_PORT, help="Port to listen on")
+    mock.add_argument("--model", default=MOCK_MODEL_NAME, help="Model name reported to clients")
+    mock.add_argument("--answer-tokens", type=int, default=DEFAULT_MOCK_ANSWER_TOKENS, help="Tokens streamed per answer")
+    mock.add_argument("--first-token-delay", type=float, default=DEFAULT_MOCK_FIRST_TOKEN_DELAY,
+                      help="Seconds before the first token")
+    mock.add_argument("--tokens-per-second", type=float, default=DEFAULT_MOCK_TOKENS_PER_SECOND,
+                      help="Streaming rate after the first token (0 for no delay)")
+    mock.add_argument("--verbose", action="store_true", help="Log every request")
+    mock.set_defaults(func=mock_llm_command)
+
+    serve = subparsers.add_parser("serve", help="Serve search, chat, ingestion and statistics over HTTP")
+    serve.add_argument("--host", default=DEFAULT_API_HOST, help="Interface to listen on")
+    serve.add_argument("--port", type=int, default=DEFAULT_API_PORT, help="Port to listen on")
+    serve.add_argument("--persist-dir", default=DEFAULT_PERSIST_DIR, help="Chroma persist directory")
+    serve.add_argument("--workers", type=int, default=DEFAULT_API_WORKERS, help="Requests processed concurrently")
+    serve.add_argument("--queue", type=int, default=DEFAULT_API_QUEUE,
+                       help="Requests allowed to wait for a worker before new ones are rejected")
+    serve.add_argument("--queue-timeout", type=float, default=DEFAULT_QUEUE_TIMEOUT,
+                       help="Seconds a request waits for a worker")
+    serve.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Parsing processes for ingestion")
+    serve.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Chunks per embedding batch")
+    serve.add_argument("--ingest-root",
+                       help="Directory whose files clients may ingest by path; without it only inline files are accepted")
+    serve.add_argument("--no-warm", action="store_true", help="Don't load models and collections before serving")
+    serve.add_argument("--verbose", action="store_true", help="Log every request")
+    serve.set_defaults(func=serve_command)
+
+    watch = subparsers.add_parser("watch", help="Keep a collection in sync with a directory")
+    watch.add_argument("directory", help="Directory to mirror recursively")
+    watch.add_argument("--collection", required=True, help="Collection name (created if it doesn't exist)")
+    watch.add_argument("--persist-dir", default=DEFAULT_PERSIST_DIR, help="Chroma persist directory")
+    watch.add_argument("--once", action="store_true", help="Sync once and exit instead of watching")
+    watch.add_argument("--interval", type=float, default=DEFAULT_WATCH_INTERVAL, help="Seconds between checks")
+    watch.add_argument("--debounce", type=float, default=DEFAULT_WATCH_DEBOUNCE,
+                       help="Seconds the directory must stay unchanged before it is synced")
+    watch.add_argument("--workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Parsing processes")
+    watch.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Chunks per embedding batch")
+    watch.add_argument("--extensions", default="", help="Comma-separated extensions to index, e.g. pdf,docx")
+    watch.set_defaults(func=watch_command)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
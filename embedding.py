@@ -0,0 +1,166 @@
+# Embedding backends. The sentence-transformers model can run on plain PyTorch, on ONNX Runtime, or on
+# ONNX Runtime with int8-quantized weights, which is usually the fastest option on a CPU. The backend,
+# encode batch size and thread count are chosen in Settings. Every collection records the model and
+# vector dimension it was built with, so it can't be queried or extended with a different model.
+
+import platform
+from dataclasses import dataclass
+from typing import Optional
+
+import toml
+from langchain_huggingface import HuggingFaceEmbeddings
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_EMBEDDING_BACKEND = "torch"
+DEFAULT_ENCODE_BATCH_SIZE = 32
+# 0 leaves the thread count to the runtime (usually one per core)
+DEFAULT_EMBEDDING_THREADS = 0
+
+EMBEDDING_BACKENDS = {
+    "torch": "PyTorch",
+    "onnx": "ONNX Runtime",
+    "onnx-int8": "ONNX Runtime, int8 quantized",
+}
+
+# Collections created before models were recorded were always embedded with the default model
+LEGACY_EMBEDDING_MODEL = DEFAULT_EMBEDDING_MODEL
+
+_SECRETS_PATH = ".streamlit/secrets.toml"
+
+
+class EmbeddingMismatchError(ValueError):
+    """Raised when a collection is opened with a different embedding model than it was built with."""
+
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    """Which embedding model to run and how."""
+    model_name: str = DEFAULT_EMBEDDING_MODEL
+    backend: str = DEFAULT_EMBEDDING_BACKEND
+    batch_size: int = DEFAULT_ENCODE_BATCH_SIZE
+    threads: int = DEFAULT_EMBEDDING_THREADS
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vectors this configuration produces; batch size and threads don't change them."""
+        return f"{self.model_name} [{self.backend}]"
+
+    @property
+    def key(self) -> str:
+        """Identifies the loaded model in the resource registry and the query-embedding cache."""
+        return f"{self.model_name} [{self.backend}, batch {self.batch_size}, threads {self.threads or 'auto'}]"
+
+
+def load_embedding_config(secrets_path: str = _SECRETS_PATH) -> EmbeddingConfig:
+    """Read the embedding settings saved by the Settings page.
+
+    This doesn't go through Streamlit, so the command-line tools use the same settings as the app.
+
+    Args:
+        secrets_path: Path of the secrets file
+
+    Returns:
+        EmbeddingConfig: The configured backend, or the defaults if nothing is set
+    """
+    try:
+        with open(secrets_path, "r") as f:
+            settings = toml.load(f).get("embeddings", {})
+    except (OSError, toml.TomlDecodeError):
+        settings = {}
+
+    backend = settings.get("backend", DEFAULT_EMBEDDING_BACKEND)
+    return EmbeddingConfig(
+        model_name=settings.get("model", DEFAULT_EMBEDDING_MODEL) or DEFAULT_EMBEDDING_MODEL,
+        backend=backend if backend in EMBEDDING_BACKENDS else DEFAULT_EMBEDDING_BACKEND,
+        batch_size=int(settings.get("batch_size", DEFAULT_ENCODE_BATCH_SIZE)),
+        threads=int(settings.get("threads", DEFAULT_EMBEDDING_THREADS)),
+    )
+
+
+def _quantized_file_name() -> str:
+    """Pick the int8 ONNX export matching this CPU, as published in sentence-transformers model repos."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+
+def create_embeddings(config: EmbeddingConfig) -> HuggingFaceEmbeddings:
+    """Load the embedding model for a configuration on the CPU.
+
+    Args:
+        config: Model, backend, batch size and thread count
+
+    Returns:
+        HuggingFaceEmbeddings: The loaded model
+    """
+    model_kwargs = {"device": "cpu"}
+    if config.backend == "torch":
+        if config.threads:
+            import torch
+            torch.set_num_threads(config.threads)
+    else:
+        onnx_kwargs = {"provider": "CPUExecutionProvider"}
+        if config.backend == "onnx-int8":
+            onnx_kwargs["file_name"] = _quantized_file_name()
+        if config.threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = config.threads
+            onnx_kwargs["session_options"] = session_options
+        model_kwargs["backend"] = "onnx"
+        model_kwargs["model_kwargs"] = onnx_kwargs
+
+    return HuggingFaceEmbeddings(
+        model_name=config.model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": config.batch_size}
+    )
+
+
+def embedding_dimension(embeddings: HuggingFaceEmbeddings) -> int:
+    """Return the length of the vectors a model produces."""
+    client = getattr(embeddings, "_client", None)
+    if client is not None and client.get_sentence_embedding_dimension():
+        return client.get_sentence_embedding_dimension()
+    return len(embeddings.embed_query("dimension"))
+
+
+def collection_metadata(config: EmbeddingConfig, dimension: int) -> dict:
+    """Build the metadata recorded on a new collection."""
+    return {
+        "embedding_model": config.model_name,
+        "embedding_backend": config.backend,
+        "embedding_dimension": dimension,
+    }
+
+
+def check_collection_embeddings(collection_name: str, metadata: Optional[dict], count: int,
+                                config: EmbeddingConfig, dimension: int):
+    """Make sure a collection was built with the configured model.
+
+    The backend may differ: PyTorch, ONNX and int8 variants of the same model produce
+    interchangeable vectors.
+
+    Args:
+        collection_name: Name of the collection
+        metadata: The collection's Chroma metadata
+        count: Number of chunks in the collection
+        config: Configured embedding backend
+        dimension: Length of the configured model's vectors
+
+    Raises:
+        EmbeddingMismatchError: If the collection holds vectors from another model
+    """
+    metadata = metadata or {}
+    if "embedding_model" not in metadata and count == 0:
+        return
+
+    recorded_model = metadata.get("embedding_model", LEGACY_EMBEDDING_MODEL)
+    recorded_dimension = metadata.get("embedding_dimension")
+    if recorded_model != config.model_name or (recorded_dimension is not None and recorded_dimension != dimension):
+        raise EmbeddingMismatchError(
+            f"Collection '{collection_name}' was built with '{recorded_model}'"
+            + (f" ({recorded_dimension} dimensions)" if recorded_dimension is not None else "")
+            + f" but the configured embedding model is '{config.model_name}' ({dimension} dimensions). "
+            "Switch the model back in Settings or re-create the collection."
+        )
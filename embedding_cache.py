@@ -0,0 +1,198 @@
+# Disk-backed embedding cache. Vectors are keyed by the hash of the chunk text and the embedding model,
+# so re-indexing a collection, moving a file between collections or ingesting boilerplate shared by many
+# documents reuses the vectors computed before instead of running the model again. Vectors live in one
+# memory-mapped float32 file per model with a small SQLite index of slots; once the size limit is reached
+# the least recently used slots are overwritten.
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+
+import metrics
+
+EMBEDDING_CACHE_DIRNAME = "embedding_cache"
+DEFAULT_EMBEDDING_CACHE_MB = 512
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    chunk_hash TEXT PRIMARY KEY,
+    slot INTEGER NOT NULL UNIQUE,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vectors_by_use ON vectors (last_used);
+"""
+
+# Grow the vector file in steps of at least this many rows
+_GROW_ROWS = 1024
+# Keep SQL parameter lists well under SQLite's limit
+_QUERY_CHUNK = 500
+
+
+def _model_dirname(model_id: str) -> str:
+    """Turn a model identifier into a readable, collision-free directory name."""
+    readable = re.sub(r"[^A-Za-z0-9]+", "_", model_id).strip("_")[:40]
+    return f"{readable}-{hashlib.sha256(model_id.encode('utf-8')).hexdigest()[:8]}"
+
+
+class EmbeddingCache:
+    def __init__(self, persist_dir: str, model_id: str, dimension: int,
+                 max_mb: float = DEFAULT_EMBEDDING_CACHE_MB):
+        """Open (or create) the embedding cache of one model.
+
+        Args:
+            persist_dir: Directory for persistent storage
+            model_id: Identifies the model and anything else that changes its vectors
+            dimension: Length of the model's vectors
+            max_mb: Maximum size of the vector file in megabytes
+        """
+        self.directory = os.path.join(persist_dir, EMBEDDING_CACHE_DIRNAME, _model_dirname(model_id))
+        os.makedirs(self.directory, exist_ok=True)
+        self.model_id = model_id
+        self.dimension = dimension
+        self._row_bytes = dimension * np.dtype(np.float32).itemsize
+        self.capacity = max(1, int(max_mb * 1024 * 1024) // self._row_bytes)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        metrics.register_cache(self.stats)
+
+        self._path = os.path.join(self.directory, "vectors.f32")
+        if not os.path.exists(self._path):
+            open(self._path, "wb").close()
+        self._vectors = None
+        self._rows = 0
+        self._map(os.path.getsize(self._path) // self._row_bytes)
+
+        # The size limit may have been lowered since the file was written
+        with self._conn:
+            self._conn.execute("DELETE FROM vectors WHERE slot >= ? OR slot >= ?", (self.capacity, self._rows))
+
+    def _map(self, rows: int):
+        """(Re)map the vector file with the given number of rows, growing the file if needed."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        if os.path.getsize(self._path) < rows * self._row_bytes:
+            with open(self._path, "r+b") as f:
+                f.truncate(rows * self._row_bytes)
+        self._rows = rows
+        if rows:
+            self._vectors = np.memmap(self._path, dtype=np.float32, mode="r+", shape=(rows, self.dimension))
+
+    def _begin(self):
+        """Start a write transaction and pick up changes other processes made to the vector file.
+
+        The Streamlit app, the API server and the sync tool can share a cache directory, so slots
+        are only read, allocated and written while SQLite's write lock is held.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        rows = os.path.getsize(self._path) // self._row_bytes
+        if rows != self._rows:
+            # Grown or cleared by another process
+            self._map(rows)
+
+    def _slots(self, chunk_hashes: Sequence[str]) -> Dict[str, int]:
+        slots = {}
+        unique = list(dict.fromkeys(chunk_hashes))
+        for i in range(0, len(unique), _QUERY_CHUNK):
+            part = unique[i:i + _QUERY_CHUNK]
+            slots.update(self._conn.execute(
+                f"SELECT chunk_hash, slot FROM vectors WHERE chunk_hash IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+        return slots
+
+    def get_many(self, chunk_hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Look up the cached vectors of several chunks.
+
+        Args:
+            chunk_hashes: Hashes of the chunk texts
+
+        Returns:
+            Dict[str, np.ndarray]: Chunk hash -> vector for every chunk found in the cache
+        """
+        with self._lock, self._conn:
+            self._begin()
+            slots = self._slots(chunk_hashes)
+            found = {chunk_hash: np.array(self._vectors[slot]) for chunk_hash, slot in slots.items()}
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE vectors SET last_used = ? WHERE chunk_hash = ?", [(now, h) for h in found]
+            )
+            self.hits += len(found)
+            self.misses += len(set(chunk_hashes)) - len(found)
+        return found
+
+    def put_many(self, chunk_hashes: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store the vectors of several chunks, evicting the least recently used ones if the cache is full.
+
+        Args:
+            chunk_hashes: Hashes of the chunk texts
+            vectors: One vector per hash
+        """
+        with self._lock, self._conn:
+            self._begin()
+            existing = self._slots(chunk_hashes)
+            new = {}
+            for chunk_hash, vector in zip(chunk_hashes, vectors):
+                if chunk_hash not in existing:
+                    new[chunk_hash] = vector
+            if not new:
+                return
+            # More new vectors than the whole cache holds: keep the last ones
+            items = list(new.items())[-self.capacity:]
+
+            # Slots above the highest one in use are free; below it, slots are only reused by eviction
+            next_slot = self._conn.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM vectors").fetchone()[0]
+            free = list(range(next_slot, min(next_slot + len(items), self.capacity)))
+            if len(free) < len(items):
+                evicted = self._conn.execute(
+                    "SELECT chunk_hash, slot FROM vectors ORDER BY last_used LIMIT ?", (len(items) - len(free),)
+                ).fetchall()
+                self._conn.executemany("DELETE FROM vectors WHERE chunk_hash = ?", [(h,) for h, _ in evicted])
+                free.extend(slot for _, slot in evicted)
+
+            if free and max(free) >= self._rows:
+                self._map(min(self.capacity, max(max(free) + 1, self._rows * 2, _GROW_ROWS)))
+
+            now = time.time()
+            for slot, (chunk_hash, vector) in zip(free, items):
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+            self._vectors.flush()
+            self._conn.executemany(
+                "INSERT INTO vectors (chunk_hash, slot, last_used) VALUES (?, ?, ?)",
+                [(chunk_hash, slot, now) for slot, (chunk_hash, _) in zip(free, items)]
+            )
+
+    def clear(self):
+        """Drop every cached vector and shrink the file. Hit and miss counters are kept."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM vectors")
+            self._vectors = None
+            with open(self._path, "wb"):
+                pass
+            self._rows = 0
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters for display, in the same shape as TTLCache.stats()."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "cache": f"embeddings ({self.model_id})",
+                "entries": entries,
+                "max_entries": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,89 @@
+# Federated search over several collections. Each collection is searched on a shared thread pool, scores
+# are put on a common 0-1 scale and the results are merged into one global top-k, so the wall time of a
+# query is close to that of the slowest collection rather than the sum of all of them.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+import metrics
+from docstore import ChromaDocStore
+from retrieval import RRF_K, embed_query, hybrid_search_with_scores, similarity_search_with_relevance
+
+DEFAULT_SEARCH_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=DEFAULT_SEARCH_WORKERS, thread_name_prefix="docuchat-search")
+
+
+@dataclass
+class CollectionTiming:
+    """How one collection's part of a federated search went."""
+    collection: str
+    seconds: float
+    results: int
+    error: Optional[str] = None
+
+
+def _search_collection(store: ChromaDocStore, collection_name: str, query: str, k: int,
+                       hybrid: bool) -> List[Tuple[Document, float]]:
+    """Search one collection and return results with a 0-1 score comparable across collections."""
+    if not hybrid:
+        # Already converted from distance with the collection's own metric
+        return similarity_search_with_relevance(store, collection_name, query, k)
+
+    # Fused reciprocal-rank scores depend only on ranks, so dividing by the best possible score
+    # (first place in both the dense and the lexical list) gives the same scale everywhere
+    best_possible = 2.0 / (RRF_K + 1)
+    return [(doc, score / best_possible) for doc, score in hybrid_search_with_scores(store, collection_name, query, k)]
+
+
+def federated_search(store: ChromaDocStore, collection_names: List[str], query: str, k: int,
+                     hybrid: bool = True) -> Tuple[List[Tuple[Document, float]], List[CollectionTiming]]:
+    """Search several collections in parallel and merge the results into one top-k.
+
+    The query is embedded once before the fan-out so every collection reuses the cached vector.
+    A collection that fails is reported in its timing entry and left out of the results.
+
+    Args:
+        store: Document store holding the collections
+        collection_names: Collections to search
+        query: Query text
+        k: Number of chunks to return overall
+        hybrid: Whether to fuse dense results with BM25 results
+
+    Returns:
+        Tuple[List[Tuple[Document, float]], List[CollectionTiming]]: The merged chunks with their
+        normalized score (best first, each tagged with a "collection" metadata entry) and the
+        latency of each collection
+    """
+    embed_query(store, query)
+
+    def timed(collection_name: str):
+        start = time.perf_counter()
+        try:
+            results = _search_collection(store, collection_name, query, k, hybrid)
+            timing = CollectionTiming(collection_name, time.perf_counter() - start, len(results))
+        except Exception as e:
+            results, timing = [], CollectionTiming(collection_name, time.perf_counter() - start, 0, str(e))
+            metrics.count("retrieval_errors", collection=collection_name)
+        metrics.observe("retrieval.collection", timing.seconds, collection=collection_name)
+        return results, timing
+
+    futures = [_executor.submit(timed, name) for name in collection_names]
+
+    merged = []
+    timings = []
+    for collection_name, future in zip(collection_names, futures):
+        results, timing = future.result()
+        timings.append(timing)
+        for doc, score in results:
+            # Copy so the cached Document isn't modified
+            doc = Document(page_content=doc.page_content, metadata={**doc.metadata, "collection": collection_name},
+                           id=doc.id)
+            merged.append((doc, score))
+
+    merged.sort(key=lambda item: item[1], reverse=True)
+    return merged[:k], timings
@@ -9,6 +9,8 @@ import os
 import toml
 import streamlit as st
 
+DEFAULT_OLLAMA_ENDPOINT = "http://localhost:11434"
+
 def secretmaker():
     """Create and manage Streamlit secrets for API keys and endpoints"""
 
@@ -19,7 +21,7 @@ def secretmaker():
         },
 
         "ollama": {
-            "endpoint": "http://localhost:11434",
+            "endpoint": DEFAULT_OLLAMA_ENDPOINT,
             "ollama_flag": 0,
             "default_model": ""
         }
@@ -48,6 +50,14 @@ def secretmaker():
 
     return api_key, ollama_flag
 
+def get_setting(section, key, default):
+    """Read a single value from secrets.toml, falling back to a default if it isn't set"""
+    try:
+        with open(".streamlit/secrets.toml", "r") as f:
+            return toml.load(f).get(section, {}).get(key, default)
+    except (OSError, toml.TomlDecodeError):
+        return default
+
 # Get the secrets for use in other files
 api_key, ollama_flag = secretmaker()
 
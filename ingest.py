@@ -0,0 +1,253 @@
+# Streaming ingest engine: embeds parsed chunks in fixed-size batches and upserts them into Chroma from a
+# background thread while the caller keeps parsing. Only chunks that are new or changed are embedded, and
+# chunks whose text was embedded before (in any collection) reuse the vector from the embedding cache.
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+import metrics
+from embedding_cache import EmbeddingCache
+from ledger import IngestLedger
+from lexical import LexicalIndex
+
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_MAX_PENDING_BATCHES = 4
+DEFAULT_MAX_RETRIES = 3
+
+
+@dataclass
+class SourceSyncResult:
+    """Outcome of syncing one source file into a collection."""
+    source: str
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestStats:
+    """Throughput counters for one ingest run."""
+    files: int = 0
+    chunks_seen: int = 0
+    chunks_embedded: int = 0
+    vectors_from_cache: int = 0
+    chunks_removed: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    retries: int = 0
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def chunks_per_second(self) -> float:
+        """Chunks handled (embedded or skipped as unchanged) per second of wall time."""
+        return self.chunks_seen / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def embeddings_per_second(self) -> float:
+        """Chunks embedded per second spent in the embedding model (or the embedding cache)."""
+        return self.chunks_embedded / self.embed_seconds if self.embed_seconds else 0.0
+
+
+class _FileJob:
+    """Bookkeeping for one source file whose batches are in flight."""
+
+    def __init__(self, source: str, file_hash: str, docs: List[Document], stale_ids: Set[str], batches: int,
+                 parents: Optional[Dict[str, str]] = None):
+        self.source = source
+        self.file_hash = file_hash
+        self.parents = parents
+        self.chunks = [(doc.id, doc.metadata["chunk_hash"]) for doc in docs]
+        self.stale_ids = stale_ids
+        self.pending = batches
+        self.result = SourceSyncResult(source=source, unchanged=len(docs))
+
+
+class IngestEngine:
+    def __init__(self, vector_store: Chroma, ledger: IngestLedger, collection_name: str,
+                 lexical_index: Optional[LexicalIndex] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                 max_pending_batches: int = DEFAULT_MAX_PENDING_BATCHES,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 retry_delay: float = 1.0):
+        """Create an ingest engine for one collection.
+
+        Use it as a context manager: files added inside the block are embedded in the
+        background, and leaving the block waits for every batch to finish.
+
+        Args:
+            vector_store: Vector store of the target collection
+            ledger: Ingestion ledger for the persist directory
+            collection_name: Name of the target collection
+            lexical_index: BM25 index of the collection, updated alongside Chroma if given
+            embedding_cache: On-disk cache of the collection's embedding model, used to skip
+                chunks whose text was embedded before
+            batch_size: Number of chunks embedded and upserted together
+            max_pending_batches: Batches allowed to wait for the embedder before add_file blocks
+            max_retries: Attempts per batch before it is given up
+            retry_delay: Seconds to wait before the first retry, doubled on each attempt
+        """
+        self.vector_store = vector_store
+        self.ledger = ledger
+        self.collection_name = collection_name
+        self.lexical_index = lexical_index
+        self.embedding_cache = embedding_cache
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self.stats = IngestStats()
+        self.results: List[SourceSyncResult] = []
+        self._queue = queue.Queue(maxsize=max_pending_batches)
+        self._results_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="docuchat-ingest", daemon=True)
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_file(self, source: str, file_hash: str, docs: List[Document], parents: Optional[Dict[str, str]] = None):
+        """Queue the parsed chunks of one source file.
+
+        Chunks already indexed under the same ID are skipped. Blocks while the embedder is
+        behind, which keeps memory bounded however many files are ingested.
+
+        Args:
+            source: Source file name
+            file_hash: Content hash of the source file
+            docs: Parsed chunks with deterministic IDs
+            parents: Parent ID -> text of the sections the chunks belong to, if any
+        """
+        if self.ledger.has_source(self.collection_name, source):
+            existing_ids = self.ledger.chunk_ids(self.collection_name, source)
+        else:
+            # Sources indexed before the ledger existed, or left half-done by an interrupted run:
+            # look them up in Chroma so their chunks are reused or replaced instead of duplicated
+            existing_ids = set(self.vector_store.get(where={"source": source}, include=[])["ids"])
+
+        new_docs = [doc for doc in docs if doc.id not in existing_ids]
+        stale_ids = existing_ids - {doc.id for doc in docs}
+        batches = [new_docs[i:i + self.batch_size] for i in range(0, len(new_docs), self.batch_size)]
+
+        job = _FileJob(source, file_hash, docs, stale_ids, len(batches), parents)
+        self.stats.files += 1
+        self.stats.chunks_seen += len(docs)
+
+        if not batches:
+            self._queue.put((job, None))
+        for batch in batches:
+            self._queue.put((job, batch))
+
+    def close(self) -> IngestStats:
+        """Wait for all queued batches to be written and stop the background thread.
+
+        Returns:
+            IngestStats: Final throughput counters
+        """
+        if self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        if self.stats.finished_at is None:
+            self.stats.finished_at = time.perf_counter()
+        return self.stats
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, batch = item
+            if batch is not None:
+                self._write_batch(job, batch)
+                job.pending -= 1
+            if job.pending <= 0:
+                self._finish(job)
+
+    def _embed(self, batch: List[Document]) -> List[List[float]]:
+        """Embed a batch, taking vectors from the embedding cache where possible."""
+        if self.embedding_cache is None:
+            return self.vector_store.embeddings.embed_documents([doc.page_content for doc in batch])
+
+        hashes = [doc.metadata["chunk_hash"] for doc in batch]
+        vectors = {h: vector.tolist() for h, vector in self.embedding_cache.get_many(hashes).items()}
+        # Embed each missing text once, even if it repeats inside the batch
+        missing = {h: doc.page_content for h, doc in zip(hashes, batch) if h not in vectors}
+        if missing:
+            computed = self.vector_store.embeddings.embed_documents(list(missing.values()))
+            self.embedding_cache.put_many(list(missing), computed)
+            vectors.update(zip(missing, computed))
+        self.stats.vectors_from_cache += len(batch) - len(missing)
+        metrics.count("ingest_vectors_from_cache", len(batch) - len(missing))
+        return [vectors[h] for h in hashes]
+
+    def _write_batch(self, job: _FileJob, batch: List[Document]):
+        """Embed and upsert one batch, retrying it on failure."""
+        for attempt in range(self.max_retries):
+            try:
+                start = time.perf_counter()
+                vectors = self._embed(batch)
+                embedded = time.perf_counter()
+                self.vector_store._collection.upsert(
+                    ids=[doc.id for doc in batch],
+                    embeddings=vectors,
+                    metadatas=[doc.metadata for doc in batch],
+                    documents=[doc.page_content for doc in batch]
+                )
+                if self.lexical_index is not None:
+                    self.lexical_index.add(batch)
+                self.stats.embed_seconds += embedded - start
+                self.stats.upsert_seconds += time.perf_counter() - embedded
+                metrics.observe("ingest.embed", embedded - start)
+                metrics.observe("ingest.upsert", time.perf_counter() - embedded)
+                metrics.count("ingest_chunks_embedded", len(batch))
+                self.stats.batches += 1
+                self.stats.chunks_embedded += len(batch)
+                job.result.added += len(batch)
+                job.result.unchanged -= len(batch)
+                return
+            except Exception as e:
+                if attempt + 1 < self.max_retries:
+                    self.stats.retries += 1
+                    metrics.count("ingest_batch_retries")
+                    time.sleep(self.retry_delay * (2 ** attempt))
+                else:
+                    self.stats.failed_batches += 1
+                    metrics.count("ingest_batches_failed")
+                    job.result.error = str(e)
+
+    def _finish(self, job: _FileJob):
+        """Remove stale chunks and record a file in the ledger once all its batches are written.
+
+        Files with a failed batch are left out of the ledger so the next run retries them.
+        """
+        if job.result.error is None:
+            try:
+                if job.stale_ids:
+                    self.vector_store.delete(ids=list(job.stale_ids))
+                    if self.lexical_index is not None:
+                        self.lexical_index.delete(job.stale_ids)
+                    job.result.removed = len(job.stale_ids)
+                    self.stats.chunks_removed += len(job.stale_ids)
+                    metrics.count("ingest_chunks_removed", len(job.stale_ids))
+                self.ledger.record_source(self.collection_name, job.source, job.file_hash, job.chunks, job.parents)
+            except Exception as e:
+                job.result.error = str(e)
+        with self._results_lock:
+            self.results.append(job.result)
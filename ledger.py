@@ -0,0 +1,371 @@
+# Ingestion ledger: remembers which source files and chunks are already indexed in each collection so
+# uploads that survive a Streamlit rerun, or files that haven't changed, are never parsed or embedded twice.
+
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+LEDGER_FILENAME = "docuchat_ledger.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    collection TEXT NOT NULL,
+    source TEXT NOT NULL,
+    file_hash TEXT,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (collection, source)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    collection TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    PRIMARY KEY (collection, chunk_id)
+);
+CREATE INDEX IF NOT EXISTS chunks_by_source ON chunks (collection, source);
+CREATE TABLE IF NOT EXISTS collections (
+    collection TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watched_files (
+    collection TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    source TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (collection, source)
+);
+CREATE TABLE IF NOT EXISTS parents (
+    collection TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (collection, parent_id)
+);
+CREATE INDEX IF NOT EXISTS parents_by_source ON parents (collection, source);
+CREATE TABLE IF NOT EXISTS collection_settings (
+    collection TEXT PRIMARY KEY,
+    chunking TEXT
+);
+"""
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the SHA-256 hex digest of raw file content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Return the SHA-256 hex digest of a file on disk, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(source: str, chunk_hash: str, occurrence: int = 0) -> str:
+    """Build a deterministic chunk ID from its source and content.
+
+    Args:
+        source: Source file name the chunk belongs to
+        chunk_hash: Hash of the chunk text
+        occurrence: How many identical chunks came before this one in the same file
+
+    Returns:
+        str: A 32-character hex ID that is stable across re-ingestion
+    """
+    return hashlib.sha256(f"{source}\0{chunk_hash}\0{occurrence}".encode("utf-8")).hexdigest()[:32]
+
+
+def _like_pattern(text: str) -> str:
+    """Build a LIKE pattern matching any string that contains text."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class IngestLedger:
+    def __init__(self, persist_dir: str):
+        """Open (or create) the ledger stored next to the Chroma data.
+
+        Args:
+            persist_dir: Directory for persistent storage
+        """
+        os.makedirs(persist_dir, exist_ok=True)
+        self.path = os.path.join(persist_dir, LEDGER_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def version(self, collection: str) -> int:
+        """Get the version of a collection, which changes every time its content changes.
+
+        Caches key their entries on this so they never serve results from before an ingest or delete.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM collections WHERE collection = ?", (collection,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self, collection: str):
+        # Called inside a write transaction. The row is never deleted, so a collection that is
+        # deleted and re-created can't go back to a version a cache has already seen.
+        self._conn.execute(
+            "INSERT INTO collections (collection, version) VALUES (?, 1) "
+            "ON CONFLICT (collection) DO UPDATE SET version = version + 1",
+            (collection,)
+        )
+
+    def file_hash(self, collection: str, source: str) -> Optional[str]:
+        """Get the content hash recorded for a source file.
+
+        Args:
+            collection: Collection name
+            source: Source file name
+
+        Returns:
+            Optional[str]: The recorded hash, or None if the file isn't in the ledger
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hash FROM files WHERE collection = ? AND source = ?",
+                (collection, source)
+            ).fetchone()
+        return row[0] if row else None
+
+    def has_source(self, collection: str, source: str) -> bool:
+        """Check whether a source file has been recorded in a collection."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM files WHERE collection = ? AND source = ?",
+                (collection, source)
+            ).fetchone()
+        return row is not None
+
+    def chunk_ids(self, collection: str, source: str) -> Set[str]:
+        """Get the IDs of every chunk recorded for a source file.
+
+        Args:
+            collection: Collection name
+            source: Source file name
+
+        Returns:
+            Set[str]: Chunk IDs currently indexed for the source
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE collection = ? AND source = ?",
+                (collection, source)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def record_source(self, collection: str, source: str, file_hash: Optional[str],
+                      chunks: Iterable[Tuple[str, str]], parents: Optional[Dict[str, str]] = None):
+        """Replace the ledger entry for a source file after it was indexed.
+
+        Args:
+            collection: Collection name
+            source: Source file name
+            file_hash: Hash of the file content
+            chunks: (chunk_id, chunk_hash) pairs now indexed for the source
+            parents: Parent ID -> text of the sections the chunks belong to, if the
+                collection indexes child chunks
+        """
+        chunks = list(chunks)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND source = ?", (collection, source)
+            )
+            self._conn.execute("DELETE FROM parents WHERE collection = ? AND source = ?", (collection, source))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO parents (collection, parent_id, source, content) VALUES (?, ?, ?, ?)",
+                [(collection, parent_id, source, content) for parent_id, content in (parents or {}).items()]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (collection, chunk_id, source, chunk_hash) VALUES (?, ?, ?, ?)",
+                [(collection, chunk_id, source, chunk_hash) for chunk_id, chunk_hash in chunks]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (collection, source, file_hash, chunk_count, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (collection, source, file_hash, len(chunks), datetime.utcnow().isoformat())
+            )
+            self._bump_version(collection)
+
+    def forget_source(self, collection: str, source: str):
+        """Remove a source file and its chunks from the ledger."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ? AND source = ?", (collection, source))
+            self._conn.execute("DELETE FROM files WHERE collection = ? AND source = ?", (collection, source))
+            self._conn.execute("DELETE FROM watched_files WHERE collection = ? AND source = ?", (collection, source))
+            self._conn.execute("DELETE FROM parents WHERE collection = ? AND source = ?", (collection, source))
+            self._bump_version(collection)
+
+    def forget_collection(self, collection: str):
+        """Remove every entry for a collection from the ledger."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM files WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM watched_files WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM parents WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM collection_settings WHERE collection = ?", (collection,))
+            self._bump_version(collection)
+
+    def parents(self, collection: str, parent_ids: Iterable[str]) -> Dict[str, str]:
+        """Look up the text of parent sections.
+
+        Args:
+            collection: Collection name
+            parent_ids: IDs of the parent sections
+
+        Returns:
+            Dict[str, str]: Parent ID -> text for every parent found
+        """
+        parent_ids = list(dict.fromkeys(parent_ids))
+        if not parent_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT parent_id, content FROM parents WHERE collection = ? "
+                f"AND parent_id IN ({','.join('?' * len(parent_ids))})",
+                (collection, *parent_ids)
+            ).fetchall()
+        return dict(rows)
+
+    def chunking(self, collection: str) -> Optional[str]:
+        """Get a collection's chunking settings as saved by set_chunking(), or None for the defaults."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunking FROM collection_settings WHERE collection = ?", (collection,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_chunking(self, collection: str, chunking: Optional[str]):
+        """Save a collection's chunking settings (JSON), or None to go back to the defaults."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO collection_settings (collection, chunking) VALUES (?, ?) "
+                "ON CONFLICT (collection) DO UPDATE SET chunking = excluded.chunking",
+                (collection, chunking)
+            )
+
+    def watched_files(self, collection: str, directory: str) -> Dict[str, Tuple[int, int]]:
+        """Get the file stats recorded when a synced directory's files were last indexed.
+
+        Args:
+            collection: Collection name
+            directory: Absolute path of the synced directory
+
+        Returns:
+            Dict[str, Tuple[int, int]]: Source file name -> (modification time in ns, size in bytes)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, mtime_ns, size FROM watched_files WHERE collection = ? AND directory = ?",
+                (collection, directory)
+            ).fetchall()
+        return {source: (mtime_ns, size) for source, mtime_ns, size in rows}
+
+    def record_watched_files(self, collection: str, directory: str, stats: Dict[str, Tuple[int, int]]):
+        """Remember the stats of synced files, so unchanged files aren't even hashed next time.
+
+        Args:
+            collection: Collection name
+            directory: Absolute path of the synced directory
+            stats: Source file name -> (modification time in ns, size in bytes)
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO watched_files (collection, directory, source, mtime_ns, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(collection, directory, source, mtime_ns, size) for source, (mtime_ns, size) in stats.items()]
+            )
+
+    def forget_watched_files(self, collection: str, sources: Iterable[str]):
+        """Stop tracking synced files that are gone from their directory."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM watched_files WHERE collection = ? AND source = ?",
+                [(collection, source) for source in sources]
+            )
+
+    def replace_collection(self, collection: str, sources: Dict[str, Tuple[Optional[str], List[Tuple[str, str]]]]):
+        """Replace every entry for a collection, e.g. after rebuilding it from Chroma.
+
+        Args:
+            collection: Collection name
+            sources: Source file name -> (file hash or None, [(chunk_id, chunk_hash), ...])
+        """
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM files WHERE collection = ?", (collection,))
+            for source, (file_hash, chunks) in sources.items():
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (collection, chunk_id, source, chunk_hash) VALUES (?, ?, ?, ?)",
+                    [(collection, chunk_id, source, chunk_hash) for chunk_id, chunk_hash in chunks]
+                )
+                self._conn.execute(
+                    "INSERT INTO files (collection, source, file_hash, chunk_count, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (collection, source, file_hash, len(chunks), now)
+                )
+            self._bump_version(collection)
+
+    def sources(self, collection: str) -> Dict[str, int]:
+        """Get the chunk count of every source recorded in a collection.
+
+        Returns:
+            Dict[str, int]: Source file name -> number of chunks
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, chunk_count FROM files WHERE collection = ? ORDER BY source",
+                (collection,)
+            ).fetchall()
+        return dict(rows)
+
+    def count_sources(self, collection: str, name_filter: str = "") -> int:
+        """Count the sources in a collection whose name contains a filter string."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM files WHERE collection = ? AND source LIKE ? ESCAPE '\\'",
+                (collection, _like_pattern(name_filter))
+            ).fetchone()
+        return row[0]
+
+    def source_page(self, collection: str, name_filter: str = "", limit: int = 25,
+                    offset: int = 0) -> List[Tuple[str, int]]:
+        """Get one page of sources and their chunk counts, ordered by name.
+
+        Args:
+            collection: Collection name
+            name_filter: Only return sources whose name contains this string (case-insensitive)
+            limit: Maximum number of sources to return
+            offset: Number of matching sources to skip
+
+        Returns:
+            List[Tuple[str, int]]: (source file name, number of chunks) pairs
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT source, chunk_count FROM files WHERE collection = ? AND source LIKE ? ESCAPE '\\' "
+                "ORDER BY source LIMIT ? OFFSET ?",
+                (collection, _like_pattern(name_filter), limit, offset)
+            ).fetchall()
+
+    def vacuum(self):
+        """Rebuild the ledger file to give back the space left by deleted entries."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
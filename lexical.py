@@ -0,0 +1,162 @@
+# On-disk lexical (BM25) index, one SQLite FTS5 database per collection. Dense embeddings miss exact
+# identifiers, part numbers and rare terms; this index catches them and is fused with the Chroma results
+# in retrieval.py. It is updated incrementally by the ingest engine.
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Tuple
+
+from langchain_core.documents import Document
+
+LEXICAL_DIRNAME = "lexical"
+
+# Bumped whenever the way text is indexed changes; older indexes are emptied and rebuilt from Chroma
+_SCHEMA_VERSION = 2
+
+# Keep "-", "_" and "." inside tokens so identifiers like "AB-1234.5" are matched as a whole. The text is
+# matched through its "terms" column, where _index_terms() has already stripped those characters from the
+# ends of every token, so "AB-1234." at the end of a sentence is indexed as "ab-1234".
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_rows (
+    rowid INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunk_rows_by_source ON chunk_rows (source);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunk_text USING fts5(
+    content UNINDEXED, terms, tokenize="unicode61 tokenchars '-_.'"
+);
+"""
+
+_TOKEN_RE = re.compile(r"[\w\-.]+", re.UNICODE)
+
+
+def lexical_index_path(persist_dir: str, collection_name: str) -> str:
+    """Return the path of a collection's lexical index database."""
+    return os.path.join(persist_dir, LEXICAL_DIRNAME, f"{collection_name}.sqlite3")
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into lower-case terms, trimming "-", "_" and "." from the ends of each one."""
+    terms = (term.strip(".-_") for term in _TOKEN_RE.findall(text.lower()))
+    return [term for term in terms if term]
+
+
+def _index_terms(text: str) -> str:
+    """Return the text to index for a chunk, tokenized the same way as queries."""
+    return " ".join(_tokens(text))
+
+
+def _match_expression(query: str) -> str:
+    """Turn free text into an FTS5 query that ORs every quoted term."""
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in sorted(set(_tokens(query))))
+
+
+class LexicalIndex:
+    def __init__(self, persist_dir: str, collection_name: str):
+        """Open (or create) the lexical index of a collection.
+
+        Args:
+            persist_dir: Directory for persistent storage
+            collection_name: Name of the collection
+        """
+        self.path = lexical_index_path(persist_dir, collection_name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            # Built by an older version: start empty, so the document store rebuilds it from Chroma
+            self._conn.executescript("DROP TABLE IF EXISTS chunk_text; DROP TABLE IF EXISTS chunk_rows;")
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+
+    def count(self) -> int:
+        """Return the number of indexed chunks."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_rows").fetchone()[0]
+
+    def add(self, docs: Iterable[Document]):
+        """Index chunks, replacing any already indexed under the same ID."""
+        docs = list(docs)
+        with self._lock, self._conn:
+            self._delete_ids([doc.id for doc in docs])
+            for doc in docs:
+                cursor = self._conn.execute(
+                    "INSERT INTO chunk_rows (chunk_id, source) VALUES (?, ?)",
+                    (doc.id, doc.metadata.get("source", "Unknown"))
+                )
+                self._conn.execute(
+                    "INSERT INTO chunk_text (rowid, content, terms) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, doc.page_content, _index_terms(doc.page_content))
+                )
+
+    def delete(self, ids: Iterable[str]):
+        """Remove chunks by ID."""
+        with self._lock, self._conn:
+            self._delete_ids(list(ids))
+
+    def delete_source(self, source: str):
+        """Remove every chunk of a source file."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chunk_text WHERE rowid IN (SELECT rowid FROM chunk_rows WHERE source = ?)", (source,)
+            )
+            self._conn.execute("DELETE FROM chunk_rows WHERE source = ?", (source,))
+
+    def clear(self):
+        """Remove every chunk from the index."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunk_text")
+            self._conn.execute("DELETE FROM chunk_rows")
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """Return the k best BM25 matches for a query.
+
+        Args:
+            query: Free-text query
+            k: Maximum number of chunks to return
+
+        Returns:
+            List[Tuple[Document, float]]: Chunks with their BM25 score (higher is better), best first
+        """
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_rows.chunk_id, chunk_rows.source, chunk_text.content, bm25(chunk_text) AS score "
+                "FROM chunk_text JOIN chunk_rows ON chunk_rows.rowid = chunk_text.rowid "
+                "WHERE chunk_text MATCH ? ORDER BY score LIMIT ?",
+                (expression, k)
+            ).fetchall()
+        # FTS5 reports BM25 as a negative number where lower is better
+        return [
+            (Document(page_content=content, metadata={"source": source}, id=chunk_id), -score)
+            for chunk_id, source, content, score in rows
+        ]
+
+    def vacuum(self):
+        """Merge the full-text index segments and rebuild the file to give back the space of deleted chunks."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT INTO chunk_text (chunk_text) VALUES ('optimize')")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _delete_ids(self, ids: List[str]):
+        # Called inside a write transaction
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(
+                f"DELETE FROM chunk_text WHERE rowid IN (SELECT rowid FROM chunk_rows WHERE chunk_id IN ({placeholders}))",
+                batch
+            )
+            self._conn.execute(f"DELETE FROM chunk_rows WHERE chunk_id IN ({placeholders})", batch)
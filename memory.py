@@ -0,0 +1,94 @@
+# Conversation memory for the chat page. Only the last few turns are sent to the model verbatim; older
+# turns are folded into a rolling summary with a fixed token budget, so the cost of a turn stays roughly
+# constant however long the session gets.
+
+import logging
+from typing import List, Optional
+
+import metrics
+from context import truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_TURNS = 4
+DEFAULT_SUMMARY_TOKENS = 400
+
+_SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant about a "
+    "collection of documents. Update the summary with the new messages below. Keep the facts, names, "
+    "numbers and open questions that later questions may refer to, and drop pleasantries. "
+    "Answer with the updated summary only, in at most {words} words."
+)
+
+
+class ConversationMemory:
+    def __init__(self, max_turns: int = DEFAULT_MEMORY_TURNS, summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+                 model_name: Optional[str] = None):
+        """Create an empty conversation memory.
+
+        Args:
+            max_turns: Number of recent user/assistant exchanges sent verbatim
+            summary_tokens: Maximum size of the rolling summary of older exchanges
+            model_name: Model whose tokenizer is used to measure the summary, if known
+        """
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.model_name = model_name
+        self.summary = ""
+        # Number of transcript messages already folded into the summary
+        self.summarized = 0
+
+    def build_messages(self, system_prompt: str, transcript: List[dict]) -> List[dict]:
+        """Build the messages for the next model call.
+
+        The system prompt carries only the context retrieved for the current question, so chunks
+        retrieved for earlier questions are never re-sent.
+
+        Args:
+            system_prompt: System prompt for this turn, including its retrieved context
+            transcript: User and assistant messages so far, ending with the current question
+
+        Returns:
+            List[dict]: System message, recent exchanges and the current question
+        """
+        history, question = transcript[:-1], transcript[-1]
+        # Skip anything already in the summary as well as anything older than the window
+        recent = history[max(len(history) - 2 * self.max_turns, self.summarized, 0):]
+
+        content = system_prompt
+        if self.summary:
+            content += f"\n\nSummary of the earlier conversation:\n{self.summary}"
+        return [{"role": "system", "content": content}, *recent, question]
+
+    def compress(self, llm, transcript: List[dict]):
+        """Fold exchanges that fell out of the verbatim window into the rolling summary.
+
+        Call this after a response has been shown, so summarization never delays an answer.
+        If the model call fails the summary is left as it was and retried on the next turn.
+
+        Args:
+            llm: Chat model used to write the summary
+            transcript: User and assistant messages so far
+        """
+        cutoff = len(transcript) - 2 * self.max_turns
+        if cutoff <= self.summarized:
+            return
+
+        new_messages = "\n".join(
+            f"{message['role'].capitalize()}: {message['content']}"
+            for message in transcript[self.summarized:cutoff]
+        )
+        prompt = [
+            {"role": "system", "content": _SUMMARY_PROMPT.format(words=int(self.summary_tokens * 0.7))},
+            {"role": "user", "content": f"Current summary:\n{self.summary or '(empty)'}\n\nNew messages:\n{new_messages}"},
+        ]
+        try:
+            with metrics.span("chat.summarize"):
+                summary = llm.invoke(prompt).text()
+        except Exception as e:
+            metrics.count("chat_errors", stage="summarize")
+            logger.warning("Conversation summary failed: %s", e)
+            return
+
+        self.summary = truncate_to_tokens(summary.strip(), self.summary_tokens, self.model_name)
+        self.summarized = cutoff
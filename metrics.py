@@ -0,0 +1,219 @@
+# Process-wide performance instrumentation. Stages of ingestion and chat are wrapped in timing spans that
+# feed latency histograms and a bounded log of recent spans; counters track chunks, tokens and the like,
+# and caches register their hit/miss statistics. Everything can be exported in the OpenMetrics text format
+# or as JSON, and spans are optionally appended as JSON lines to the file named by DOCUCHAT_METRICS_LOG.
+
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+METRICS_LOG_ENV = "DOCUCHAT_METRICS_LOG"
+DEFAULT_RECENT_SPANS = 5000
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+# (stage, labels) -> [bucket counts..., count, sum]
+_histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_recent = deque(maxlen=DEFAULT_RECENT_SPANS)
+_cache_stats: List[weakref.WeakMethod] = []
+_log_path: Optional[str] = os.environ.get(METRICS_LOG_ENV) or None
+
+
+def _label_key(labels: Dict[str, object]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def observe(stage: str, seconds: float, **labels):
+    """Record the duration of a stage that was timed elsewhere.
+
+    Args:
+        stage: Dotted stage name, e.g. "chat.retrieve"
+        seconds: Duration in seconds
+        **labels: Extra dimensions such as the collection name
+    """
+    key = (stage, _label_key(labels))
+    event = {"stage": stage, "seconds": seconds, "at": time.time(), **dict(key[1])}
+    with _lock:
+        histogram = _histograms.setdefault(key, [0] * len(BUCKETS) + [0, 0.0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+        _recent.append(event)
+        log_path = _log_path
+    if log_path:
+        try:
+            with open(log_path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+        except OSError:
+            pass
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[None]:
+    """Time a block of code as one stage, whether it finishes or raises.
+
+    Args:
+        stage: Dotted stage name, e.g. "chat.retrieve"
+        **labels: Extra dimensions such as the collection name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, **labels)
+
+
+def count(name: str, value: float = 1, **labels):
+    """Add to a counter.
+
+    Args:
+        name: Counter name, e.g. "chat_tokens"
+        value: Amount to add
+        **labels: Extra dimensions
+    """
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_cache(stats: Callable[[], dict]):
+    """Include a cache's statistics in the exports.
+
+    Args:
+        stats: Bound method returning a dict shaped like TTLCache.stats(). Only a weak
+            reference is kept, so the cache can still be garbage collected.
+    """
+    with _lock:
+        _cache_stats.append(weakref.WeakMethod(stats))
+
+
+def set_log_path(path: Optional[str]):
+    """Append every span as a JSON line to a file, or stop logging with None."""
+    global _log_path
+    with _lock:
+        _log_path = path or None
+
+
+def cache_stats() -> List[dict]:
+    """Return the statistics of every registered cache that is still alive."""
+    with _lock:
+        alive = [ref for ref in _cache_stats if ref() is not None]
+        _cache_stats[:] = alive
+    return [ref()() for ref in alive]
+
+
+def recent_spans(limit: Optional[int] = None) -> List[dict]:
+    """Return the most recent spans, oldest first."""
+    with _lock:
+        spans = list(_recent)
+    return spans[-limit:] if limit else spans
+
+
+def stage_summary() -> List[dict]:
+    """Summarize the recent spans of each stage, slowest (by p95) first.
+
+    Returns:
+        List[dict]: Stage name, count, mean, p50, p95, max and total in seconds
+    """
+    by_stage: Dict[str, List[float]] = {}
+    for event in recent_spans():
+        by_stage.setdefault(event["stage"], []).append(event["seconds"])
+
+    summary = []
+    for stage, samples in by_stage.items():
+        samples.sort()
+        summary.append({
+            "stage": stage,
+            "count": len(samples),
+            "mean": sum(samples) / len(samples),
+            "p50": samples[(len(samples) - 1) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+            "total": sum(samples),
+        })
+    summary.sort(key=lambda row: row["p95"], reverse=True)
+    return summary
+
+
+def counters() -> List[dict]:
+    """Return the value of every counter."""
+    with _lock:
+        return [{"name": name, **dict(labels), "value": value} for (name, labels), value in sorted(_counters.items())]
+
+
+def reset():
+    """Forget every span and counter. Registered caches are kept."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _recent.clear()
+
+
+def _metric_name(name: str) -> str:
+    return "docuchat_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def export_openmetrics() -> str:
+    """Export histograms, counters and cache statistics in the OpenMetrics text format."""
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counter_items = sorted(_counters.items())
+
+    lines = ["# TYPE docuchat_stage_seconds histogram", "# UNIT docuchat_stage_seconds seconds",
+             "# HELP docuchat_stage_seconds Duration of instrumented stages."]
+    for (stage, labels), histogram in histograms:
+        labels = (("stage", stage),) + labels
+        for bound, bucket_count in zip(BUCKETS, histogram):
+            lines.append(f"docuchat_stage_seconds_bucket{_format_labels(labels + (('le', repr(bound)),))} {bucket_count}")
+        lines.append(f"docuchat_stage_seconds_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram[-2]}")
+        lines.append(f"docuchat_stage_seconds_count{_format_labels(labels)} {histogram[-2]}")
+        lines.append(f"docuchat_stage_seconds_sum{_format_labels(labels)} {histogram[-1]}")
+
+    families: Dict[str, List[str]] = {}
+    for (name, labels), value in counter_items:
+        families.setdefault(_metric_name(name), []).append(f"{_metric_name(name)}_total{_format_labels(labels)} {value}")
+    for family, samples in families.items():
+        lines.append(f"# TYPE {family} counter")
+        lines.extend(samples)
+
+    caches = cache_stats()
+    if caches:
+        lines.append("# TYPE docuchat_cache_hits counter")
+        lines.extend(f"docuchat_cache_hits_total{_format_labels((('cache', c['cache']),))} {c['hits']}" for c in caches)
+        lines.append("# TYPE docuchat_cache_misses counter")
+        lines.extend(f"docuchat_cache_misses_total{_format_labels((('cache', c['cache']),))} {c['misses']}" for c in caches)
+        lines.append("# TYPE docuchat_cache_entries gauge")
+        lines.extend(f"docuchat_cache_entries{_format_labels((('cache', c['cache']),))} {c['entries']}" for c in caches)
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def export_json() -> dict:
+    """Export stage summaries, counters, cache statistics and recent spans as a JSON-serializable dict."""
+    return {
+        "exported_at": datetime.utcnow().isoformat(),
+        "stages": stage_summary(),
+        "counters": counters(),
+        "caches": cache_stats(),
+        "recent_spans": recent_spans(),
+    }
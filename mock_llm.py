@@ -0,0 +1,300 @@
+# Stand-in chat model for load testing. It streams a fixed answer at a configurable first-token delay and
+# token rate, either in-process (selected in Settings like Local Mode) or from a small local HTTP server that
+# speaks enough of the Ollama and OpenAI streaming protocols for ChatOllama, ChatOpenAI and the Settings page.
+# Because the model costs nothing but the configured delays, what's left in a measured turn is our own
+# overhead: retrieval, prompt building, HTTP streaming and rendering.
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional, Tuple
+
+MOCK_MODEL_NAME = "docuchat-mock"
+DEFAULT_MOCK_HOST = "127.0.0.1"
+DEFAULT_MOCK_PORT = 11435
+DEFAULT_MOCK_ANSWER_TOKENS = 200
+DEFAULT_MOCK_FIRST_TOKEN_DELAY = 0.0
+# 0 streams tokens as fast as possible
+DEFAULT_MOCK_TOKENS_PER_SECOND = 0.0
+
+_MOCK_TEXT = (
+    "This answer was generated by the DocuChat mock model. It streams the same words for every question "
+    "so that retrieval, prompt building and rendering can be measured without a real language model. "
+)
+
+
+def mock_tokens(count: int) -> List[str]:
+    """Return the first tokens of the mock answer, repeating the text as often as needed.
+
+    Args:
+        count: Number of tokens
+
+    Returns:
+        List[str]: Words with their trailing space
+    """
+    words = _MOCK_TEXT.split()
+    return [words[i % len(words)] + " " for i in range(count)]
+
+
+def _token_delay(tokens_per_second: float) -> float:
+    return 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+
+
+class MockChatModel:
+    """In-process chat model that streams the mock answer.
+
+    It implements just what the chat pipeline and the conversation memory use.
+    """
+
+    class _Chunk:
+        def __init__(self, content: str):
+            self.content = content
+
+        def text(self) -> str:
+            return self.content
+
+    def __init__(self, answer_tokens: int = DEFAULT_MOCK_ANSWER_TOKENS,
+                 first_token_delay: float = DEFAULT_MOCK_FIRST_TOKEN_DELAY,
+                 tokens_per_second: float = DEFAULT_MOCK_TOKENS_PER_SECOND):
+        """Create a mock model.
+
+        Args:
+            answer_tokens: Number of tokens streamed per answer
+            first_token_delay: Seconds before the first token
+            tokens_per_second: Streaming rate after the first token; 0 for no delay
+        """
+        self.model_name = MOCK_MODEL_NAME
+        self.answer_tokens = answer_tokens
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+
+    async def astream(self, messages: List[dict]):
+        await asyncio.sleep(self.first_token_delay)
+        delay = _token_delay(self.tokens_per_second)
+        for i, token in enumerate(mock_tokens(self.answer_tokens)):
+            if i and delay:
+                await asyncio.sleep(delay)
+            yield self._Chunk(token)
+
+    def invoke(self, messages: List[dict]):
+        return self._Chunk("".join(mock_tokens(self.answer_tokens)).strip())
+
+
+class _MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockLLMServer"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # ---- Responses ----
+
+    def _send_json(self, body: dict, status: int = 200):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_text(self, text: str, status: int = 200):
+        payload = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _start_stream(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data: str):
+        payload = data.encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _tokens(self, limit: Optional[int]) -> Iterator[str]:
+        """Yield the answer tokens at the configured pace."""
+        time.sleep(self.server.first_token_delay)
+        delay = _token_delay(self.server.tokens_per_second)
+        count = self.server.answer_tokens if not limit or limit < 0 else min(limit, self.server.answer_tokens)
+        for i, token in enumerate(mock_tokens(count)):
+            if i and delay:
+                time.sleep(delay)
+            yield token
+
+    # ---- Routes ----
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        model = self.server.model_name
+        if path == "":
+            self._send_text("Ollama is running")
+        elif path == "/api/version":
+            self._send_json({"version": "0.0.0-mock"})
+        elif path == "/api/tags":
+            self._send_json({"models": [{
+                "name": model, "model": model, "modified_at": self.server.started_at, "size": 0,
+                "digest": "0" * 64,
+                "details": {"format": "gguf", "family": "mock", "parameter_size": "0", "quantization_level": "none"},
+            }]})
+        elif path == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": model, "object": "model", "created": 0,
+                                                         "owned_by": "docuchat"}]})
+        elif path.startswith("/v1/models/"):
+            self._send_json({"id": path[len("/v1/models/"):], "object": "model", "created": 0, "owned_by": "docuchat"})
+        else:
+            self._send_json({"error": f"Not found: {self.path}"}, status=404)
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        body = self._read_json()
+        if path in ("/api/chat", "/api/generate"):
+            self._ollama(body, chat=path == "/api/chat")
+        elif path == "/v1/chat/completions":
+            self._openai(body)
+        elif path == "/api/show":
+            self._send_json({"modelfile": "", "parameters": "", "template": "", "details": {"family": "mock"}})
+        else:
+            self._send_json({"error": f"Not found: {self.path}"}, status=404)
+
+    def _ollama(self, body: dict, chat: bool):
+        model = body.get("model") or self.server.model_name
+        started = time.perf_counter()
+
+        def message(content: str, done: bool) -> dict:
+            now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            if chat:
+                return {"model": model, "created_at": now, "message": {"role": "assistant", "content": content},
+                        "done": done}
+            return {"model": model, "created_at": now, "response": content, "done": done}
+
+        # An empty generate request only loads the model (used to warm it up)
+        if not chat and not body.get("prompt"):
+            self._send_json({**message("", True), "done_reason": "load"})
+            return
+
+        limit = (body.get("options") or {}).get("num_predict")
+        stats = {"done_reason": "stop", "load_duration": 0, "prompt_eval_count": 0, "prompt_eval_duration": 0}
+        if body.get("stream", True) is False:
+            tokens = list(self._tokens(limit))
+            elapsed = int((time.perf_counter() - started) * 1e9)
+            self._send_json({**message("".join(tokens), True), **stats, "total_duration": elapsed,
+                             "eval_count": len(tokens), "eval_duration": elapsed})
+            return
+
+        self._start_stream("application/x-ndjson")
+        count = 0
+        for token in self._tokens(limit):
+            self._write_chunk(json.dumps(message(token, False)) + "\n")
+            count += 1
+        elapsed = int((time.perf_counter() - started) * 1e9)
+        self._write_chunk(json.dumps({**message("", True), **stats, "total_duration": elapsed,
+                                      "eval_count": count, "eval_duration": elapsed}) + "\n")
+        self._end_stream()
+
+    def _openai(self, body: dict):
+        model = body.get("model") or self.server.model_name
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        limit = body.get("max_completion_tokens") or body.get("max_tokens")
+
+        if not body.get("stream"):
+            tokens = list(self._tokens(limit))
+            self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+            return
+
+        def event(choices: list, **extra) -> str:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": choices, **extra}
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        self._start_stream("text/event-stream")
+        self._write_chunk(event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        count = 0
+        for token in self._tokens(limit):
+            self._write_chunk(event([{"index": 0, "delta": {"content": token}, "finish_reason": None}]))
+            count += 1
+        self._write_chunk(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk(event([], usage={"prompt_tokens": 0, "completion_tokens": count,
+                                               "total_tokens": count}))
+        self._write_chunk("data: [DONE]\n\n")
+        self._end_stream()
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = DEFAULT_MOCK_HOST, port: int = DEFAULT_MOCK_PORT,
+                 answer_tokens: int = DEFAULT_MOCK_ANSWER_TOKENS,
+                 first_token_delay: float = DEFAULT_MOCK_FIRST_TOKEN_DELAY,
+                 tokens_per_second: float = DEFAULT_MOCK_TOKENS_PER_SECOND,
+                 model_name: str = MOCK_MODEL_NAME, verbose: bool = False):
+        """Create an HTTP server that answers Ollama and OpenAI chat requests with the mock answer.
+
+        Every request is handled on its own thread, so concurrent sessions stream in parallel.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+            answer_tokens: Maximum number of tokens streamed per answer
+            first_token_delay: Seconds before the first token
+            tokens_per_second: Streaming rate after the first token; 0 for no delay
+            model_name: Model name reported by the model list endpoints
+            verbose: Log every request to standard error
+        """
+        super().__init__((host, port), _MockLLMHandler)
+        self.answer_tokens = answer_tokens
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.model_name = model_name
+        self.verbose = verbose
+        self.started_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(**kwargs) -> Tuple[MockLLMServer, threading.Thread]:
+    """Start a mock server on a background thread.
+
+    Args:
+        **kwargs: Arguments of MockLLMServer
+
+    Returns:
+        Tuple[MockLLMServer, threading.Thread]: The server (call shutdown() to stop it) and its thread
+    """
+    server = MockLLMServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True)
+    thread.start()
+    return server, thread
@@ -1,17 +1,34 @@
-import streamlit as st
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-import chromadb
+from dataclasses import replace
+from types import SimpleNamespace
 
-from chroma_utils import process_document, get_collection_stats, ChromaDocStore
+import streamlit as st
+import toml
+
+from chroma_utils import get_collection_stats, ChromaDocStore
+from chunking import CHUNKING_STRATEGIES, DEFAULT_PROFILES, PROFILE_LABELS
+from embedding import EmbeddingMismatchError
+from helper import get_setting
+from ingest import DEFAULT_EMBED_BATCH_SIZE, IngestEngine
+from ledger import hash_bytes
+from parsing import DEFAULT_PARSE_WORKERS, parse_uploads
+from retrieval import hybrid_search_with_scores
+from sync import FolderSync
 
 st.sidebar.title("Collections")
 st.sidebar.markdown("Manage your document collections")
 st.title("Collections")
 
+# Shared document store (client and embedding model are cached process-wide)
+chroma = ChromaDocStore()
 
-# Initialize embeddings
-embeddings = HuggingFaceEmbeddings(model_name='all-MiniLM-L6-v2')
+# Number of worker processes used to parse uploads
+parse_workers = int(get_setting("ingest", "parse_workers", DEFAULT_PARSE_WORKERS))
+# Number of chunks embedded and written to Chroma together
+embed_batch_size = int(get_setting("ingest", "embed_batch_size", DEFAULT_EMBED_BATCH_SIZE))
+# Settings file, where the synced folder of each collection is remembered
+secrets_path = ".streamlit/secrets.toml"
+# Number of chunk previews shown at once per source
+PREVIEW_PAGE_SIZE = 5
 
 # Create a section for creating new collections
 with st.expander("Create New Collection"):
@@ -24,16 +41,9 @@ with st.expander("Create New Collection"):
     create_collection = st.button("Create Collection")
 
     if create_collection and new_collection_name:
-        # Sanitize the collection name
-        sanitized_name = ChromaDocStore()._sanitize_collection_name(new_collection_name)
-
         try:
-            # Create a new Chroma collection
-            new_vector_store = Chroma(
-                collection_name=sanitized_name,
-                embedding_function=embeddings,
-                persist_directory="langchain"
-            )
+            # Create a new Chroma collection under its sanitized name
+            sanitized_name = chroma.create_collection(new_collection_name)
             st.success(f"Successfully created collection: {sanitized_name}")
 
             # Force a page refresh to show the new collection
@@ -43,7 +53,6 @@ with st.expander("Create New Collection"):
 
 with st.spinner("Loading Document Collections..."):
     # List and select collections
-    chroma = ChromaDocStore()
     # Get the list of collection objects
     collection_objects = chroma.list_collections()
     # Extract just the names into a simple list for the selectbox
@@ -81,9 +90,8 @@ if st.session_state.get("show_delete_dialog", False):
 
         if confirm:
             try:
-                # Delete the collection using LangChain Chroma
-                client = chromadb.PersistentClient(path="langchain")
-                client.delete_collection(name=selected_collection)
+                # Delete the collection and drop its cached handles
+                chroma.delete_collection(selected_collection)
                 st.session_state.show_delete_dialog = False
                 st.success(f"Collection '{selected_collection}' has been deleted")
                 st.rerun()
@@ -94,16 +102,20 @@ if st.session_state.get("show_delete_dialog", False):
             st.session_state.show_delete_dialog = False
             st.rerun()
 
-# Initialize vector store with selected collection
-vector_store = Chroma(
-    collection_name=str(selected_collection),
-    embedding_function=embeddings,
-    persist_directory="langchain"
-)
+# Get the shared vector store for the selected collection
+try:
+    vector_store = chroma.get_vector_store(str(selected_collection))
+except EmbeddingMismatchError as e:
+    st.error(f"❌ {e}")
+    st.stop()
+embedding_metadata = vector_store._collection.metadata or {}
+if "embedding_model" in embedding_metadata:
+    st.caption(f"Embedded with {embedding_metadata['embedding_model']} "
+               f"({embedding_metadata.get('embedding_dimension', '?')} dimensions)")
 
 # Get collection data and display stats
-col = vector_store.get()
-get_collection_stats(col)
+source_counts = chroma.source_counts(str(selected_collection))
+get_collection_stats(source_counts)
 
 # Add a section for adding documents to the collection
 st.divider()
@@ -119,86 +131,231 @@ if selected_collection:
     )
 
     if uploader:
-        all_docs = []
-        all_ids = []
-        success_count = 0
+        ledger = chroma.ledger
+        skipped_count = 0
 
-        # Process each uploaded file
+        # Skip files already indexed with identical content
+        pending = []
         for file in uploader if isinstance(uploader, list) else [uploader]:
-            docs, ids = process_document(file)
-            if docs and ids:
-                all_docs.extend(docs)
-                all_ids.extend(ids)
-                success_count += 1
-
-        # Add documents to the collection if any were processed successfully
-        if all_docs and all_ids:
-            with st.spinner("Adding documents to collection..."):
-                try:
-                    vector_store.add_documents(documents=all_docs, ids=all_ids)
-                    st.success(f"Successfully added {len(all_docs)} documents from {success_count} files to the collection")
-
-                    # Refresh the collection data
-                    col = vector_store.get()
-                    get_collection_stats(col)
-                except Exception as e:
-                    st.error(f"Error adding documents to collection: {str(e)}")
+            if ledger.file_hash(selected_collection, file.name) == hash_bytes(file.getvalue()):
+                skipped_count += 1
+            else:
+                pending.append(file)
+
+        if pending:
+            # Parse files in parallel and stream their new chunks into the embedder in bounded batches
+            progress = st.progress(0.0, text="Parsing documents...")
+            lexical_index = chroma.lexical_index(selected_collection)
+            with IngestEngine(vector_store, ledger, selected_collection, lexical_index,
+                              embedding_cache=chroma.embedding_cache, batch_size=embed_batch_size) as engine:
+                for done, parsed in enumerate(parse_uploads(pending, max_workers=parse_workers,
+                                                                      chunking=chroma.chunking_settings(selected_collection)), start=1):
+                    progress.progress(done / len(pending), text=f"Parsed {done}/{len(pending)} files: {parsed.source}")
+                    if not parsed.ok:
+                        st.error(f"Error processing '{parsed.source}': {parsed.error}")
+                        continue
+                    engine.add_file(parsed.source, parsed.file_hash, parsed.docs, parsed.parents)
+                progress.progress(1.0, text="Adding documents to collection...")
+            progress.empty()
+
+            stats = engine.stats
+            for result in engine.results:
+                if result.error:
+                    st.error(f"Error adding '{result.source}' to collection: {result.error}")
+            success_count = sum(1 for result in engine.results if not result.error)
+            if success_count:
+                added_count = sum(result.added for result in engine.results)
+                removed_count = sum(result.removed for result in engine.results)
+                st.success(f"Successfully added {added_count} documents and removed {removed_count} outdated documents from {success_count} files")
+                st.caption(f"{stats.chunks_per_second:.1f} chunks/sec, {stats.embeddings_per_second:.1f} embeddings/sec "
+                           f"({stats.vectors_from_cache} vectors from cache, {stats.batches} batches, "
+                           f"{stats.retries} retries, {stats.elapsed:.1f}s)")
+
+                # Refresh the collection data
+                source_counts = chroma.source_counts(selected_collection)
+                get_collection_stats(source_counts)
+        if skipped_count:
+            st.info(f"Skipped {skipped_count} files that are already indexed and unchanged")
 else:
     st.info("Please select a collection first to add documents")
 
+# Chunk sizes for each kind of file in this collection
+if selected_collection:
+    with st.expander("Chunking"):
+        st.caption("How documents added from now on are cut into chunks. Sizes are in tokens. Files already in the collection keep their chunks until they are replaced.")
+        chunking = chroma.chunking_settings(selected_collection)
+        new_chunking = {}
+        for kind, label in PROFILE_LABELS.items():
+            profile = chunking.get(kind) or DEFAULT_PROFILES[kind]
+            st.markdown(f"**{label}**")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                strategy = st.selectbox("Split", list(CHUNKING_STRATEGIES), index=list(CHUNKING_STRATEGIES).index(profile.strategy),
+                                        format_func=CHUNKING_STRATEGIES.get, key=f"chunk_strategy_{kind}",
+                                        help="By section starts a new chunk at each heading; fill to size packs text regardless of headings")
+            with col2:
+                target_tokens = st.number_input("Chunk Size", min_value=32, max_value=4096, value=profile.target_tokens,
+                                                key=f"chunk_target_{kind}", help="A new chunk is started once this size is reached")
+            with col3:
+                max_tokens = st.number_input("Max Size", min_value=32, max_value=8192, value=max(profile.max_tokens, target_tokens),
+                                             key=f"chunk_max_{kind}", help="No chunk is ever larger than this")
+            with col4:
+                parent_tokens = st.number_input("Parent Size", min_value=0, max_value=8192, value=profile.parent_tokens,
+                                                step=256, key=f"chunk_parent_{kind}",
+                                                help="If set, chunks are indexed at Chunk Size but the model gets the surrounding section of this size. 0 turns it off.")
+            new_chunking[kind] = replace(profile, strategy=strategy, target_tokens=int(target_tokens),
+                                         max_tokens=int(max(max_tokens, target_tokens)), parent_tokens=int(parent_tokens))
+        # Only store the kinds that differ from the defaults
+        new_chunking = {kind: profile for kind, profile in new_chunking.items() if profile != DEFAULT_PROFILES[kind]}
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Save Chunking", disabled=new_chunking == chunking):
+                chroma.set_chunking_settings(selected_collection, new_chunking)
+                st.success("Chunking settings saved")
+        with col2:
+            if st.button("Reset to Defaults", disabled=not chunking):
+                chroma.set_chunking_settings(selected_collection, {})
+                for kind in PROFILE_LABELS:
+                    for field_name in ("strategy", "target", "max", "parent"):
+                        st.session_state.pop(f"chunk_{field_name}_{kind}", None)
+                st.rerun()
+
+# Keep the collection in step with a folder instead of re-uploading changed files by hand
+if selected_collection:
+    with st.expander("Sync from Folder"):
+        sync_directories = get_setting("sync", "directories", {})
+        sync_directory = st.text_input(
+            "Folder",
+            value=sync_directories.get(selected_collection, ""),
+            help="New and changed files in this folder are indexed and files removed from it are deleted from the collection. Documents uploaded above are left alone."
+        ).strip()
+        if st.button("Sync Now", disabled=not sync_directory):
+            if sync_directories.get(selected_collection) != sync_directory:
+                with open(secrets_path, "r") as f:
+                    secrets = toml.load(f)
+                secrets.setdefault("sync", {}).setdefault("directories", {})[selected_collection] = sync_directory
+                with open(secrets_path, "w") as f:
+                    toml.dump(secrets, f)
+            with st.status(f"Syncing '{selected_collection}' with {sync_directory}...") as sync_status:
+                try:
+                    folder_sync = FolderSync(chroma, selected_collection, sync_directory,
+                                             parse_workers=parse_workers, batch_size=embed_batch_size)
+                    sync_result = folder_sync.sync(on_progress=sync_status.write)
+                    sync_status.update(
+                        label=f"Synced in {sync_result.seconds:.1f}s: {len(sync_result.added)} added, "
+                              f"{len(sync_result.modified)} updated, {len(sync_result.deleted)} removed, "
+                              f"{sync_result.unchanged} unchanged",
+                        state="error" if sync_result.errors else "complete"
+                    )
+                    for source, error in sync_result.errors:
+                        st.error(f"Error syncing '{source}': {error}")
+                except Exception as e:
+                    sync_status.update(label=f"Error syncing folder: {str(e)}", state="error")
+        st.caption(f"To sync automatically whenever the folder changes, run `python docuchat.py watch \"{sync_directory or '<folder>'}\" --collection {selected_collection}`.")
+
 # Add a section for viewing and deleting documents in the collection
-if selected_collection and col["ids"]:
+if selected_collection and source_counts:
     st.divider()
     st.subheader("Manage Documents in Collection")
 
-    # Group documents by source
-    doc_sources = {}
-    for i, doc_id in enumerate(col["ids"]):
-        source = col["metadatas"][i].get("source", "Unknown")
-        if source not in doc_sources:
-            doc_sources[source] = []
-        doc_sources[source].append((doc_id, col["metadatas"][i]))
+    # Filter and paginate sources through the ledger so only one page is ever loaded
+    filter_col, size_col = st.columns([3, 1])
+    with filter_col:
+        source_filter = st.text_input("Filter Sources", placeholder="Part of a file name")
+    with size_col:
+        page_size = st.selectbox("Sources per Page", [10, 25, 50, 100], index=1)
+
+    matching_sources = chroma.ledger.count_sources(selected_collection, source_filter)
+    page_count = max(1, (matching_sources + page_size - 1) // page_size)
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1,
+                           help=f"{matching_sources} matching sources across {page_count} pages")
+    source_page = chroma.ledger.source_page(selected_collection, source_filter, page_size, (page - 1) * page_size)
+
+    if not source_page:
+        st.info("No sources match this filter.")
 
     # Display documents grouped by source
-    for source, docs in doc_sources.items():
-        with st.expander(f"{source} ({len(docs)} documents)"):
+    for source, doc_count in source_page:
+        with st.expander(f"{source} ({doc_count} documents)"):
             # Add delete source button at the top of each source group
             if st.button("Delete Source", key=f"delete_source_{source}", type="secondary"):
                 try:
-                    # Get all document IDs for this source
-                    source_doc_ids = [doc_id for doc_id, _ in docs]
-
-                    # Delete all documents from this source
-                    vector_store.delete(ids=source_doc_ids)
-                    st.success(f"Successfully deleted all {len(source_doc_ids)} documents from '{source}'")
-
-                    # Refresh the collection data
-                    col = vector_store.get()
+                    # Delete in batches by metadata filter so large sources don't freeze the page
+                    delete_progress = st.progress(0.0, text=f"Deleting documents from '{source}'...")
+                    deleted_count = chroma.delete_source(
+                        selected_collection, source,
+                        on_progress=lambda done, total: delete_progress.progress(
+                            done / total, text=f"Deleted {done}/{total} documents from '{source}'"
+                        )
+                    )
+                    delete_progress.empty()
+                    st.success(f"Successfully deleted all {deleted_count} documents from '{source}'")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error deleting documents: {str(e)}")
 
-            # Display a sample of documents (first 3)
-            st.write("**Sample documents:**")
-            for i, (doc_id, metadata) in enumerate(docs[:3]):
-                st.write(f"**Document {i+1}:**")
+            # Upload a new version of the file; unchanged chunks keep their vectors
+            replacement = st.file_uploader("Replace with a new version", key=f"replace_source_{source}",
+                                           help="Re-indexes this source in place. Only changed chunks are embedded again.")
+            if replacement is not None and st.button("Replace Source", key=f"replace_button_{source}"):
+                with st.spinner(f"Re-indexing '{source}'..."):
+                    # Parse under the existing source name so chunk IDs and the ledger entry are reused
+                    renamed = SimpleNamespace(name=source, getvalue=replacement.getvalue)
+                    parsed = next(parse_uploads([renamed], max_workers=1,
+                                                chunking=chroma.chunking_settings(selected_collection)))
+                    if not parsed.ok:
+                        st.error(f"Error processing '{replacement.name}': {parsed.error}")
+                    else:
+                        result = chroma.replace_source(selected_collection, source, parsed.file_hash, parsed.docs,
+                                                       batch_size=embed_batch_size, parents=parsed.parents)
+                        if result.error:
+                            st.error(f"Error replacing '{source}': {result.error}")
+                        else:
+                            st.success(f"Replaced '{source}': {result.added} added, {result.removed} removed, "
+                                       f"{result.unchanged} unchanged")
+
+            # Chunk previews are only fetched once the user asks for them
+            if not st.toggle("Show documents", key=f"show_source_{source}"):
+                continue
+
+            preview_page_count = max(1, (doc_count + PREVIEW_PAGE_SIZE - 1) // PREVIEW_PAGE_SIZE)
+            preview_page = 1
+            if preview_page_count > 1:
+                preview_page = st.number_input("Documents Page", min_value=1, max_value=preview_page_count,
+                                               value=1, key=f"preview_page_{source}")
+            sample = vector_store.get(
+                where={"source": source},
+                limit=PREVIEW_PAGE_SIZE,
+                offset=(preview_page - 1) * PREVIEW_PAGE_SIZE,
+                include=["documents", "metadatas"]
+            )
+            docs = list(zip(sample["ids"], sample["documents"], sample["metadatas"]))
+            for i, (doc_id, content, metadata) in enumerate(docs):
+                metadata = metadata or {}
+                st.write(f"**Document {(preview_page - 1) * PREVIEW_PAGE_SIZE + i + 1}:**")
                 st.write(f"ID: {doc_id}")
                 st.write(f"Upload Date: {metadata.get('upload_date', 'Unknown')}")
 
                 # Show a preview of the document content
-                if "page_content" in metadata:
-                    preview = metadata["page_content"]
-                    if len(preview) > 100:
-                        preview = preview[:100] + "..."
-                    st.write(f"Preview: {preview}")
+                preview = content or ""
+                if len(preview) > 200:
+                    preview = preview[:200] + "..."
+                st.write(f"Preview: {preview}")
 
-                if i < 2 and i < len(docs) - 1:  # Add divider between samples, but not after the last one
+                if i < len(docs) - 1:  # Add divider between samples, but not after the last one
                     st.divider()
 
-            # Show message if there are more documents
-            if len(docs) > 3:
-                st.write(f"... and {len(docs) - 3} more documents")
-
+# Give back the disk space of deleted documents
+st.divider()
+st.subheader("Maintenance")
+if st.button("Compact Storage", help="Reclaim the disk space the databases keep for deleted documents. The vector index files are not shrunk. Avoid running it while documents are being added."):
+    with st.status("Compacting storage...") as compact_status:
+        try:
+            size_before, size_after = chroma.compact(on_progress=lambda name: compact_status.write(f"Compacting {name}"))
+            compact_status.update(label=f"Reclaimed {(size_before - size_after) / 1024 / 1024:.1f} MB "
+                                        f"({size_after / 1024 / 1024:.1f} MB used)", state="complete")
+        except Exception as e:
+            compact_status.update(label=f"Error compacting storage: {str(e)}", state="error")
 
 
 # Add search functionality
@@ -219,14 +376,24 @@ num_results = st.slider(
     help="Number of results to return"
 )
 
+use_hybrid_search = st.toggle(
+    "Hybrid Search",
+    value=True,
+    help="Combine semantic search with keyword (BM25) search. Scores are then fused ranks (higher is better) instead of distances."
+)
+
 if search_query:
     with st.spinner("Searching..."):
         try:
-            # Perform similarity search with score
-            results = vector_store.similarity_search_with_score(
-                query=search_query,
-                k=num_results
-            )
+            if use_hybrid_search:
+                # Fuse semantic and keyword results
+                results = hybrid_search_with_scores(chroma, selected_collection, search_query, num_results)
+            else:
+                # Perform similarity search with score
+                results = vector_store.similarity_search_with_score(
+                    query=search_query,
+                    k=num_results
+                )
 
             # Display results
             st.write(f"Found {len(results)} results for '{search_query}'")
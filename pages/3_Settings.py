@@ -1,9 +1,19 @@
 import streamlit as st
 import requests
-from helper import api_key
+from helper import DEFAULT_OLLAMA_ENDPOINT, api_key
 import toml
 import ollama
 import re
+import os
+import pandas as pd
+
+from embedding import EMBEDDING_BACKENDS, load_embedding_config
+from ingest import DEFAULT_EMBED_BATCH_SIZE
+from mock_llm import DEFAULT_MOCK_ANSWER_TOKENS, DEFAULT_MOCK_FIRST_TOKEN_DELAY, DEFAULT_MOCK_TOKENS_PER_SECOND
+from parsing import DEFAULT_PARSE_WORKERS
+from resources import embedding_caches, get_answer_cache, resource_metrics
+from rerank import score_cache
+from retrieval import cache_stats
 
 st.sidebar.title("Settings")
 st.sidebar.markdown("Use this tab to change your OpenAI API key.")
@@ -60,31 +70,45 @@ local_mode = st.toggle(
 
 
 if local_mode:
+    # Endpoint of the Ollama server; point it at `python docuchat.py mock-llm` to load-test over HTTP
+    endpoint = secrets["ollama"].get("endpoint") or DEFAULT_OLLAMA_ENDPOINT
+    new_endpoint = st.text_input(
+        "Ollama Endpoint",
+        value=endpoint,
+        help="URL of the Ollama server. Use the address printed by `python docuchat.py mock-llm` to test against the mock model over HTTP."
+    ).strip().rstrip("/")
+    if new_endpoint and new_endpoint != endpoint:
+        secrets["ollama"]["endpoint"] = new_endpoint
+        with open(secrets_path, "w") as f:
+            toml.dump(secrets, f)
+        endpoint = new_endpoint
+    client = ollama.Client(host=endpoint)
+
 # Test the Ollama endpoint
     try:
-        response = requests.get("http://localhost:11434")
+        response = requests.get(endpoint, timeout=5)
         if response.status_code == 200:
-            st.success("Ollama is running")
+            st.success(f"Ollama is running at {endpoint}")
             ollama_running = True
         else:
-            st.error("Ollama is not running!")
+            st.error(f"Ollama is not running at {endpoint}!")
             ollama_running = False
 
-    except requests.exceptions.ConnectionError:
-        st.error("Ollama is not running!")
+    except requests.exceptions.RequestException:
+        st.error(f"Ollama is not running at {endpoint}!")
         ollama_running = False
 
     if ollama_running:
         # Select model
         models = []
-        for model in ollama.list()["models"]:
+        for model in client.list()["models"]:
             models.append(model["model"])
         if not models:
             st.error("No models found!")
             with st.spinner("Downloading model, please wait..."):
-                ollama.pull("llama3.2:1b")
+                client.pull("llama3.2:1b")
                 while True:
-                    for model in ollama.list()["models"]:
+                    for model in client.list()["models"]:
                         models.append(model["model"])
                     if models:
                         st.rerun()
@@ -97,7 +121,145 @@ if local_mode:
             toml.dump(secrets, f)
 
 
+### Mock Mode ###
+secrets["mock_llm"] = secrets.get("mock_llm", {})
+mock_flag = secrets["mock_llm"].get("mock_flag", 0)
+
+def update_mock_flag(value):
+    secrets["mock_llm"]["mock_flag"] = value
+    with open(secrets_path, "w") as f:
+        toml.dump(secrets, f)
+
+mock_mode = st.toggle(
+    "Mock Mode",
+    value=bool(mock_flag),
+    key="mock_mode",
+    on_change=update_mock_flag,
+    args=(1 if not mock_flag else 0,),
+    help="Answer with a built-in mock model that streams the same text for every question. Use it to measure retrieval and rendering without a real model. Overrides Local Mode."
+)
+
+if mock_mode:
+    mock_answer_tokens = st.number_input(
+        "Answer Tokens",
+        min_value=1,
+        max_value=10000,
+        value=int(secrets["mock_llm"].get("answer_tokens", DEFAULT_MOCK_ANSWER_TOKENS)),
+        help="Number of tokens the mock model streams per answer"
+    )
+    mock_first_token_delay = st.number_input(
+        "First Token Delay (s)",
+        min_value=0.0,
+        max_value=60.0,
+        value=float(secrets["mock_llm"].get("first_token_delay", DEFAULT_MOCK_FIRST_TOKEN_DELAY)),
+        step=0.1,
+        help="Seconds before the first token, like a model processing the prompt"
+    )
+    mock_tokens_per_second = st.number_input(
+        "Tokens per Second",
+        min_value=0.0,
+        max_value=10000.0,
+        value=float(secrets["mock_llm"].get("tokens_per_second", DEFAULT_MOCK_TOKENS_PER_SECOND)),
+        step=10.0,
+        help="Streaming rate after the first token. 0 streams as fast as possible."
+    )
+    if (mock_answer_tokens, mock_first_token_delay, mock_tokens_per_second) != (
+            secrets["mock_llm"].get("answer_tokens", DEFAULT_MOCK_ANSWER_TOKENS),
+            secrets["mock_llm"].get("first_token_delay", DEFAULT_MOCK_FIRST_TOKEN_DELAY),
+            secrets["mock_llm"].get("tokens_per_second", DEFAULT_MOCK_TOKENS_PER_SECOND)):
+        secrets["mock_llm"]["answer_tokens"] = int(mock_answer_tokens)
+        secrets["mock_llm"]["first_token_delay"] = float(mock_first_token_delay)
+        secrets["mock_llm"]["tokens_per_second"] = float(mock_tokens_per_second)
+        with open(secrets_path, "w") as f:
+            toml.dump(secrets, f)
+
+
+### Performance ###
+st.subheader("Performance")
+secrets["ingest"] = secrets.get("ingest", {})
+cpu_count = os.cpu_count() or 1
+parse_workers = st.number_input(
+    "Parsing Workers",
+    min_value=1,
+    max_value=cpu_count,
+    value=min(int(secrets["ingest"].get("parse_workers", DEFAULT_PARSE_WORKERS)), cpu_count),
+    help="Number of processes used to parse uploaded documents in parallel. Use 1 to parse one file at a time."
+)
+embed_batch_size = st.number_input(
+    "Embedding Batch Size",
+    min_value=1,
+    max_value=1024,
+    value=int(secrets["ingest"].get("embed_batch_size", DEFAULT_EMBED_BATCH_SIZE)),
+    help="Number of chunks embedded and written to the collection at once. Larger batches are faster but use more memory."
+)
+if (parse_workers != secrets["ingest"].get("parse_workers", DEFAULT_PARSE_WORKERS)
+        or embed_batch_size != secrets["ingest"].get("embed_batch_size", DEFAULT_EMBED_BATCH_SIZE)):
+    secrets["ingest"]["parse_workers"] = int(parse_workers)
+    secrets["ingest"]["embed_batch_size"] = int(embed_batch_size)
+    with open(secrets_path, "w") as f:
+        toml.dump(secrets, f)
+
+# Embedding backend
+embedding_config = load_embedding_config(secrets_path)
+embedding_model = st.text_input(
+    "Embedding Model",
+    value=embedding_config.model_name,
+    help="Sentence-transformers model used to embed documents and questions. Collections remember the model they were built with and can't be searched with another one."
+)
+embedding_backend = st.selectbox(
+    "Embedding Backend",
+    list(EMBEDDING_BACKENDS),
+    index=list(EMBEDDING_BACKENDS).index(embedding_config.backend),
+    format_func=EMBEDDING_BACKENDS.get,
+    help="ONNX Runtime is usually faster than PyTorch on a CPU, and the int8 quantized variant faster still, with nearly identical results. ONNX needs the optimum and onnxruntime packages."
+)
+encode_batch_size = st.number_input(
+    "Encode Batch Size",
+    min_value=1,
+    max_value=512,
+    value=embedding_config.batch_size,
+    help="Number of chunks the embedding model processes at once"
+)
+embedding_threads = st.number_input(
+    "Embedding Threads",
+    min_value=0,
+    max_value=cpu_count,
+    value=min(embedding_config.threads, cpu_count),
+    help="Number of CPU threads used by the embedding model. 0 lets the runtime decide."
+)
+if (embedding_model.strip(), embedding_backend, encode_batch_size, embedding_threads) != (
+        embedding_config.model_name, embedding_config.backend, embedding_config.batch_size, embedding_config.threads):
+    secrets["embeddings"] = {
+        "model": embedding_model.strip(),
+        "backend": embedding_backend,
+        "batch_size": int(encode_batch_size),
+        "threads": int(embedding_threads),
+    }
+    with open(secrets_path, "w") as f:
+        toml.dump(secrets, f)
+
+
+### Loaded Resources ###
+with st.expander("Loaded Resources"):
+    st.caption("Models, clients and vector stores cached in this process, shared across reruns and sessions.")
+    metrics = resource_metrics()
+    if metrics:
+        metrics_df = pd.DataFrame(metrics)[["kind", "key", "load_seconds", "memory_delta_mb", "reuses", "loaded_at"]]
+        metrics_df.columns = ["Kind", "Resource", "Load Time (s)", "Memory Added (MB)", "Reuses", "Loaded At"]
+        st.dataframe(metrics_df, hide_index=True)
+    else:
+        st.write("Nothing has been loaded yet. Open the Home or Collections tab first.")
 
+with st.expander("Caches"):
+    st.caption("Query embeddings, search results and answers reused for repeated questions, and chunk embeddings reused when documents are indexed again. Results and answers are invalidated whenever a collection changes.")
+    answer_cache = get_answer_cache()
+    cache_df = pd.DataFrame(cache_stats() + [score_cache.stats(), answer_cache.stats()]
+                            + [cache.stats() for cache in embedding_caches()])[["cache", "entries", "max_entries", "hits", "misses", "hit_rate"]]
+    cache_df.columns = ["Cache", "Entries", "Max Entries", "Hits", "Misses", "Hit Rate"]
+    st.dataframe(cache_df, hide_index=True)
+    if st.button("Clear Answer Cache"):
+        answer_cache.clear()
+        st.rerun()
 
 
 # ------------------- LICENSE -------------------
@@ -0,0 +1,92 @@
+import json
+
+import pandas as pd
+import streamlit as st
+
+import metrics
+
+st.sidebar.title("Performance")
+st.sidebar.markdown("Use this tab to see where time is spent while indexing documents and answering questions.")
+st.title("Performance")
+st.markdown("Timings of every instrumented stage since the app started, slowest first. Use the chat and the Collections tab, then come back here.")
+st.markdown("---") # Divider
+
+summary = metrics.stage_summary()
+if not summary:
+    st.write("Nothing has been measured yet. Ask a question or index a document first.")
+else:
+    ### Stages ###
+    st.subheader("Stages")
+    summary_df = pd.DataFrame(summary)
+    for column in ["mean", "p50", "p95", "max"]:
+        summary_df[column] = summary_df[column] * 1000
+    summary_df.columns = ["Stage", "Count", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)", "Total (s)"]
+    st.dataframe(summary_df, hide_index=True)
+
+    ### Distribution of one stage ###
+    stage = st.selectbox("Stage", [row["stage"] for row in summary], help="Show how the recent durations of one stage are distributed.")
+    durations = [span["seconds"] for span in metrics.recent_spans() if span["stage"] == stage]
+    labels = [f"≤ {bound * 1000:g} ms" for bound in metrics.BUCKETS] + [f"> {metrics.BUCKETS[-1] * 1000:g} ms"]
+    counts = [0] * len(labels)
+    for seconds in durations:
+        counts[next((i for i, bound in enumerate(metrics.BUCKETS) if seconds <= bound), len(metrics.BUCKETS))] += 1
+    # Drop the empty buckets at both ends so the chart focuses on the actual range
+    used = [i for i, n in enumerate(counts) if n]
+    histogram_df = pd.DataFrame({"Duration": labels, "Spans": counts}).iloc[used[0]:used[-1] + 1]
+    st.bar_chart(histogram_df, x="Duration", y="Spans")
+
+    ### Slowest recent spans ###
+    st.subheader("Slowest Recent Spans")
+    slowest = sorted(metrics.recent_spans(), key=lambda span: span["seconds"], reverse=True)[:20]
+    slowest_df = pd.DataFrame(slowest)
+    slowest_df["seconds"] = slowest_df["seconds"] * 1000
+    slowest_df["at"] = pd.to_datetime(slowest_df["at"], unit="s")
+    slowest_df = slowest_df.rename(columns={"stage": "Stage", "seconds": "Duration (ms)", "at": "At"})
+    st.dataframe(slowest_df, hide_index=True)
+
+### Counters ###
+counter_rows = metrics.counters()
+if counter_rows:
+    st.subheader("Counters")
+    st.dataframe(pd.DataFrame(counter_rows).rename(columns={"name": "Counter", "value": "Value"}), hide_index=True)
+
+### Caches ###
+cache_rows = metrics.cache_stats()
+if cache_rows:
+    st.subheader("Caches")
+    cache_df = pd.DataFrame(cache_rows)[["cache", "entries", "max_entries", "hits", "misses", "hit_rate"]]
+    cache_df.columns = ["Cache", "Entries", "Max Entries", "Hits", "Misses", "Hit Rate"]
+    st.dataframe(cache_df, hide_index=True)
+
+### Export ###
+st.markdown("---") # Divider
+st.subheader("Export")
+st.caption(f"Set the {metrics.METRICS_LOG_ENV} environment variable to a file path to also log every span as a JSON line.")
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.download_button("Download OpenMetrics", metrics.export_openmetrics(), file_name="docuchat_metrics.txt",
+                       mime="application/openmetrics-text")
+with col2:
+    st.download_button("Download JSON", json.dumps(metrics.export_json(), indent=2), file_name="docuchat_metrics.json",
+                       mime="application/json")
+with col3:
+    if st.button("Reset Measurements", help="Forget every span and counter. Cache statistics are kept."):
+        metrics.reset()
+        st.rerun()
+
+# ------------------- LICENSE -------------------
+# Docuchat, a smart knowledge assistant for your documents.
+# Copyright © 2025 alxc75
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/.
\ No newline at end of file
@@ -0,0 +1,214 @@
+# Document parsing stage. UnstructuredLoader partitioning (PDF layout, OCR) is CPU-bound, so multi-file
+# batches are fanned out to a pool of worker processes and the parsed chunks are streamed back as each
+# file finishes. This module doesn't import Streamlit so it can also be used from headless tools.
+
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_community.vectorstores.utils import filter_complex_metadata
+from langchain_core.documents import Document
+
+import metrics
+from chunking import ChunkingSettings, attach_parents, chunk_documents, loader_kwargs, profile_for
+from ledger import hash_bytes, hash_file, hash_text, make_chunk_id
+
+DEFAULT_PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# Metadata added by Unstructured that only describes the temporary copy of the file
+_SCRATCH_METADATA = ("file_directory", "file_path")
+
+
+@dataclass
+class ParsedFile:
+    """Result of parsing one source file."""
+    source: str
+    file_hash: str
+    docs: List[Document] = field(default_factory=list)
+    error: Optional[str] = None
+    seconds: float = 0.0
+    # Parent ID -> text of the parent sections, if the collection indexes child chunks
+    parents: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def build_documents(raw_docs: List[Document], source: str, file_hash: str) -> List[Document]:
+    """Turn loader output into Documents with filtered metadata and content-derived IDs.
+
+    Chunk IDs are derived from the source name and chunk content, so re-ingesting an
+    unchanged chunk always produces the same ID.
+
+    Args:
+        raw_docs: Documents returned by the loader
+        source: Source file name stored in the metadata
+        file_hash: Content hash of the source file
+
+    Returns:
+        List[Document]: Documents ready to be added to a collection
+    """
+    raw_docs = filter_complex_metadata(raw_docs)
+    upload_date = datetime.utcnow().isoformat()
+
+    docs = []
+    occurrences = {}
+    for i, doc in enumerate(raw_docs):
+        content = doc if isinstance(doc, str) else doc.page_content
+        metadata = {} if isinstance(doc, str) else dict(doc.metadata)
+        for key in _SCRATCH_METADATA:
+            metadata.pop(key, None)
+
+        chunk_hash = hash_text(content)
+        occurrence = occurrences.get(chunk_hash, 0)
+        occurrences[chunk_hash] = occurrence + 1
+        docs.append(Document(
+            page_content=content,
+            metadata={
+                **metadata,
+                "source": source,
+                "upload_date": upload_date,
+                "chunk_index": i,
+                "chunk_hash": chunk_hash,
+                "file_hash": file_hash
+            },
+            id=make_chunk_id(source, chunk_hash, occurrence)
+        ))
+    return docs
+
+
+def parse_file(path: str, source: str, file_hash: Optional[str] = None,
+               chunking: Optional[ChunkingSettings] = None) -> ParsedFile:
+    """Parse one file on disk into chunks. Runs inside a worker process.
+
+    Errors are captured in the result instead of raised, so one bad file doesn't stop a batch.
+
+    Args:
+        path: Path of the file to parse
+        source: Source name to record in the metadata (usually the original file name)
+        file_hash: Content hash of the file, computed if not given
+        chunking: The collection's chunking profiles, or None for the defaults
+
+    Returns:
+        ParsedFile: Parsed chunks or the error message
+    """
+    from langchain_unstructured import UnstructuredLoader
+
+    start = time.perf_counter()
+    try:
+        if file_hash is None:
+            file_hash = hash_file(path)
+
+        # Chunk sizes depend on the kind of file (prose, spreadsheet, slides) and the collection
+        profile = profile_for(source, chunking)
+        loader = UnstructuredLoader(path, **loader_kwargs(profile))
+        chunks, parent_texts = chunk_documents(loader.load(), profile)
+        docs = build_documents(chunks, source, file_hash)
+        parents = attach_parents(docs, parent_texts, source)
+        return ParsedFile(source=source, file_hash=file_hash, docs=docs, parents=parents,
+                          seconds=time.perf_counter() - start)
+    except Exception as e:
+        return ParsedFile(source=source, file_hash=file_hash or "", error=str(e), seconds=time.perf_counter() - start)
+
+
+def parse_paths(files: Iterable[Tuple[str, str, Optional[str]]],
+                max_workers: int = DEFAULT_PARSE_WORKERS,
+                chunking: Optional[ChunkingSettings] = None) -> Iterator[ParsedFile]:
+    """Parse files in parallel and yield each result as soon as it is ready.
+
+    Files are read from the iterable lazily and at most two per worker are in flight at
+    once, so a slow consumer holds back parsing instead of piling up results in memory.
+
+    Args:
+        files: (path, source, file_hash) tuples; file_hash may be None
+        max_workers: Number of worker processes. 1 parses in the calling process.
+        chunking: The collection's chunking profiles, or None for the defaults
+
+    Yields:
+        ParsedFile: One result per file, in completion order
+    """
+    files = iter(files)
+    head = list(itertools.islice(files, 2))
+    if max_workers <= 1 or len(head) <= 1:
+        for path, source, file_hash in itertools.chain(head, files):
+            parsed = parse_file(path, source, file_hash, chunking)
+            metrics.observe("ingest.parse", parsed.seconds)
+            if not parsed.ok:
+                metrics.count("ingest_parse_errors")
+            yield parsed
+        return
+    files = itertools.chain(head, files)
+
+    # Spawn instead of fork: the parent (Streamlit, torch) runs threads that don't survive a fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        in_flight = {}
+
+        def submit_next() -> bool:
+            item = next(files, None)
+            if item is None:
+                return False
+            path, source, file_hash = item
+            in_flight[pool.submit(parse_file, path, source, file_hash, chunking)] = (source, file_hash)
+            return True
+
+        for _ in range(max_workers * 2):
+            if not submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                source, file_hash = in_flight.pop(future)
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. out of memory); report it like any other failure
+                    parsed = ParsedFile(source=source, file_hash=file_hash or "", error=str(e))
+                # Workers are separate processes, so their parse times are recorded here
+                metrics.observe("ingest.parse", parsed.seconds)
+                if not parsed.ok:
+                    metrics.count("ingest_parse_errors")
+                yield parsed
+                submit_next()
+
+
+def parse_uploads(uploads: Iterable, max_workers: int = DEFAULT_PARSE_WORKERS,
+                  chunking: Optional[ChunkingSettings] = None) -> Iterator[ParsedFile]:
+    """Parse uploaded file objects in parallel through a private scratch directory.
+
+    Each upload is written to its own subdirectory of a temporary directory that only the
+    current user can read, so names can't collide or escape the scratch area. The directory
+    is removed once every file has been parsed.
+
+    Args:
+        uploads: Objects with a ``name`` attribute and a ``getvalue()`` method (e.g. Streamlit uploads)
+        max_workers: Number of worker processes
+        chunking: The collection's chunking profiles, or None for the defaults
+
+    Yields:
+        ParsedFile: One result per upload, in completion order
+    """
+    scratch_dir = tempfile.mkdtemp(prefix="docuchat-")
+    try:
+        files = []
+        for i, upload in enumerate(uploads):
+            data = upload.getvalue()
+            file_dir = os.path.join(scratch_dir, str(i))
+            os.mkdir(file_dir)
+            path = os.path.join(file_dir, os.path.basename(upload.name))
+            with open(path, "wb") as f:
+                f.write(data)
+            files.append((path, upload.name, hash_bytes(data)))
+
+        yield from parse_paths(files, max_workers, chunking)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
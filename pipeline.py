@@ -0,0 +1,218 @@
+# Asynchronous chat-turn pipeline. Retrieval across the selected collections runs concurrently with
+# warming up the LLM (loading the Ollama model or opening the OpenAI connection), then the answer is
+# streamed with the model's async API. A turn can be cancelled from another thread, which closes the
+# stream so the server stops generating.
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+import metrics
+from chunking import expand_to_parents
+from docstore import ChromaDocStore
+from federated import CollectionTiming, federated_search
+from rerank import RerankStats, rerank
+
+logger = logging.getLogger(__name__)
+
+# Ollama unloads idle models after its keep-alive; re-warm a little before that
+DEFAULT_KEEP_ALIVE = "10m"
+_WARM_INTERVAL = 8 * 60
+
+_warmed_at = {}
+_warm_lock = threading.Lock()
+
+_SYSTEM_PROMPT = (
+    "You are a retrieval model. You have access to the most relevant results from a collection of document. "
+    "Answer the user's question about these documents. Only base your answer on the following documents. "
+    "If the question cannot be answered from the following documents, clearly state so. "
+    "Cite the numbers of the documents you use, like [1]. Here are the results:\n\n{context}"
+)
+
+
+def system_prompt(context: str) -> str:
+    """Build the system prompt of a turn around its retrieved context."""
+    return _SYSTEM_PROMPT.format(context=context)
+
+
+@dataclass
+class TurnResult:
+    """What happened during one chat turn."""
+    docs: List[Document] = field(default_factory=list)
+    collection_timings: List[CollectionTiming] = field(default_factory=list)
+    retrieval_seconds: float = 0.0
+    rerank: Optional[RerankStats] = None
+    warmup_seconds: Optional[float] = None
+    cancelled: bool = False
+
+
+async def warm_up(llm) -> Optional[float]:
+    """Get the model ready to answer before the prompt is known.
+
+    For Ollama the model is loaded into memory with an empty generate request; for OpenAI a
+    lightweight request opens the pooled HTTPS connection the stream will reuse. A model is
+    warmed at most once per keep-alive window. Failures are ignored: the real request will
+    report them.
+
+    Args:
+        llm: ChatOllama or ChatOpenAI instance
+
+    Returns:
+        Optional[float]: Seconds spent warming up, or None if nothing was done
+    """
+    key = (type(llm).__name__, getattr(llm, "model", None) or getattr(llm, "model_name", None))
+    with _warm_lock:
+        if time.monotonic() - _warmed_at.get(key, float("-inf")) < _WARM_INTERVAL:
+            return None
+        _warmed_at[key] = time.monotonic()
+
+    start = time.perf_counter()
+    try:
+        if type(llm).__name__ == "ChatOllama":
+            import ollama
+            client = ollama.AsyncClient(host=llm.base_url)
+            await client.generate(model=llm.model, prompt="", keep_alive=llm.keep_alive or DEFAULT_KEEP_ALIVE)
+        elif getattr(llm, "root_async_client", None) is not None:
+            await llm.root_async_client.models.retrieve(llm.model_name)
+        else:
+            return None
+    except Exception as e:
+        with _warm_lock:
+            _warmed_at.pop(key, None)
+        metrics.count("chat_errors", stage="warm_up")
+        logger.warning("LLM warm-up failed: %s", e)
+        return None
+    return time.perf_counter() - start
+
+
+async def retrieve(store: ChromaDocStore, collection_names: List[str], query: str, k: int,
+                   hybrid: bool = True) -> Tuple[List[Document], List[CollectionTiming]]:
+    """Search one or more collections without blocking the event loop.
+
+    The federated retriever fans the collections out to its own thread pool and merges their
+    results into one global top-k.
+
+    Args:
+        store: Document store holding the collections
+        collection_names: Collections to search
+        query: Query text
+        k: Number of chunks to return
+        hybrid: Whether to fuse dense results with BM25 results
+
+    Returns:
+        Tuple[List[Document], List[CollectionTiming]]: The best chunks, best first, and the
+        latency of each collection
+    """
+    results, timings = await asyncio.to_thread(federated_search, store, collection_names, query, k, hybrid)
+    return [doc for doc, _ in results], timings
+
+
+class ChatTurn:
+    def __init__(self, llm, store: ChromaDocStore, collection_names: List[str], query: str, k: int,
+                 build_messages: Callable[[List[Document]], List[dict]], hybrid: bool = True,
+                 rerank_pool: Optional[int] = None):
+        """Prepare one chat turn.
+
+        Args:
+            llm: Chat model with an async streaming API
+            store: Document store holding the collections
+            collection_names: Collections to retrieve context from
+            query: The user's question
+            k: Number of chunks passed to the model
+            build_messages: Turns the retrieved chunks into the messages sent to the model
+            hybrid: Whether to fuse dense results with BM25 results
+            rerank_pool: If set, retrieve this many candidates and keep the k best according
+                to the cross-encoder
+        """
+        self.llm = llm
+        self.store = store
+        self.collection_names = collection_names
+        self.query = query
+        self.k = k
+        self.build_messages = build_messages
+        self.hybrid = hybrid
+        self.rerank_pool = rerank_pool
+        self.result = TurnResult()
+
+        self._cancelled = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run(self, on_token: Callable[[str], None]) -> TurnResult:
+        """Run the turn to completion on a fresh event loop, passing each streamed chunk to on_token.
+
+        Returns:
+            TurnResult: Retrieved chunks, timings and whether the turn was cancelled
+        """
+        try:
+            with metrics.span("chat.turn"):
+                asyncio.run(self._run(on_token))
+        except asyncio.CancelledError:
+            self.result.cancelled = True
+        if self.result.cancelled:
+            metrics.count("chat_turns_cancelled")
+        return self.result
+
+    def cancel(self):
+        """Stop the turn from any thread. The model stream is closed as soon as possible."""
+        self._cancelled.set()
+        if self._loop is not None and self._task is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _run(self, on_token: Callable[[str], None]):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        if self._cancelled.is_set():
+            raise asyncio.CancelledError()
+
+        warm = asyncio.create_task(warm_up(self.llm))
+        start = time.perf_counter()
+        try:
+            self.result.docs, self.result.collection_timings = await retrieve(
+                self.store, self.collection_names, self.query, max(self.k, self.rerank_pool or 0), self.hybrid
+            )
+            self.result.retrieval_seconds = time.perf_counter() - start
+            metrics.observe("chat.retrieve", self.result.retrieval_seconds)
+            if self.rerank_pool:
+                try:
+                    ranked, self.result.rerank = await asyncio.to_thread(rerank, self.query, self.result.docs, self.k)
+                    self.result.docs = [doc for doc, _ in ranked]
+                except Exception as e:
+                    # e.g. the model isn't in the local cache: keep the first-stage order
+                    metrics.count("chat_errors", stage="rerank")
+                    logger.warning("Reranking failed: %s", e)
+                    self.result.docs = self.result.docs[:self.k]
+            # Collections indexed as small child chunks answer with their parent sections
+            self.result.docs = expand_to_parents(self.store.ledger, self.result.docs)
+            metrics.count("chat_chunks_retrieved", len(self.result.docs))
+            with metrics.span("chat.build_prompt"):
+                messages = self.build_messages(self.result.docs)
+
+            # Let the warm-up finish so the model is loaded, then stream the answer
+            with metrics.span("chat.wait_for_warmup"):
+                self.result.warmup_seconds = await warm
+            if self.result.warmup_seconds is not None:
+                metrics.observe("chat.warmup", self.result.warmup_seconds)
+            stream_start = time.perf_counter()
+            first_token = True
+            stream = self.llm.astream(messages)
+            try:
+                async for chunk in stream:
+                    if self._cancelled.is_set():
+                        self.result.cancelled = True
+                        break
+                    if first_token:
+                        metrics.observe("chat.time_to_first_token", time.perf_counter() - stream_start)
+                        first_token = False
+                    on_token(chunk.text())
+            finally:
+                await stream.aclose()
+                metrics.observe("chat.stream", time.perf_counter() - stream_start)
+        finally:
+            if not warm.done():
+                warm.cancel()
@@ -0,0 +1,81 @@
+# Optional reranking stage. A wide candidate pool is retrieved cheaply, scored against the question by a
+# small local cross-encoder on the CPU, and only the best few chunks are passed to the LLM. Scores are
+# cached per (model, question, chunk) so repeated questions skip the model entirely.
+
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+
+import metrics
+from cache import TTLCache
+from resources import get_cross_encoder
+from retrieval import normalize_query
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_CANDIDATE_POOL = 30
+DEFAULT_RERANK_BATCH_SIZE = 16
+
+score_cache = TTLCache("rerank_scores", maxsize=8192, ttl=None)
+
+
+@dataclass
+class RerankStats:
+    """Timing of one reranking pass."""
+    candidates: int = 0
+    scored: int = 0
+    cached: int = 0
+    seconds: float = 0.0
+
+
+def _chunk_key(doc: Document) -> str:
+    return doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def rerank(query: str, docs: List[Document], top_n: int, model_name: str = DEFAULT_RERANK_MODEL,
+           batch_size: int = DEFAULT_RERANK_BATCH_SIZE) -> Tuple[List[Tuple[Document, float]], RerankStats]:
+    """Reorder candidate chunks by cross-encoder relevance and keep the best ones.
+
+    Args:
+        query: The user's question
+        docs: Candidate chunks from the first-stage retriever
+        top_n: Number of chunks to keep
+        model_name: Cross-encoder model name, which must be in the local Hugging Face cache
+        batch_size: Number of (question, chunk) pairs scored per model call
+
+    Returns:
+        Tuple[List[Tuple[Document, float]], RerankStats]: The best chunks with their cross-encoder
+        score (higher is better), best first, and timing statistics
+    """
+    start = time.perf_counter()
+    stats = RerankStats(candidates=len(docs))
+    normalized = normalize_query(query)
+
+    scores = []
+    missing = []
+    for i, doc in enumerate(docs):
+        score = score_cache.get((model_name, normalized, _chunk_key(doc)))
+        scores.append(score)
+        if score is None:
+            missing.append(i)
+    stats.cached = len(docs) - len(missing)
+
+    if missing:
+        model = get_cross_encoder(model_name)
+        predicted = model.predict(
+            [(query, docs[i].page_content) for i in missing],
+            batch_size=batch_size,
+            show_progress_bar=False
+        )
+        for i, score in zip(missing, predicted):
+            scores[i] = float(score)
+            score_cache.put((model_name, normalized, _chunk_key(docs[i])), scores[i])
+        stats.scored = len(missing)
+
+    ranked = sorted(zip(docs, scores), key=lambda item: item[1], reverse=True)[:top_n]
+    stats.seconds = time.perf_counter() - start
+    metrics.observe("chat.rerank", stats.seconds)
+    metrics.count("rerank_pairs_scored", stats.scored)
+    return ranked, stats
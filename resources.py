@@ -0,0 +1,318 @@
+# Process-wide registry for the heavy objects used by every page: embedding models, Chroma clients and
+# LangChain vector-store handles. Streamlit re-executes the page scripts on every interaction but keeps
+# imported modules alive, so anything stored here survives reruns and is shared by all sessions.
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import chromadb
+from chromadb.config import Settings
+from langchain_chroma import Chroma
+from langchain_huggingface import HuggingFaceEmbeddings
+
+import metrics
+from answer_cache import AnswerCache
+from embedding import (
+    EmbeddingConfig,
+    check_collection_embeddings,
+    collection_metadata,
+    create_embeddings,
+    embedding_dimension,
+)
+from embedding_cache import EmbeddingCache
+from ledger import IngestLedger
+from lexical import LexicalIndex
+
+DEFAULT_PERSIST_DIR = "./langchain"
+
+_lock = threading.RLock()
+_embeddings: Dict[str, HuggingFaceEmbeddings] = {}
+_clients: Dict[str, chromadb.ClientAPI] = {}
+_vector_stores: Dict[Tuple[str, str, str], Chroma] = {}
+_ledgers: Dict[str, IngestLedger] = {}
+_answer_caches: Dict[str, AnswerCache] = {}
+_embedding_caches: Dict[Tuple[str, str], EmbeddingCache] = {}
+_lexical_indexes: Dict[Tuple[str, str], LexicalIndex] = {}
+_cross_encoders: Dict[str, object] = {}
+_metrics: Dict[Tuple[str, str], dict] = {}
+
+
+def _persist_key(persist_dir: str) -> str:
+    """Normalize a persist directory so "langchain" and "./langchain" share one client."""
+    return os.path.abspath(persist_dir)
+
+
+def _rss_mb() -> Optional[float]:
+    """Return the current resident memory of this process in MB, or None if it can't be measured."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _load(kind: str, key: str, loader: Callable):
+    """Run a loader and record how long it took and how much memory it added."""
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    value = loader()
+    elapsed = time.perf_counter() - start
+    rss_after = _rss_mb()
+    metrics.observe("resource.load", elapsed, kind=kind)
+
+    _metrics[(kind, key)] = {
+        "kind": kind,
+        "key": key,
+        "load_seconds": elapsed,
+        "memory_delta_mb": (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+        "loaded_at": datetime.utcnow().isoformat(),
+        "reuses": 0,
+    }
+    return value
+
+
+def _reused(kind: str, key: str):
+    """Count a cache hit for a resource."""
+    if (kind, key) in _metrics:
+        _metrics[(kind, key)]["reuses"] += 1
+
+
+def get_embeddings(config: EmbeddingConfig = EmbeddingConfig()) -> HuggingFaceEmbeddings:
+    """Get the shared embedding model for a backend configuration, loading it on first use.
+
+    Args:
+        config: Embedding model, backend, batch size and thread count
+
+    Returns:
+        HuggingFaceEmbeddings: The process-wide embedding model
+    """
+    with _lock:
+        if config.key not in _embeddings:
+            _embeddings[config.key] = _load("embeddings", config.key, lambda: create_embeddings(config))
+        else:
+            _reused("embeddings", config.key)
+        return _embeddings[config.key]
+
+
+def get_cross_encoder(model_name: str):
+    """Get the shared cross-encoder used for reranking, loading it on first use.
+
+    The model runs on the CPU and is only loaded from the local Hugging Face cache, so reranking
+    never triggers a download or needs a GPU.
+
+    Args:
+        model_name: Sentence-transformers cross-encoder model name
+
+    Returns:
+        CrossEncoder: The process-wide cross-encoder
+    """
+    with _lock:
+        if model_name not in _cross_encoders:
+            def loader():
+                from sentence_transformers import CrossEncoder
+                return CrossEncoder(model_name, device="cpu", local_files_only=True)
+            _cross_encoders[model_name] = _load("cross_encoder", model_name, loader)
+        else:
+            _reused("cross_encoder", model_name)
+        return _cross_encoders[model_name]
+
+
+def get_client(persist_dir: str = DEFAULT_PERSIST_DIR) -> chromadb.ClientAPI:
+    """Get the shared persistent Chroma client for a directory.
+
+    Args:
+        persist_dir: Directory for persistent storage
+
+    Returns:
+        chromadb.ClientAPI: The process-wide client for this directory
+    """
+    key = _persist_key(persist_dir)
+    with _lock:
+        if key not in _clients:
+            def loader():
+                os.makedirs(key, exist_ok=True)
+                return chromadb.PersistentClient(
+                    path=key,
+                    settings=Settings(
+                        allow_reset=True,
+                        is_persistent=True
+                    )
+                )
+            _clients[key] = _load("client", key, loader)
+        else:
+            _reused("client", key)
+        return _clients[key]
+
+
+def get_vector_store(
+    collection_name: str,
+    config: EmbeddingConfig = EmbeddingConfig(),
+    persist_dir: str = DEFAULT_PERSIST_DIR,
+) -> Chroma:
+    """Get the shared LangChain vector store for a collection.
+
+    The collection is created if it doesn't exist yet, recording the embedding model and
+    dimension in its metadata.
+
+    Args:
+        collection_name: Name of the Chroma collection
+        config: Embedding backend used for queries and new documents
+        persist_dir: Directory for persistent storage
+
+    Returns:
+        Chroma: The process-wide vector store handle
+
+    Raises:
+        EmbeddingMismatchError: If the collection was built with a different embedding model
+    """
+    key = (_persist_key(persist_dir), config.key, collection_name)
+    with _lock:
+        if key not in _vector_stores:
+            embeddings = get_embeddings(config)
+            dimension = embedding_dimension(embeddings)
+            client = get_client(persist_dir)
+            vector_store = _load(
+                "vector_store",
+                f"{collection_name} ({config.key})",
+                lambda: Chroma(
+                    collection_name=collection_name,
+                    embedding_function=embeddings,
+                    client=client,
+                    collection_metadata=collection_metadata(config, dimension)
+                )
+            )
+            collection = vector_store._collection
+            check_collection_embeddings(collection_name, collection.metadata, collection.count(), config, dimension)
+            _vector_stores[key] = vector_store
+        else:
+            _reused("vector_store", f"{collection_name} ({config.key})")
+        return _vector_stores[key]
+
+
+def get_ledger(persist_dir: str = DEFAULT_PERSIST_DIR) -> IngestLedger:
+    """Get the shared ingestion ledger for a persist directory.
+
+    Args:
+        persist_dir: Directory for persistent storage
+
+    Returns:
+        IngestLedger: The process-wide ledger for this directory
+    """
+    key = _persist_key(persist_dir)
+    with _lock:
+        if key not in _ledgers:
+            _ledgers[key] = IngestLedger(key)
+        return _ledgers[key]
+
+
+def get_answer_cache(persist_dir: str = DEFAULT_PERSIST_DIR) -> AnswerCache:
+    """Get the shared semantic answer cache for a persist directory.
+
+    Args:
+        persist_dir: Directory for persistent storage
+
+    Returns:
+        AnswerCache: The process-wide answer cache for this directory
+    """
+    key = _persist_key(persist_dir)
+    with _lock:
+        if key not in _answer_caches:
+            _answer_caches[key] = AnswerCache(key)
+        return _answer_caches[key]
+
+
+def get_embedding_cache(config: EmbeddingConfig = EmbeddingConfig(),
+                        persist_dir: str = DEFAULT_PERSIST_DIR) -> EmbeddingCache:
+    """Get the shared on-disk embedding cache of a model.
+
+    Args:
+        config: Embedding backend whose vectors are cached
+        persist_dir: Directory for persistent storage
+
+    Returns:
+        EmbeddingCache: The process-wide cache for this model and directory
+    """
+    key = (_persist_key(persist_dir), config.model_id)
+    with _lock:
+        if key not in _embedding_caches:
+            dimension = embedding_dimension(get_embeddings(config))
+            _embedding_caches[key] = EmbeddingCache(key[0], config.model_id, dimension)
+        return _embedding_caches[key]
+
+
+def embedding_caches() -> List[EmbeddingCache]:
+    """Return every embedding cache opened in this process."""
+    with _lock:
+        return list(_embedding_caches.values())
+
+
+def get_lexical_index(collection_name: str, persist_dir: str = DEFAULT_PERSIST_DIR) -> LexicalIndex:
+    """Get the shared lexical index of a collection.
+
+    Args:
+        collection_name: Name of the Chroma collection
+        persist_dir: Directory for persistent storage
+
+    Returns:
+        LexicalIndex: The process-wide BM25 index for this collection
+    """
+    key = (_persist_key(persist_dir), collection_name)
+    with _lock:
+        if key not in _lexical_indexes:
+            _lexical_indexes[key] = LexicalIndex(key[0], collection_name)
+        return _lexical_indexes[key]
+
+
+def invalidate_collection(collection_name: str, persist_dir: str = DEFAULT_PERSIST_DIR,
+                          close_lexical_index: bool = True):
+    """Drop cached vector-store handles for a collection after it was created or deleted.
+
+    Args:
+        collection_name: Name of the Chroma collection
+        persist_dir: Directory for persistent storage
+        close_lexical_index: Also close and drop the collection's lexical index. Leave it open
+            when other threads may still hold it; it rebuilds itself if it is out of step.
+    """
+    persist_key = _persist_key(persist_dir)
+    with _lock:
+        for key in [k for k in _vector_stores if k[0] == persist_key and k[2] == collection_name]:
+            del _vector_stores[key]
+            _metrics.pop(("vector_store", f"{collection_name} ({key[1]})"), None)
+        if not close_lexical_index:
+            return
+        lexical_index = _lexical_indexes.pop((persist_key, collection_name), None)
+        if lexical_index is not None:
+            lexical_index.close()
+
+
+def clear():
+    """Drop every cached resource. The next call to a getter reloads it."""
+    with _lock:
+        _vector_stores.clear()
+        _ledgers.clear()
+        _answer_caches.clear()
+        _embedding_caches.clear()
+        _lexical_indexes.clear()
+        _cross_encoders.clear()
+        _clients.clear()
+        _embeddings.clear()
+        _metrics.clear()
+
+
+def resource_metrics() -> List[dict]:
+    """Return load time, memory and reuse metrics for every cached resource.
+
+    Returns:
+        List[dict]: One entry per loaded resource
+    """
+    with _lock:
+        return [dict(m) for m in _metrics.values()]
@@ -0,0 +1,189 @@
+# Retrieval for the chat loop. Dense results from Chroma can be fused with the BM25 lexical index so
+# exact identifiers and rare terms are found at small k. Query embeddings and top-k results are cached
+# process-wide so repeated questions skip both the embedding model and the vector search. Result entries
+# are keyed on the collection version from the ingestion ledger, so any ingest or delete makes them
+# unreachable.
+
+import math
+from typing import Callable, Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+import metrics
+from cache import TTLCache
+from docstore import ChromaDocStore
+
+# Constant from the reciprocal-rank fusion paper; dampens the weight of the very first ranks
+RRF_K = 60
+
+# Distance to 0-1 relevance for each Chroma distance metric, the same conversions LangChain uses
+_RELEVANCE_FUNCTIONS: Dict[str, Callable[[float], float]] = {
+    "l2": lambda distance: 1.0 - distance / math.sqrt(2),
+    "cosine": lambda distance: 1.0 - distance,
+    "ip": lambda distance: 1.0 - distance if distance > 0 else -distance,
+}
+
+query_embedding_cache = TTLCache("query_embeddings", maxsize=1024, ttl=None)
+result_cache = TTLCache("search_results", maxsize=256, ttl=600)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups by collapsing whitespace and case.
+
+    Only used in cache keys; the model always embeds the query as it was typed.
+    """
+    return " ".join(query.lower().split())
+
+
+def embed_query(store: ChromaDocStore, query: str) -> List[float]:
+    """Embed a query with the store's model, reusing the vector for repeated queries.
+
+    Args:
+        store: Document store whose embedding model is used
+        query: Query text
+
+    Returns:
+        List[float]: The query embedding
+    """
+    key = (store.embedding_config.key, normalize_query(query))
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        with metrics.span("retrieval.embed_query"):
+            vector = store.embeddings.embed_query(query)
+        query_embedding_cache.put(key, vector)
+    return vector
+
+
+def _relevance_function(store: ChromaDocStore, collection_name: str) -> Callable[[float], float]:
+    """Return the distance-to-relevance conversion for a collection's distance metric (L2 unless set)."""
+    metadata = store.client.get_collection(collection_name).metadata or {}
+    metric = metadata.get("hnsw:space", "l2")
+    if metric not in _RELEVANCE_FUNCTIONS:
+        raise ValueError(f"Collection '{collection_name}' uses an unknown distance metric: {metric}")
+    return _RELEVANCE_FUNCTIONS[metric]
+
+
+def similarity_search_with_relevance(store: ChromaDocStore, collection_name: str, query: str,
+                                     k: int) -> List[Tuple[Document, float]]:
+    """Return the k chunks closest to a query with a relevance score, served from cache when possible.
+
+    Distances are converted to a 0-1 relevance score with the function matching the collection's
+    distance metric, so scores from different collections can be compared.
+
+    Args:
+        store: Document store holding the collection
+        collection_name: Name of the collection to search
+        query: Query text
+        k: Number of chunks to return
+
+    Returns:
+        List[Tuple[Document, float]]: The closest chunks with their relevance (higher is better), best first
+    """
+    key = (store.persist_dir, collection_name, store.embedding_config.key, store.ledger.version(collection_name),
+           normalize_query(query), k)
+    results = result_cache.get(key)
+    if results is None:
+        vector = embed_query(store, query)
+        vector_store = store.get_vector_store(collection_name)
+        relevance = _relevance_function(store, collection_name)
+        with metrics.span("retrieval.dense", collection=collection_name):
+            results = [
+                (doc, relevance(distance))
+                for doc, distance in vector_store.similarity_search_by_vector_with_relevance_scores(vector, k)
+            ]
+        result_cache.put(key, results)
+    return results
+
+
+def similarity_search(store: ChromaDocStore, collection_name: str, query: str, k: int) -> List[Document]:
+    """Return the k chunks closest to a query, served from cache when possible.
+
+    Args:
+        store: Document store holding the collection
+        collection_name: Name of the collection to search
+        query: Query text
+        k: Number of chunks to return
+
+    Returns:
+        List[Document]: The closest chunks, best first
+    """
+    return [doc for doc, _ in similarity_search_with_relevance(store, collection_name, query, k)]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int) -> List[Tuple[Document, float]]:
+    """Merge several ranked lists of chunks into one with reciprocal-rank fusion.
+
+    Args:
+        rankings: Ranked chunk lists, best first. The first list's Document objects are kept on ties.
+        k: Number of chunks to return
+
+    Returns:
+        List[Tuple[Document, float]]: Chunks with their fused score, best first
+    """
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            chunk_id = doc.id or doc.page_content
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            docs.setdefault(chunk_id, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [(docs[chunk_id], scores[chunk_id]) for chunk_id in best]
+
+
+def _with_chunk_metadata(store: ChromaDocStore, collection_name: str,
+                         docs: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+    """Give chunks found only by the lexical index their full metadata from Chroma.
+
+    The lexical index only stores the source, but the chat turn needs the chunk index and
+    parent ID to merge neighbouring chunks and expand chunks to their parent sections.
+    """
+    missing = [doc.id for doc, _ in docs if doc.id and set(doc.metadata) <= {"source"}]
+    if not missing:
+        return docs
+    page = store.client.get_collection(collection_name).get(ids=missing, include=["metadatas"])
+    found = dict(zip(page["ids"], page["metadatas"]))
+    return [
+        (Document(page_content=doc.page_content, metadata=found[doc.id] or doc.metadata, id=doc.id), score)
+        if doc.id in found else (doc, score)
+        for doc, score in docs
+    ]
+
+
+def hybrid_search_with_scores(store: ChromaDocStore, collection_name: str, query: str,
+                              k: int) -> List[Tuple[Document, float]]:
+    """Return the k best chunks for a query from dense and BM25 retrieval fused together.
+
+    Each retriever contributes a wider candidate pool than k so that chunks ranked highly by
+    only one of them can still make the final cut.
+
+    Args:
+        store: Document store holding the collection
+        collection_name: Name of the collection to search
+        query: Query text
+        k: Number of chunks to return
+
+    Returns:
+        List[Tuple[Document, float]]: Chunks with their fused score, best first
+    """
+    key = (store.persist_dir, collection_name, store.embedding_config.key, store.ledger.version(collection_name),
+           normalize_query(query), k, "hybrid")
+    results = result_cache.get(key)
+    if results is None:
+        pool_size = max(k * 3, 20)
+        dense = similarity_search(store, collection_name, query, pool_size)
+        with metrics.span("retrieval.lexical", collection=collection_name):
+            lexical = [doc for doc, _ in store.lexical_index(collection_name).search(query, pool_size)]
+        results = _with_chunk_metadata(store, collection_name, reciprocal_rank_fusion([dense, lexical], k))
+        result_cache.put(key, results)
+    return results
+
+
+def hybrid_search(store: ChromaDocStore, collection_name: str, query: str, k: int) -> List[Document]:
+    """Return the k best chunks for a query from dense and BM25 retrieval fused together."""
+    return [doc for doc, _ in hybrid_search_with_scores(store, collection_name, query, k)]
+
+
+def cache_stats() -> List[dict]:
+    """Return hit/miss counters for the retrieval caches."""
+    return [query_embedding_cache.stats(), result_cache.stats()]
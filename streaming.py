@@ -0,0 +1,103 @@
+# Renders a streamed LLM response without redrawing the whole message for every token. Tokens are
+# buffered in a list and the placeholder is only updated on a time/size cadence, which keeps the browser
+# responsive on long answers. Time-to-first-token and tokens/sec are recorded for each response.
+
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import metrics
+from context import count_tokens
+
+DEFAULT_FLUSH_INTERVAL = 0.1
+DEFAULT_FLUSH_CHARS = 400
+
+
+@dataclass
+class StreamStats:
+    """Timing of one streamed response."""
+    time_to_first_token: Optional[float] = None
+    total_seconds: float = 0.0
+    chunks: int = 0
+    tokens: int = 0
+    flushes: int = 0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generation speed after the first token arrived."""
+        generating = self.total_seconds - (self.time_to_first_token or 0.0)
+        return self.tokens / generating if generating > 0 else 0.0
+
+
+class StreamRenderer:
+    def __init__(self, placeholder, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 flush_chars: int = DEFAULT_FLUSH_CHARS, cursor: str = "▌", model_name: Optional[str] = None):
+        """Create a renderer for one response.
+
+        Args:
+            placeholder: Streamlit element to write into, e.g. st.empty()
+            flush_interval: Minimum seconds between two redraws
+            flush_chars: Redraw early once this many characters arrived since the last redraw
+            cursor: Text appended while the response is still streaming
+            model_name: Model whose tokenizer is used to count tokens, if known
+        """
+        self.placeholder = placeholder
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.cursor = cursor
+        self.model_name = model_name
+        self.stats = StreamStats()
+
+        self._parts = []
+        self._pending_chars = 0
+        self._started_at = time.perf_counter()
+        self._last_flush = self._started_at
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def write(self, chunk: str):
+        """Buffer one streamed chunk and redraw if the cadence allows it."""
+        if not chunk:
+            return
+        now = time.perf_counter()
+        if self.stats.time_to_first_token is None:
+            self.stats.time_to_first_token = now - self._started_at
+        self._parts.append(chunk)
+        self.stats.chunks += 1
+        self._pending_chars += len(chunk)
+
+        if now - self._last_flush >= self.flush_interval or self._pending_chars >= self.flush_chars:
+            self._flush(self.text + self.cursor, now)
+
+    def render(self, chunks: Iterable[str]) -> str:
+        """Stream every chunk of a response and draw the final text.
+
+        Returns:
+            str: The complete response
+        """
+        for chunk in chunks:
+            self.write(chunk)
+        return self.finish()
+
+    def finish(self) -> str:
+        """Draw the complete response without the cursor and finalize the statistics.
+
+        Returns:
+            str: The complete response
+        """
+        text = self.text
+        now = time.perf_counter()
+        self._flush(text, now)
+        self.stats.total_seconds = now - self._started_at
+        self.stats.tokens = count_tokens(text, self.model_name)
+        metrics.count("chat_tokens", self.stats.tokens)
+        metrics.count("stream_redraws", self.stats.flushes)
+        return text
+
+    def _flush(self, content: str, now: float):
+        self.placeholder.markdown(content)
+        self.stats.flushes += 1
+        self._pending_chars = 0
+        self._last_flush = now
@@ -0,0 +1,268 @@
+# Incremental folder sync. A collection is kept in step with a directory tree: files whose modification
+# time and size match what was recorded at the last sync are skipped without being read, changed files are
+# hashed and only re-parsed if their content differs, and files that disappeared have their chunks deleted.
+# FolderWatcher repeats the sync in a background thread whenever the directory changes, waiting until it
+# has been quiet for a moment so files still being copied aren't indexed half-written.
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import metrics
+from docstore import ChromaDocStore
+from ingest import DEFAULT_EMBED_BATCH_SIZE, IngestEngine
+from ledger import hash_file
+from parsing import DEFAULT_PARSE_WORKERS, parse_paths
+
+DEFAULT_WATCH_INTERVAL = 5.0
+DEFAULT_WATCH_DEBOUNCE = 2.0
+
+
+def walk_files(root: str, extensions: Optional[Set[str]] = None) -> Iterator[Tuple[str, str]]:
+    """Walk a directory tree lazily, skipping hidden files and folders.
+
+    Args:
+        root: Directory to walk
+        extensions: Lower-case extensions to keep (e.g. {".pdf"}), or None for every file
+
+    Yields:
+        Tuple[str, str]: (absolute path, path relative to root used as the source name)
+    """
+    root = os.path.abspath(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            if extensions and os.path.splitext(filename)[1].lower() not in extensions:
+                continue
+            path = os.path.join(dirpath, filename)
+            yield path, os.path.relpath(path, root).replace(os.sep, "/")
+
+
+@dataclass
+class SyncResult:
+    """What one sync pass changed."""
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+    chunks_embedded: int = 0
+    vectors_from_cache: int = 0
+    chunks_removed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+
+class FolderSync:
+    def __init__(self, store: ChromaDocStore, collection_name: str, directory: str,
+                 extensions: Optional[Set[str]] = None, parse_workers: int = DEFAULT_PARSE_WORKERS,
+                 batch_size: int = DEFAULT_EMBED_BATCH_SIZE):
+        """Prepare to sync a collection with a directory tree.
+
+        Only files that were indexed through this directory are ever deleted, so documents
+        uploaded to the same collection by other means are left alone.
+
+        Args:
+            store: Document store holding the collection
+            collection_name: Name of the collection (created if it doesn't exist)
+            directory: Directory to mirror
+            extensions: Lower-case extensions to index (e.g. {".pdf"}), or None for every file
+            parse_workers: Number of parsing processes
+            batch_size: Chunks per embedding batch
+        """
+        self.store = store
+        self.collection_name = store.open_collection(collection_name)
+        self.directory = os.path.abspath(directory)
+        self.extensions = extensions
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        # Files that failed to parse, with the stats they had, so they're retried only once they change
+        self._failed: Dict[str, Tuple[int, int]] = {}
+
+    def snapshot(self) -> Dict[str, Tuple[str, int, int]]:
+        """Stat every file in the directory without reading it.
+
+        Returns:
+            Dict[str, Tuple[str, int, int]]: Source name -> (path, modification time in ns, size in bytes)
+        """
+        files = {}
+        for path, source in walk_files(self.directory, self.extensions):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed between listing and stat
+                continue
+            files[source] = (path, stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def sync(self, snapshot: Optional[Dict[str, Tuple[str, int, int]]] = None,
+             on_progress: Optional[Callable[[str], None]] = None) -> SyncResult:
+        """Bring the collection in line with the directory.
+
+        Args:
+            snapshot: Result of snapshot() to sync against, or None to take a new one
+            on_progress: Called with a line of text for each file added, updated or removed
+
+        Returns:
+            SyncResult: The files that changed and the work done
+        """
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"'{self.directory}' is not a directory")
+        start = time.perf_counter()
+        log = on_progress or (lambda line: None)
+        result = SyncResult()
+        ledger = self.store.ledger
+        files = snapshot if snapshot is not None else self.snapshot()
+        recorded = ledger.watched_files(self.collection_name, self.directory)
+
+        with metrics.span("sync.pass"):
+            # Files gone from the directory
+            for source in sorted(set(recorded) - set(files)):
+                if ledger.has_source(self.collection_name, source):
+                    result.chunks_removed += self.store.delete_source(self.collection_name, source)
+                result.deleted.append(source)
+                self._failed.pop(source, None)
+                log(f"removed {source}")
+            ledger.forget_watched_files(self.collection_name, result.deleted)
+
+            # Files that may be new or changed: compare the content hash before parsing anything
+            pending = []
+            touched = {}
+            for source, (path, mtime_ns, size) in files.items():
+                stat = (mtime_ns, size)
+                if recorded.get(source) == stat or self._failed.get(source) == stat:
+                    result.unchanged += 1
+                    continue
+                try:
+                    file_hash = hash_file(path)
+                except OSError as e:
+                    result.errors.append((source, str(e)))
+                    continue
+                previous_hash = ledger.file_hash(self.collection_name, source)
+                if previous_hash == file_hash:
+                    # Touched or copied again without changing
+                    touched[source] = stat
+                    result.unchanged += 1
+                    continue
+                (result.modified if previous_hash is not None else result.added).append(source)
+                pending.append((path, source, file_hash))
+            ledger.record_watched_files(self.collection_name, self.directory, touched)
+
+            if pending:
+                indexed = {}
+                engine = IngestEngine(self.store.get_vector_store(self.collection_name), ledger,
+                                      self.collection_name, self.store.lexical_index(self.collection_name),
+                                      embedding_cache=self.store.embedding_cache, batch_size=self.batch_size)
+                with engine:
+                    for parsed in parse_paths(pending, max_workers=self.parse_workers,
+                                              chunking=self.store.chunking_settings(self.collection_name)):
+                        path, mtime_ns, size = files[parsed.source]
+                        if not parsed.ok:
+                            self._failed[parsed.source] = (mtime_ns, size)
+                            result.errors.append((parsed.source, parsed.error))
+                            log(f"FAILED  {parsed.source}: {parsed.error}")
+                            continue
+                        self._failed.pop(parsed.source, None)
+                        engine.add_file(parsed.source, parsed.file_hash, parsed.docs, parsed.parents)
+                        indexed[parsed.source] = (mtime_ns, size)
+
+                for sync_result in engine.results:
+                    if sync_result.error:
+                        indexed.pop(sync_result.source, None)
+                        result.errors.append((sync_result.source, sync_result.error))
+                        log(f"FAILED  {sync_result.source}: {sync_result.error}")
+                    else:
+                        log(f"indexed {sync_result.source}: {sync_result.added} chunks added, "
+                            f"{sync_result.removed} removed")
+                # Only files that made it into the collection are skipped next time
+                ledger.record_watched_files(self.collection_name, self.directory, indexed)
+                result.chunks_embedded = engine.stats.chunks_embedded
+                result.vectors_from_cache = engine.stats.vectors_from_cache
+                result.chunks_removed += engine.stats.chunks_removed
+
+        failed = {source for source, _ in result.errors}
+        result.added = [source for source in result.added if source not in failed]
+        result.modified = [source for source in result.modified if source not in failed]
+        result.seconds = time.perf_counter() - start
+        metrics.count("sync_files_changed", len(result.added) + len(result.modified) + len(result.deleted))
+        return result
+
+
+class FolderWatcher:
+    def __init__(self, folder_sync: FolderSync, interval: float = DEFAULT_WATCH_INTERVAL,
+                 debounce: float = DEFAULT_WATCH_DEBOUNCE,
+                 on_result: Optional[Callable[[SyncResult], None]] = None,
+                 on_progress: Optional[Callable[[str], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        """Keep a collection in sync with its directory from a background thread.
+
+        The directory is polled with cheap stat calls. Once it differs from the last sync and
+        has stayed the same for the debounce period, a sync pass runs.
+
+        Args:
+            folder_sync: The collection and directory to keep in step
+            interval: Seconds between two polls
+            debounce: Seconds the directory must stay unchanged before it is synced
+            on_result: Called with the result of every pass that changed something
+            on_progress: Passed to FolderSync.sync()
+            on_error: Called if a pass fails; the watcher keeps running
+        """
+        self.folder_sync = folder_sync
+        self.interval = interval
+        self.debounce = debounce
+        self.on_result = on_result
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="docuchat-watch", daemon=True)
+
+    def start(self):
+        """Run a first sync pass and keep watching in the background."""
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop watching. A pass in progress is finished first."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def wait(self):
+        """Block until the watcher stops."""
+        while self._thread.is_alive():
+            self._thread.join(0.5)
+
+    def _sync(self, snapshot):
+        try:
+            result = self.folder_sync.sync(snapshot, on_progress=self.on_progress)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            return False
+        if result.changed and self.on_result is not None:
+            self.on_result(result)
+        return True
+
+    def _run(self):
+        synced = self.folder_sync.snapshot()
+        if not self._sync(synced):
+            synced = None
+        pending, pending_since = None, 0.0
+        while not self._stop.wait(self.interval):
+            current = self.folder_sync.snapshot()
+            if current == synced:
+                pending = None
+                continue
+            if current != pending:
+                # Still changing: restart the quiet period
+                pending, pending_since = current, time.monotonic()
+                if self.debounce > 0:
+                    continue
+            if time.monotonic() - pending_since >= self.debounce:
+                synced = current if self._sync(current) else None
+                pending = None
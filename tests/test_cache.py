@@ -0,0 +1,36 @@
+from cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache("test", maxsize=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = TTLCache("test", maxsize=10, ttl=5)
+    cache.put("a", 1)
+
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a", "missing") == "missing"
+    assert cache.stats()["entries"] == 0
+
+
+def test_stats_count_hits_and_misses():
+    cache = TTLCache("test", maxsize=10)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
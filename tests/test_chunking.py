@@ -0,0 +1,69 @@
+from langchain_core.documents import Document
+
+from chunking import (
+    DEFAULT_PROFILES,
+    ChunkProfile,
+    chunk_documents,
+    file_kind,
+    profile_for,
+    settings_from_json,
+    settings_to_json,
+)
+from context import count_tokens
+
+
+def test_file_kinds_and_collection_overrides():
+    assert file_kind("report.PDF") == "prose"
+    assert file_kind("parts.xlsx") == "tabular"
+    assert file_kind("deck.pptx") == "slides"
+
+    override = {"tabular": ChunkProfile(strategy="basic", max_tokens=1000, target_tokens=800)}
+    assert profile_for("parts.csv", override).max_tokens == 1000
+    assert profile_for("report.pdf", override) == DEFAULT_PROFILES["prose"]
+
+
+def test_settings_round_trip_and_ignore_unknown_entries():
+    settings = {"prose": ChunkProfile(max_tokens=300, target_tokens=200, parent_tokens=1024)}
+    assert settings_from_json(settings_to_json(settings)) == settings
+
+    loaded = settings_from_json('{"prose": {"max_tokens": 300, "unknown": 1}, "video": {}}')
+    assert set(loaded) == {"prose"}
+    assert loaded["prose"].max_tokens == 300
+    assert settings_from_json(None) == {}
+
+
+def test_oversized_elements_are_split_and_small_ones_merged():
+    sentence = "The pump must be serviced every six months by a qualified technician. "
+    raw = [Document(page_content=sentence * 60, metadata={"page_number": 1})]
+    raw += [Document(page_content=f"Row {i}: seal kit", metadata={"page_number": 2}) for i in range(20)]
+    profile = ChunkProfile(max_tokens=128, target_tokens=96, combine_under_tokens=32)
+
+    docs, parents = chunk_documents(raw, profile)
+
+    assert parents == []
+    assert all(count_tokens(doc.page_content) <= profile.max_tokens for doc in docs)
+    assert sum(doc.page_content.startswith("The pump") for doc in docs) > 1
+    assert sum("Row" in doc.page_content for doc in docs) < 20
+
+
+def test_page_breaks_keep_pages_apart():
+    raw = [Document(page_content=f"Slide {i} title", metadata={"page_number": i}) for i in range(1, 6)]
+
+    docs, _ = chunk_documents(raw, DEFAULT_PROFILES["slides"])
+
+    assert [doc.metadata["page_number"] for doc in docs] == [1, 2, 3, 4, 5]
+
+
+def test_parent_sections_are_split_into_children():
+    sentence = "Each valve is tested at twice its rated pressure before shipping. "
+    raw = [Document(page_content=sentence * 100, metadata={})]
+    profile = ChunkProfile(max_tokens=64, target_tokens=48, combine_under_tokens=16, parent_tokens=256)
+
+    children, parents = chunk_documents(raw, profile)
+
+    assert len(parents) > 1
+    assert len(children) > len(parents)
+    assert all(count_tokens(parent) <= 256 for parent in parents)
+    assert {doc.metadata["parent_index"] for doc in children} == set(range(len(parents)))
+    for doc in children:
+        assert doc.page_content in parents[doc.metadata["parent_index"]]
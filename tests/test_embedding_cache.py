@@ -0,0 +1,98 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIMENSION = 4
+
+
+def _cache(tmp_path, capacity):
+    return EmbeddingCache(str(tmp_path), "test-model", DIMENSION, max_mb=capacity * DIMENSION * 4 / 1024 / 1024)
+
+
+def _vector(value):
+    return [float(value)] * DIMENSION
+
+
+def _slots(cache):
+    return dict(cache._conn.execute("SELECT chunk_hash, slot FROM vectors").fetchall())
+
+
+def test_put_and_get(tmp_path):
+    cache = _cache(tmp_path, 10)
+    cache.put_many(["a", "b"], [_vector(1), _vector(2)])
+
+    found = cache.get_many(["a", "b", "c"])
+    assert set(found) == {"a", "b"}
+    np.testing.assert_array_equal(found["a"], _vector(1))
+    np.testing.assert_array_equal(found["b"], _vector(2))
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_existing_vectors_are_not_overwritten(tmp_path):
+    cache = _cache(tmp_path, 10)
+    cache.put_many(["a"], [_vector(1)])
+    cache.put_many(["a"], [_vector(9)])
+
+    np.testing.assert_array_equal(cache.get_many(["a"])["a"], _vector(1))
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_vectors_are_evicted_and_their_slots_reused(tmp_path):
+    cache = _cache(tmp_path, 3)
+    cache.put_many(["a", "b", "c"], [_vector(1), _vector(2), _vector(3)])
+    slots = _slots(cache)
+    cache.get_many(["a"])
+
+    cache.put_many(["d"], [_vector(4)])
+
+    assert set(_slots(cache)) == {"a", "c", "d"}
+    assert _slots(cache)["d"] == slots["b"]
+    found = cache.get_many(["a", "c", "d"])
+    np.testing.assert_array_equal(found["a"], _vector(1))
+    np.testing.assert_array_equal(found["c"], _vector(3))
+    np.testing.assert_array_equal(found["d"], _vector(4))
+
+
+def test_batch_larger_than_the_cache_keeps_the_last_vectors(tmp_path):
+    cache = _cache(tmp_path, 2)
+    cache.put_many(["a", "b", "c"], [_vector(1), _vector(2), _vector(3)])
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"b", "c"}
+
+
+def test_vectors_survive_reopening(tmp_path):
+    _cache(tmp_path, 10).put_many(["a"], [_vector(1)])
+
+    np.testing.assert_array_equal(_cache(tmp_path, 10).get_many(["a"])["a"], _vector(1))
+
+
+def test_lowering_the_size_limit_drops_vectors_beyond_it(tmp_path):
+    _cache(tmp_path, 4).put_many(["a", "b", "c", "d"], [_vector(1), _vector(2), _vector(3), _vector(4)])
+
+    cache = _cache(tmp_path, 2)
+    assert set(cache.get_many(["a", "b", "c", "d"])) == {"a", "b"}
+    cache.put_many(["e"], [_vector(5)])
+    assert len(set(_slots(cache).values())) == len(_slots(cache)) <= 2
+
+
+def test_vectors_written_by_another_instance_are_visible(tmp_path):
+    # Two processes sharing the cache directory behave like two instances
+    first = _cache(tmp_path, 100)
+    second = _cache(tmp_path, 100)
+    first.put_many(["a"], [_vector(1)])
+    second.put_many([f"b{i}" for i in range(50)], [_vector(i) for i in range(50)])
+
+    found = first.get_many(["a", "b49"])
+    np.testing.assert_array_equal(found["a"], _vector(1))
+    np.testing.assert_array_equal(found["b49"], _vector(49))
+    assert len(set(_slots(first).values())) == 51
+
+
+def test_clear(tmp_path):
+    cache = _cache(tmp_path, 10)
+    cache.put_many(["a"], [_vector(1)])
+    cache.clear()
+
+    assert cache.get_many(["a"]) == {}
+    cache.put_many(["b"], [_vector(2)])
+    np.testing.assert_array_equal(cache.get_many(["b"])["b"], _vector(2))
@@ -0,0 +1,60 @@
+from ledger import IngestLedger
+
+
+def test_record_and_forget_source(tmp_path):
+    ledger = IngestLedger(str(tmp_path))
+    ledger.record_source("docs", "a.pdf", "hash-a", [("c1", "h1"), ("c2", "h2")], parents={"p1": "parent text"})
+
+    assert ledger.file_hash("docs", "a.pdf") == "hash-a"
+    assert ledger.chunk_ids("docs", "a.pdf") == {"c1", "c2"}
+    assert ledger.sources("docs") == {"a.pdf": 2}
+    assert ledger.parents("docs", ["p1", "missing"]) == {"p1": "parent text"}
+
+    ledger.forget_source("docs", "a.pdf")
+    assert not ledger.has_source("docs", "a.pdf")
+    assert ledger.file_hash("docs", "a.pdf") is None
+    assert ledger.parents("docs", ["p1"]) == {}
+
+
+def test_recording_a_source_again_replaces_its_chunks(tmp_path):
+    ledger = IngestLedger(str(tmp_path))
+    ledger.record_source("docs", "a.pdf", "v1", [("c1", "h1"), ("c2", "h2")])
+    ledger.record_source("docs", "a.pdf", "v2", [("c3", "h3")])
+
+    assert ledger.file_hash("docs", "a.pdf") == "v2"
+    assert ledger.chunk_ids("docs", "a.pdf") == {"c3"}
+
+
+def test_version_changes_on_every_change_and_never_goes_back(tmp_path):
+    ledger = IngestLedger(str(tmp_path))
+    assert ledger.version("docs") == 0
+
+    ledger.record_source("docs", "a.pdf", "v1", [("c1", "h1")])
+    first = ledger.version("docs")
+    ledger.forget_collection("docs")
+    second = ledger.version("docs")
+    ledger.record_source("docs", "a.pdf", "v1", [("c1", "h1")])
+
+    assert 0 < first < second < ledger.version("docs")
+
+
+def test_forget_collection_leaves_other_collections_alone(tmp_path):
+    ledger = IngestLedger(str(tmp_path))
+    ledger.record_source("docs", "a.pdf", "v1", [("c1", "h1")])
+    ledger.record_source("other", "a.pdf", "v1", [("c1", "h1")])
+    ledger.set_chunking("docs", '{"prose": {}}')
+
+    ledger.forget_collection("docs")
+
+    assert ledger.sources("docs") == {}
+    assert ledger.chunking("docs") is None
+    assert ledger.sources("other") == {"a.pdf": 1}
+
+
+def test_watched_files(tmp_path):
+    ledger = IngestLedger(str(tmp_path))
+    ledger.record_watched_files("docs", "/data", {"a.pdf": (1, 10), "b.pdf": (2, 20)})
+    ledger.forget_watched_files("docs", ["b.pdf"])
+
+    assert ledger.watched_files("docs", "/data") == {"a.pdf": (1, 10)}
+    assert ledger.watched_files("docs", "/elsewhere") == {}
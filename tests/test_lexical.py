@@ -0,0 +1,87 @@
+from langchain_core.documents import Document
+
+from lexical import LexicalIndex
+
+
+def _doc(chunk_id, text, source="manual.pdf"):
+    return Document(page_content=text, metadata={"source": source}, id=chunk_id)
+
+
+def _ids(results):
+    return [doc.id for doc, _ in results]
+
+
+def test_term_at_end_of_sentence_matches(tmp_path):
+    index = LexicalIndex(str(tmp_path), "docs")
+    index.add([_doc("1", "Replace seal kit AB-1234. The pump is broken.")])
+
+    assert _ids(index.search("AB-1234", 5)) == ["1"]
+    assert _ids(index.search("broken", 5)) == ["1"]
+    assert _ids(index.search("pump", 5)) == ["1"]
+
+
+def test_identifier_with_period_matches_as_a_whole(tmp_path):
+    index = LexicalIndex(str(tmp_path), "docs")
+    index.add([_doc("1", "Firmware 2.5.1 fixes the sensor."), _doc("2", "Firmware 2 is out of support.")])
+
+    assert _ids(index.search("2.5.1", 5)) == ["1"]
+    assert _ids(index.search("firmware 2.5.1.", 5))[0] == "1"
+
+
+def test_index_from_older_schema_is_emptied(tmp_path):
+    index = LexicalIndex(str(tmp_path), "docs")
+    index.add([_doc("1", "pump")])
+    index._conn.execute("PRAGMA user_version = 1")
+    index.close()
+
+    reopened = LexicalIndex(str(tmp_path), "docs")
+    assert reopened.count() == 0
+
+
+def test_add_search_and_delete_by_source(tmp_path):
+    index = LexicalIndex(str(tmp_path), "docs")
+    index.add([
+        _doc("1", "The pump needs a new seal kit.", source="pump.pdf"),
+        _doc("2", "Seal kit AB-1234 fits models 3 and 4.", source="parts.xlsx"),
+        _doc("3", "The warranty covers two years.", source="warranty.pdf"),
+    ])
+    assert index.count() == 3
+
+    results = index.search("seal kit", 5)
+    assert sorted(_ids(results)) == ["1", "2"]
+    assert all(score > -1e-9 for _, score in results)
+    assert results[0][0].metadata["source"] in ("pump.pdf", "parts.xlsx")
+
+    index.delete_source("parts.xlsx")
+    assert index.count() == 2
+    assert _ids(index.search("seal kit", 5)) == ["1"]
+    assert index.search("AB-1234", 5) == []
+
+
+def test_adding_an_existing_id_replaces_the_chunk(tmp_path):
+    index = LexicalIndex(str(tmp_path), "docs")
+    index.add([_doc("1", "old text about pumps")])
+    index.add([_doc("1", "new text about valves")])
+
+    assert index.count() == 1
+    assert index.search("pumps", 5) == []
+    assert _ids(index.search("valves", 5)) == ["1"]
+
+
+def test_delete_by_id_and_clear(tmp_path):
+    index = LexicalIndex(str(tmp_path), "docs")
+    index.add([_doc("1", "alpha"), _doc("2", "alpha beta")])
+
+    index.delete(["1"])
+    assert _ids(index.search("alpha", 5)) == ["2"]
+
+    index.clear()
+    assert index.count() == 0
+    assert index.search("alpha", 5) == []
+
+
+def test_query_without_terms_returns_nothing(tmp_path):
+    index = LexicalIndex(str(tmp_path), "docs")
+    index.add([_doc("1", "alpha")])
+
+    assert index.search("?! ...", 5) == []